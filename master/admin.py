@@ -1,10 +1,23 @@
 from django.contrib import admin
-from .models import Game
+from players.models import GameParticipant
+from .models import Game, GameResult, RoundSummary
+
+
+class GameParticipantInline(admin.TabularInline):
+    """Participantes de la partida con su estado"""
+    model = GameParticipant
+    extra = 0
+    fields = [
+        'player', 'suit_symbol', 'chosen_symbol', 'karma_score',
+        'truths_told', 'lies_told', 'is_dead', 'death_reason', 'died_in_round'
+    ]
+    raw_id_fields = ['player']
 
 
 @admin.register(Game)
 class GameAdmin(admin.ModelAdmin):
     """Administración de juegos"""
+    inlines = [GameParticipantInline]
     list_display = [
         'name', 'status', 'players_count', 'current_round',
         'created_at', 'started_at'
@@ -12,7 +25,7 @@ class GameAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at', 'current_round']
     search_fields = ['name', 'description']
     readonly_fields = [
-        'id', 'created_at', 'started_at', 'players_count', 'is_active',
+        'id', 'created_at', 'started_at', 'players_count', 'is_active', 'version',
         'current_round', 'round_started_at', 'round_ends_at', 'time_remaining_in_round'
     ]
     
@@ -21,10 +34,10 @@ class GameAdmin(admin.ModelAdmin):
             'fields': ('name', 'description')
         }),
         ('Configuración del juego', {
-            'fields': ('status', 'round_duration_seconds')
+            'fields': ('status', 'round_duration_seconds', 'rng_seed')
         }),
         ('Estado actual', {
-            'fields': ('current_round', 'round_started_at', 'round_ends_at', 'time_remaining_in_round'),
+            'fields': ('current_round', 'version', 'round_started_at', 'round_ends_at', 'time_remaining_in_round'),
             'classes': ['collapse']
         }),
         ('Estadísticas', {
@@ -56,8 +69,8 @@ class GameAdmin(admin.ModelAdmin):
         """Acción para finalizar juegos seleccionados"""
         updated = 0
         for game in queryset.filter(status='active'):
-            game.finish_game()
-            updated += 1
+            if game.finish_game():
+                updated += 1
         
         self.message_user(
             request, 
@@ -69,11 +82,36 @@ class GameAdmin(admin.ModelAdmin):
         """Acción para avanzar a la siguiente ronda"""
         updated = 0
         for game in queryset.filter(status='active'):
-            game.advance_round()
-            updated += 1
+            if game.advance_round():
+                updated += 1
         
         self.message_user(
             request, 
             f'{updated} juego(s) avanzado(s) a la siguiente ronda.'
         )
-    advance_round.short_description = "Avanzar a siguiente ronda"
\ No newline at end of file
+    advance_round.short_description = "Avanzar a siguiente ronda"
+
+
+@admin.register(GameResult)
+class GameResultAdmin(admin.ModelAdmin):
+    """Resultados guardados al finalizar cada partida (solo lectura)"""
+    list_display = ['game', 'winner', 'alive_count', 'is_tie', 'finished_at']
+    list_filter = ['is_tie', 'finished_at']
+    readonly_fields = ['game', 'winner', 'winner_reason', 'alive_count', 'is_tie', 'final_stats', 'finished_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(RoundSummary)
+class RoundSummaryAdmin(admin.ModelAdmin):
+    """Resúmenes guardados al resolver cada ronda (solo lectura)"""
+    list_display = ['game', 'round_number', 'participants', 'guesses', 'resolution_ms', 'query_count', 'resolved_at']
+    list_filter = ['resolved_at']
+    readonly_fields = [
+        'game', 'round_number', 'participants', 'guesses', 'truths', 'lies',
+        'deaths', 'karma_changes', 'resolution_ms', 'query_count', 'resolved_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class MasterConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'master'
+    
+    def ready(self):
+        from django.conf import settings
+        from . import gamelog, queryprofile
+        from .scheduler import round_scheduler, should_autostart
+        
+        gamelog.configure()
+        # Con el perfil activo también se cuentan las consultas de las rondas que
+        # avanza el scheduler fuera de una petición (RoundSummary)
+        if queryprofile.enabled():
+            queryprofile.install()
+        
+        # El servidor avanza las rondas; el navegador del master solo muestra el tiempo
+        if getattr(settings, 'ROUND_SCHEDULER_ENABLED', True) and should_autostart():
+            round_scheduler.start()
@@ -0,0 +1,30 @@
+"""
+Punto de entrada ASGI de producción: vistas HTTP de Django y gateway WebSocket.
+
+    uvicorn master.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+Las vistas que consultan los dashboards son asíncronas y los streams de
+eventos esperan en el bucle sin ocupar un hilo por conexión. Con varios
+workers, los eventos se reparten entre procesos con
+GAME_BROADCAST_BACKEND = 'master.broadcast.SocketBroadcast'.
+"""
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AIBLGame.settings')
+
+# Inicializa Django antes de importar nada que use modelos
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from .gateway import websocket_router  # noqa: E402
+
+if settings.DEBUG:
+    # uvicorn no sirve los estáticos como runserver
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+    
+    django_application = ASGIStaticFilesHandler(django_application)
+
+application = websocket_router(django_application)
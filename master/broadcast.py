@@ -0,0 +1,207 @@
+"""
+Difusión de eventos del juego a las conexiones WebSocket.
+
+changefeed.record() publica cada evento al confirmarse la transacción y el
+gateway (master.gateway) lo reenvía a los clientes suscritos a ese juego.
+El backend es configurable:
+
+    InProcessBroadcast  las suscripciones viven en este proceso; basta con
+                        un único servidor ASGI.
+    SocketBroadcast     cada proceso suscrito escucha en un socket Unix de
+                        datagramas dentro de GAME_BROADCAST_SOCKET_DIR y quien
+                        publica (ASGI, WSGI o el scheduler) envía el evento a
+                        todos. Sin brokers externos, en una sola máquina.
+
+Configuración opcional en settings o en variables de entorno:
+    GAME_BROADCAST_BACKEND     ruta del backend (por defecto InProcessBroadcast)
+    GAME_BROADCAST_SOCKET_DIR  directorio de sockets de SocketBroadcast; con varios
+                               contenedores (el scheduler publica los avances de
+                               ronda) debe ser un volumen compartido
+"""
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .gamelog import get_logger
+
+logger = get_logger('broadcast')
+
+DEFAULT_BACKEND = 'master.broadcast.InProcessBroadcast'
+MAX_DATAGRAM = 64 * 1024
+
+
+class Subscription:
+    """Cola de mensajes de un juego para una conexión"""
+    
+    def __init__(self, backend, game_id):
+        self.backend = backend
+        self.game_id = str(game_id)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+    
+    def deliver(self, message):
+        """Entrega desde cualquier hilo"""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+    
+    async def get(self):
+        return await self.queue.get()
+    
+    def discard_pending(self):
+        """Descarta los mensajes en cola (quien los usa como aviso ya va a leer el feed)"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+    
+    def close(self):
+        self.backend.unsubscribe(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InProcessBroadcast:
+    """Reparte los mensajes entre las suscripciones de este proceso"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+    
+    def subscribe(self, game_id):
+        """Suscripción a los mensajes del juego (llamar desde el bucle asyncio)"""
+        subscription = Subscription(self, game_id)
+        with self._lock:
+            self._subscriptions.setdefault(subscription.game_id, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.game_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.game_id, None)
+    
+    def publish(self, game_id, message):
+        """Envía `message` (dict serializable) a los suscritos al juego"""
+        self.deliver(str(game_id), message)
+    
+    def deliver(self, game_id, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(game_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # El bucle de la conexión ya se cerró: no debe romper el on_commit de quien publica
+                self.unsubscribe(subscription)
+
+
+class SocketBroadcast(InProcessBroadcast):
+    """
+    Difusión entre procesos de la misma máquina.
+    
+    El primer subscribe() de un proceso crea su socket y un hilo lector;
+    publish() envía un datagrama a cada socket del directorio y borra los de
+    procesos que ya no existen.
+    """
+    
+    def __init__(self, socket_dir=None):
+        super().__init__()
+        if socket_dir is None:
+            socket_dir = _setting('GAME_BROADCAST_SOCKET_DIR') or os.path.join(
+                tempfile.gettempdir(), 'mindgame-broadcast'
+            )
+        self.socket_dir = socket_dir
+        self._listener = None
+    
+    def subscribe(self, game_id):
+        self._listen()
+        return super().subscribe(game_id)
+    
+    def _listen(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            os.makedirs(self.socket_dir, exist_ok=True)
+            # El nombre del host distingue procesos con el mismo pid en contenedores distintos
+            path = os.path.join(self.socket_dir, f'{socket.gethostname()}-{os.getpid()}-{id(self)}.sock')
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            listener.bind(path)
+            self._listener = listener
+        threading.Thread(target=self._read, args=(listener,), name='broadcast-listener', daemon=True).start()
+    
+    def _read(self, listener):
+        while True:
+            data = listener.recv(MAX_DATAGRAM)
+            try:
+                envelope = json.loads(data)
+                game_id, message = envelope['game'], envelope['message']
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Datagrama de difusión no válido", extra={'size': len(data)})
+                continue
+            self.deliver(game_id, message)
+    
+    def publish(self, game_id, message):
+        data = json.dumps({'game': str(game_id), 'message': message}, cls=DjangoJSONEncoder).encode()
+        try:
+            names = os.listdir(self.socket_dir)
+        except FileNotFoundError:
+            return
+        
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            for name in names:
+                path = os.path.join(self.socket_dir, name)
+                try:
+                    sender.sendto(data, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Proceso terminado: su socket ya no tiene lector
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                except OSError as error:
+                    logger.warning("No se pudo difundir el evento: %s", error, extra={'socket': path})
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _setting(name):
+    """Valor de settings o, si no está, de la variable de entorno del mismo nombre"""
+    from django.conf import settings
+    
+    return getattr(settings, name, None) or os.environ.get(name)
+
+
+def get_backend():
+    """Instancia única del backend configurado"""
+    global _backend
+    if _backend is None:
+        from django.utils.module_loading import import_string
+        
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(_setting('GAME_BROADCAST_BACKEND') or DEFAULT_BACKEND)()
+    return _backend
+
+
+def event_message(event):
+    """Mensaje difundido para un GameEvent"""
+    return {
+        'id': event.pk,
+        'event': event.kind,
+        'recipient': event.recipient_id,
+        'data': event.payload,
+    }
+
+
+def publish_event(event):
+    """Difunde un GameEvent ya confirmado"""
+    get_backend().publish(event.game_id, event_message(event))
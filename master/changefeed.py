@@ -0,0 +1,153 @@
+"""
+Feed de cambios de los juegos y su emisión como Server-Sent Events.
+
+Las mutaciones del juego llaman a record(); los dashboards mantienen abierta
+una conexión a game_events_view y reciben solo los eventos nuevos en lugar de
+pedir el estado completo cada pocos segundos.
+
+Dentro de un mismo proceso los streams se despiertan en cuanto se confirma un
+evento; los eventos escritos por otros procesos se recogen al vencer
+POLL_INTERVAL. Cada evento confirmado también se difunde a las conexiones
+WebSocket (master.broadcast y master.gateway).
+"""
+import asyncio
+import json
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Q
+
+POLL_INTERVAL = 2  # segundos entre lecturas del feed si no llega aviso
+HEARTBEAT_INTERVAL = 15  # comentario SSE para que los proxies no corten la conexión
+STREAM_MAX_SECONDS = 300  # el navegador reconecta solo con Last-Event-ID
+RETRY_MILLISECONDS = 3000
+BATCH_SIZE = 100
+
+_new_events = threading.Condition()
+
+
+def record(game, kind, recipient=None, **payload):
+    """Añade un evento al feed del juego y avisa a los streams al confirmar"""
+    from .models import GameEvent
+    
+    event = GameEvent.objects.create(game=game, kind=kind, recipient=recipient, payload=payload)
+    transaction.on_commit(lambda: _notify(event))
+    return event
+
+
+def _notify(event):
+    """Despierta los streams SSE de este proceso y difunde el evento por WebSocket"""
+    from .broadcast import publish_event
+    
+    with _new_events:
+        _new_events.notify_all()
+    publish_event(event)
+
+
+def wait_for_events(timeout):
+    """Bloquea hasta que se confirme un evento en este proceso o venza timeout"""
+    with _new_events:
+        _new_events.wait(timeout)
+
+
+def visible_events(game_id, after_id, player_id=None):
+    """Eventos del juego posteriores a after_id que puede ver el jugador (o el master si None)"""
+    from .models import GameEvent
+    
+    audience = Q(recipient__isnull=True)
+    if player_id is not None:
+        audience |= Q(recipient_id=player_id)
+    return GameEvent.objects.filter(game_id=game_id, id__gt=after_id).filter(audience).order_by('id')
+
+
+def latest_event_id(game_id):
+    from .models import GameEvent
+    
+    return GameEvent.objects.filter(game_id=game_id).aggregate(latest=Max('id'))['latest'] or 0
+
+
+def format_event(event):
+    """Serializa un evento en formato SSE"""
+    data = json.dumps(event.payload, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f"id: {event.pk}\nevent: {event.kind}\ndata: {data}\n\n"
+
+
+def stream(game_id, after_id, player_id=None, max_seconds=None):
+    """
+    Generador SSE con los eventos del juego desde after_id.
+    
+    Termina tras el evento 'finished' o al pasar max_seconds
+    (STREAM_MAX_SECONDS por defecto).
+    """
+    if max_seconds is None:
+        max_seconds = STREAM_MAX_SECONDS
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+    
+    while True:
+        events = list(visible_events(game_id, after_id, player_id)[:BATCH_SIZE])
+        for event in events:
+            after_id = event.pk
+            yield format_event(event)
+            if event.kind == 'finished':
+                return
+        
+        now = time.monotonic()
+        if events:
+            last_sent = now
+            if len(events) == BATCH_SIZE:
+                continue
+        elif now - last_sent >= HEARTBEAT_INTERVAL:
+            yield ": ping\n\n"
+            last_sent = now
+        
+        if now >= deadline:
+            return
+        wait_for_events(min(POLL_INTERVAL, deadline - now))
+
+
+async def astream(game_id, after_id, player_id=None, max_seconds=None):
+    """
+    stream() para servidores ASGI.
+    
+    Espera los avisos de master.broadcast en lugar de bloquear un hilo; los
+    eventos que no lleguen por la difusión se recogen igualmente al vencer
+    POLL_INTERVAL.
+    """
+    from asgiref.sync import sync_to_async
+    from .broadcast import get_backend
+    
+    if max_seconds is None:
+        max_seconds = STREAM_MAX_SECONDS
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    read = sync_to_async(lambda after: list(visible_events(game_id, after, player_id)[:BATCH_SIZE]))
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+    
+    with get_backend().subscribe(game_id) as subscription:
+        while True:
+            events = await read(after_id)
+            for event in events:
+                after_id = event.pk
+                yield format_event(event)
+                if event.kind == 'finished':
+                    return
+            
+            now = time.monotonic()
+            if events:
+                last_sent = now
+                if len(events) == BATCH_SIZE:
+                    continue
+            elif now - last_sent >= HEARTBEAT_INTERVAL:
+                yield ": ping\n\n"
+                last_sent = now
+            
+            if now >= deadline:
+                return
+            try:
+                await asyncio.wait_for(subscription.get(), min(POLL_INTERVAL, deadline - now))
+            except asyncio.TimeoutError:
+                pass
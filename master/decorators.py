@@ -0,0 +1,42 @@
+"""
+Decoradores de las vistas asíncronas que consultan los dashboards.
+
+Bajo ASGI estas vistas esperan a la base de datos sin ocupar un hilo por
+cada cliente que consulta; los decoradores de Django que llaman a funciones
+síncronas (condition() con su etag_func) no sirven aquí.
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+def api_login_required(view):
+    """
+    Como el permiso IsAuthenticated de DRF: 403 en JSON en lugar de
+    redirigir al login.
+    """
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'detail': 'Las credenciales de autenticación no se proveyeron.'}, status=403)
+        return await view(request, *args, **kwargs)
+    return inner
+
+
+def async_condition(etag_func):
+    """condition(etag_func=...) para vistas asíncronas con etag_func asíncrona"""
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = quote_etag(await etag_func(request, *args, **kwargs))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
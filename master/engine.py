@@ -0,0 +1,156 @@
+"""
+Motor del juego en memoria.
+
+Implementa las reglas de una ronda y del final de partida sin tocar la base de
+datos: los modelos cargan el estado en PlayerState, el motor lo modifica y los
+adaptadores de master.resolution guardan el resultado.
+
+resolution.resolve_round aplica estas mismas reglas con consultas sobre
+conjuntos; los tests comprueban que ambos caminos coinciden.
+"""
+SYMBOL_DEATH_REASON = "No has elegido tu símbolo correctamente"
+KARMA_MAX_DEATH_REASON = "has llegado a karma 6"
+KARMA_MIN_DEATH_REASON = "has llegado a karma 0"
+
+KARMA_MIN = 0
+KARMA_MAX = 6
+
+
+class PlayerState:
+    """Estado de un participante durante la resolución"""
+    __slots__ = (
+        'participant_id', 'player_id', 'display_name', 'suit_symbol', 'chosen_symbol',
+        'karma_score', 'truths_told', 'lies_told', 'current_game_score', 'is_dead', 'death_reason',
+        'died_in_round',
+    )
+    
+    def __init__(self, participant_id, player_id, display_name='', suit_symbol='', chosen_symbol='',
+                 karma_score=3, truths_told=0, lies_told=0, current_game_score=0, is_dead=False,
+                 death_reason='', died_in_round=None):
+        self.participant_id = participant_id
+        self.player_id = player_id
+        self.display_name = display_name
+        self.suit_symbol = suit_symbol
+        self.chosen_symbol = chosen_symbol
+        self.karma_score = karma_score
+        self.truths_told = truths_told
+        self.lies_told = lies_told
+        self.current_game_score = current_game_score
+        self.is_dead = is_dead
+        self.death_reason = death_reason
+        self.died_in_round = died_in_round
+    
+    def __repr__(self):
+        return f"PlayerState({self.display_name or self.player_id}, karma={self.karma_score}, dead={self.is_dead})"
+    
+    @property
+    def interactions(self):
+        return self.truths_told + self.lies_told
+
+
+def resolve_round(players, guesses):
+    """
+    Resuelve una ronda sobre `players` (lista de PlayerState) y los modifica.
+    
+    `guesses` son tuplas (teller_player_id, receiver_player_id, told_symbol) de
+    la ronda. Devuelve las muertes y los cambios de karma con el mismo formato
+    que resolution.resolve_round.
+    """
+    deaths = []
+    karma_changes = []
+    
+    # Muertes por símbolo: quien no eligió o eligió mal su palo
+    for state in players:
+        if not state.is_dead and state.suit_symbol and state.chosen_symbol != state.suit_symbol:
+            state.is_dead = True
+            state.death_reason = SYMBOL_DEATH_REASON
+            deaths.append(state)
+    
+    # Verdades y mentiras de cada emisor según el palo del receptor
+    suits = {state.player_id: state.suit_symbol for state in players}
+    truths = {}
+    lies = {}
+    for teller_id, receiver_id, told_symbol in guesses:
+        receiver_suit = suits.get(receiver_id)
+        if receiver_suit is None:
+            continue
+        tally = truths if told_symbol == receiver_suit else lies
+        tally[teller_id] = tally.get(teller_id, 0) + 1
+    
+    total_truths = total_lies = 0
+    for state in players:
+        told_truths = truths.get(state.player_id, 0)
+        told_lies = lies.get(state.player_id, 0)
+        state.truths_told += told_truths
+        state.lies_told += told_lies
+        total_truths += told_truths
+        total_lies += told_lies
+        
+        old_karma = state.karma_score
+        if told_lies > told_truths:
+            state.karma_score = min(old_karma + 1, KARMA_MAX)
+            reason = KARMA_MAX_DEATH_REASON if old_karma == KARMA_MAX - 1 else None
+        elif told_truths > told_lies:
+            state.karma_score = max(old_karma - 1, KARMA_MIN)
+            reason = KARMA_MIN_DEATH_REASON if old_karma == KARMA_MIN + 1 else None
+        else:
+            continue
+        
+        if state.karma_score != old_karma:
+            karma_changes.append({
+                'player_id': state.player_id,
+                'display_name': state.display_name,
+                'old_karma': old_karma,
+                'new_karma': state.karma_score,
+            })
+        # Solo muere por karma quien sigue vivo y cruza el límite en esta ronda
+        if reason and not state.is_dead:
+            state.is_dead = True
+            state.death_reason = reason
+            deaths.append(state)
+    
+    return {
+        'participants': len(players),
+        'guesses': len(guesses),
+        'truths': total_truths,
+        'lies': total_lies,
+        'deaths': [
+            {'player_id': state.player_id, 'display_name': state.display_name, 'reason': state.death_reason}
+            for state in deaths
+        ],
+        'karma_changes': karma_changes,
+    }
+
+
+def decide_winner(alive):
+    """
+    Decide el ganador entre los participantes vivos.
+    
+    Con un superviviente gana él; con dos, quien tenga más interacciones y,
+    si empatan, más mentiras. Devuelve (ganador o None, motivo).
+    """
+    alive_count = len(alive)
+    
+    if alive_count == 0:
+        return None, "Todos los jugadores han muerto. Nadie gana."
+    
+    if alive_count == 1:
+        winner = alive[0]
+        return winner, f"{winner.display_name} es el ganador (único superviviente)"
+    
+    if alive_count > 2:
+        return None, f"Juego finalizado con {alive_count} supervivientes"
+    
+    player1, player2 = sorted(alive, key=lambda state: (-state.lies_told, -state.truths_told))
+    player1_interactions = player1.interactions
+    player2_interactions = player2.interactions
+    
+    if player1_interactions > player2_interactions:
+        return player1, f"{player1.display_name} gana por más interacciones ({player1_interactions} vs {player2_interactions})"
+    if player2_interactions > player1_interactions:
+        return player2, f"{player2.display_name} gana por más interacciones ({player2_interactions} vs {player1_interactions})"
+    if player1.lies_told > player2.lies_told:
+        return player1, f"{player1.display_name} gana por más mentiras en empate de interacciones ({player1.lies_told} vs {player2.lies_told})"
+    if player2.lies_told > player1.lies_told:
+        return player2, f"{player2.display_name} gana por más mentiras en empate de interacciones ({player2.lies_told} vs {player1.lies_told})"
+    return None, f"Empate entre {player1.display_name} y {player2.display_name} (mismas interacciones y mentiras)"
@@ -0,0 +1,76 @@
+"""
+ETags de las vistas que los navegadores consultan periódicamente.
+
+Se calculan con una o dos consultas a partir de Game.state_version, de modo que
+un If-None-Match que coincide se responde con 304 sin construir el JSON. Son
+asíncronas, como las vistas que las usan (ver decorators.async_condition). Los
+campos que dependen del reloj (tiempo restante) no forman parte de la
+versión: los clientes calculan la cuenta atrás a partir del inicio de ronda.
+"""
+from django.db.models import Count, Max, Q, Sum
+
+
+async def _lobby_etag():
+    """Sala de espera: jugadores, conectados y última actividad"""
+    from players.models import Player
+    
+    lobby = await Player.objects.aaggregate(
+        players=Count('pk'), online=Count('pk', filter=Q(is_online=True)), activity=Max('last_activity')
+    )
+    activity = lobby['activity'].timestamp() if lobby['activity'] else 0
+    return f"lobby-{lobby['players']}-{lobby['online']}-{activity}"
+
+
+async def _current_game_version():
+    """(pk, state_version) del juego activo o en espera, o None"""
+    from .models import Game
+    
+    return await Game.objects.filter(
+        status__in=['waiting', 'active']
+    ).values_list('pk', 'state_version').afirst()
+
+
+async def dashboard_etag(request, *args, **kwargs):
+    """Juego actual y su versión; sin juego, el estado de la sala de espera"""
+    from players.models import Player
+    
+    current = await _current_game_version()
+    if current:
+        # El total de jugadores también aparece en las estadísticas del panel
+        return f"game-{current[0].hex}-{current[1]}-{await Player.objects.acount()}"
+    return await _lobby_etag()
+
+
+async def player_state_etag(request, *args, **kwargs):
+    """Como el del dashboard, pero por usuario: la respuesta omite al propio jugador"""
+    user = await request.auser()
+    current = await _current_game_version()
+    if current:
+        return f"game-{current[0].hex}-{current[1]}-{user.pk}"
+    return f"{await _lobby_etag()}-{user.pk}"
+
+
+async def player_guesses_etag(request, *args, **kwargs):
+    """Juego activo, su versión y el usuario (las comunicaciones son de cada jugador)"""
+    from .models import Game
+    
+    user = await request.auser()
+    active = await Game.objects.filter(status='active').values_list('pk', 'state_version').afirst()
+    if active is None:
+        return f"no-game-{user.pk}"
+    return f"game-{active[0].hex}-{active[1]}-{user.pk}"
+
+
+async def games_etag(request, *args, **kwargs):
+    """Resumen de todos los juegos: cambia al crear, finalizar o modificar cualquiera"""
+    from .models import Game
+    
+    games = await Game.objects.aaggregate(
+        games=Count('pk'),
+        finished=Count('pk', filter=Q(status='finished')),
+        versions=Sum('state_version'),
+        latest=Max('created_at'),
+    )
+    latest = games['latest'].timestamp() if games['latest'] else 0
+    user = await request.auser()
+    return f"games-{games['games']}-{games['finished']}-{games['versions'] or 0}-{latest}-{user.pk}"
@@ -0,0 +1,66 @@
+"""
+Registro del juego.
+
+Sustituye a los print(): todos los mensajes cuelgan del logger "mindgame",
+se formatean solo si su nivel está activo y salen por una cola que vacía un
+hilo aparte, de modo que las peticiones nunca esperan a stdout.
+
+Configuración opcional en settings:
+    GAME_LOG_LEVEL  nivel del logger "mindgame" (por defecto "INFO")
+    GAME_LOG_QUEUE  False para escribir directamente, sin cola (por defecto True)
+
+Si el proyecto ya configura el logger "mindgame" en LOGGING no se toca.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+
+ROOT_LOGGER = 'mindgame'
+
+# Atributos estándar de LogRecord: el resto son datos estructurados (extra=...)
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def get_logger(name):
+    """Logger hijo de "mindgame" (p. ej. get_logger('rounds') → mindgame.rounds)"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+class StructuredFormatter(logging.Formatter):
+    """Añade al mensaje los campos pasados en extra= como clave=valor"""
+    
+    def format(self, record):
+        message = super().format(record)
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+        if fields:
+            message += ' ' + ' '.join(f'{key}={value}' for key, value in sorted(fields.items()))
+        return message
+
+
+def configure():
+    """Instala la cola y su hilo escritor (idempotente)"""
+    global _listener
+    from django.conf import settings
+    
+    logger = logging.getLogger(ROOT_LOGGER)
+    if logger.handlers:
+        return
+    
+    logger.setLevel(getattr(settings, 'GAME_LOG_LEVEL', 'INFO'))
+    logger.propagate = False
+    
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    
+    if not getattr(settings, 'GAME_LOG_QUEUE', True):
+        logger.addHandler(handler)
+        return
+    
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
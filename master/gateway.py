@@ -0,0 +1,169 @@
+"""
+Gateway WebSocket de los eventos del juego (ASGI).
+
+    ws(s)://<host>/ws/game/<uuid del juego>/[?since=<id de evento>]
+
+Mismo contrato que el stream SSE (game_events_view): el master recibe los
+eventos públicos y cada jugador, además, los suyos. Cada mensaje es un JSON
+{"id", "event", "data"}; con ?since= se reenvían antes los eventos
+posteriores guardados en el feed. La conexión se cierra tras 'finished'.
+
+La sesión de Django (cookie) identifica al usuario. Para servirlo junto a
+las vistas HTTP, en el asgi.py del proyecto:
+    
+    from master.gateway import websocket_router
+    application = websocket_router(get_asgi_application())
+"""
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import broadcast, changefeed
+from .gamelog import get_logger
+
+logger = get_logger('gateway')
+
+PATH_RE = re.compile(r'^/ws/game/(?P<game_id>[0-9a-fA-F-]{32,36})/$')
+
+# Códigos de cierre propios (rango 4000-4999 de la especificación)
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+CLOSE_NORMAL = 1000
+
+# Segundos sin avisos tras los que se consulta el feed igualmente
+CATCH_UP_INTERVAL = 5
+
+
+def websocket_router(http_application):
+    """Aplicación ASGI: WebSocket al gateway y el resto a `http_application`"""
+    async def application(scope, receive, send):
+        if scope['type'] == 'websocket':
+            return await game_events_socket(scope, receive, send)
+        return await http_application(scope, receive, send)
+    return application
+
+
+def _session_user(scope):
+    """Usuario de la sesión de Django indicada en las cookies del handshake"""
+    from http.cookies import SimpleCookie
+    from importlib import import_module
+    
+    from django.conf import settings
+    from django.contrib.auth import get_user
+    from django.http import HttpRequest
+    
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    session_key = cookies[settings.SESSION_COOKIE_NAME].value if settings.SESSION_COOKIE_NAME in cookies else None
+    
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    return get_user(request)
+
+
+def _authorize(scope, game_id):
+    """
+    (código de cierre, None) si no puede suscribirse; (None, player_id) si
+    puede, con player_id None para el master.
+    """
+    from players.models import Player
+    from .models import Game
+    
+    user = _session_user(scope)
+    if not user.is_authenticated:
+        return CLOSE_FORBIDDEN, None
+    if not Game.objects.filter(pk=game_id).exists():
+        return CLOSE_NOT_FOUND, None
+    if user.is_staff:
+        return None, None
+    
+    player_id = Player.objects.filter(user=user).values_list('id', flat=True).first()
+    if player_id is None:
+        return CLOSE_FORBIDDEN, None
+    return None, player_id
+
+
+def _backlog(game_id, since, player_id):
+    """Eventos pendientes desde `since` (o ninguno) y el último id ya cubierto"""
+    if since is None:
+        return changefeed.latest_event_id(game_id), []
+    events = [broadcast.event_message(event) for event in changefeed.visible_events(game_id, since, player_id)]
+    return (events[-1]['id'] if events else since), events
+
+
+def _parse_since(scope):
+    try:
+        return int(parse_qs(scope.get('query_string', b'').decode())['since'][0])
+    except (KeyError, ValueError):
+        return None
+
+
+async def _send_event(send, message):
+    text = json.dumps(
+        {'id': message['id'], 'event': message['event'], 'data': message['data']},
+        cls=DjangoJSONEncoder, ensure_ascii=False,
+    )
+    await send({'type': 'websocket.send', 'text': text})
+
+
+async def game_events_socket(scope, receive, send):
+    """Conexión WebSocket suscrita a los eventos de un juego"""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    
+    match = PATH_RE.match(scope['path'])
+    if match is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    game_id = match['game_id']
+    
+    close_code, player_id = await sync_to_async(_authorize)(scope, game_id)
+    if close_code is not None:
+        await send({'type': 'websocket.close', 'code': close_code})
+        return
+    
+    # Suscribirse antes de leer el feed: lo que llegue entre medias no se pierde
+    with broadcast.get_backend().subscribe(game_id) as subscription:
+        await send({'type': 'websocket.accept'})
+        after_id, backlog = await sync_to_async(_backlog)(game_id, _parse_since(scope), player_id)
+        for message in backlog:
+            await _send_event(send, message)
+            if message['event'] == 'finished':
+                await send({'type': 'websocket.close', 'code': CLOSE_NORMAL})
+                return
+        
+        client = asyncio.ensure_future(receive())
+        try:
+            while True:
+                update = asyncio.ensure_future(subscription.get())
+                await asyncio.wait({client, update}, timeout=CATCH_UP_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+                woken = update.done()
+                if not woken:
+                    update.cancel()
+                
+                if woken or not client.done():
+                    # El aviso solo despierta: se lee el feed desde el último enviado, así
+                    # también salen en orden los eventos cuyo aviso no llegó a este proceso
+                    # (p. ej. InProcessBroadcast con varios workers)
+                    subscription.discard_pending()
+                    after_id, messages = await sync_to_async(_backlog)(game_id, after_id, player_id)
+                    for message in messages:
+                        await _send_event(send, message)
+                        if message['event'] == 'finished':
+                            await send({'type': 'websocket.close', 'code': CLOSE_NORMAL})
+                            return
+                
+                if client.done():
+                    if client.result()['type'] == 'websocket.disconnect':
+                        return
+                    # Los mensajes del cliente no se usan
+                    client = asyncio.ensure_future(receive())
+        finally:
+            client.cancel()
+            logger.debug("Conexión WebSocket cerrada", extra={'game': game_id, 'player': player_id})
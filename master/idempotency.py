@@ -0,0 +1,85 @@
+"""
+Reintentos baratos para los POST de la API.
+
+Un cliente que envía la cabecera Idempotency-Key recibe, en los reintentos con
+la misma clave, la respuesta guardada de la primera petición sin volver a
+ejecutar la acción.
+
+Mientras la primera petición está en curso los reintentos reciben 409. Si el
+proceso que la atendía muere sin terminarla, su clave solo bloquea durante
+IN_FLIGHT_LEASE: pasado ese plazo el siguiente reintento la toma y ejecuta la
+acción. Las respuestas guardadas duran lo que IdempotentRequest.cleanup_expired.
+"""
+import functools
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IN_FLIGHT_LEASE = timezone.timedelta(seconds=30)
+
+
+def _scoped_key(request, key):
+    """La clave solo vale para el mismo usuario y la misma ruta"""
+    raw = f"{request.user.pk}:{request.path}:{key}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _take_over(record):
+    """Toma una clave en curso cuyo plazo venció (solo un reintento lo consigue)"""
+    now = timezone.now()
+    if record.created_at > now - IN_FLIGHT_LEASE:
+        return False
+    taken = type(record).objects.filter(
+        pk=record.pk, status_code__isnull=True, created_at=record.created_at
+    ).update(created_at=now)
+    record.created_at = now
+    return taken == 1
+
+
+def idempotent(view_method):
+    """Decorador para acciones POST de un ViewSet"""
+    
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        from .models import IdempotentRequest
+        
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        
+        scoped_key = _scoped_key(request, key)
+        try:
+            with transaction.atomic():
+                record = IdempotentRequest.objects.create(key=scoped_key)
+        except IntegrityError:
+            record = IdempotentRequest.objects.get(key=scoped_key)
+            if record.status_code is not None:
+                response = Response(record.response, status=record.status_code)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+            if not _take_over(record):
+                return Response(
+                    {'error': 'Ya hay una petición en curso con esta clave'},
+                    status=status.HTTP_409_CONFLICT
+                )
+        
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        
+        if response.status_code >= 500:
+            # Los errores del servidor se pueden reintentar de verdad
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response = response.data
+            record.save(update_fields=['status_code', 'response'])
+        return response
+    
+    return wrapper
@@ -0,0 +1,120 @@
+"""
+Ranking de los participantes de un juego con paginación por cursor.
+
+El orden es karma, puntuación y secretos descubiertos, de mayor a menor, y el
+id del jugador para desempatar: un orden total, para que un cursor señale
+siempre la misma posición. El índice participant_leaderboard_idx sigue ese
+orden, así que la base de datos lo mantiene al día con cada cambio de karma,
+puntuación o contadores y ninguna consulta ordena la tabla:
+
+    - los N primeros son una lectura del índice con LIMIT;
+    - el puesto de un jugador es 1 + los participantes por delante de su clave;
+    - las páginas siguen (after) o preceden (before) a un cursor, o se centran
+      en un jugador (around), sin OFFSET.
+
+El cursor es la clave de la fila en la que termina o empieza una página,
+"karma.puntuación.secretos.id del jugador", y sigue siendo válido aunque esa
+fila cambie de puesto después.
+"""
+from django.db.models import Q
+
+KEY_FIELDS = ('karma_score', 'current_game_score', 'secrets_discovered_this_game', 'player_id')
+ORDERING = ['-karma_score', '-current_game_score', '-secrets_discovered_this_game', 'player_id']
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def key(participant):
+    """Clave de orden de un participante"""
+    return tuple(getattr(participant, field) for field in KEY_FIELDS)
+
+
+def encode_cursor(participant):
+    return '.'.join(str(value) for value in key(participant))
+
+
+def decode_cursor(value):
+    """Clave de un cursor; ValueError si no es válido"""
+    parts = value.split('.')
+    if len(parts) != len(KEY_FIELDS):
+        raise ValueError(f"Cursor inválido: {value!r}")
+    return tuple(int(part) for part in parts)
+
+
+def ahead_of(key):
+    """Participantes que van por delante de la clave"""
+    karma, score, secrets, player_id = key
+    return (
+        Q(karma_score__gt=karma)
+        | Q(karma_score=karma, current_game_score__gt=score)
+        | Q(karma_score=karma, current_game_score=score, secrets_discovered_this_game__gt=secrets)
+        | Q(karma_score=karma, current_game_score=score, secrets_discovered_this_game=secrets, player_id__lt=player_id)
+    )
+
+
+def behind(key):
+    """Participantes que van por detrás de la clave"""
+    karma, score, secrets, player_id = key
+    return (
+        Q(karma_score__lt=karma)
+        | Q(karma_score=karma, current_game_score__lt=score)
+        | Q(karma_score=karma, current_game_score=score, secrets_discovered_this_game__lt=secrets)
+        | Q(karma_score=karma, current_game_score=score, secrets_discovered_this_game=secrets, player_id__gt=player_id)
+    )
+
+
+async def _fetch(queryset, limit):
+    return [participant async for participant in queryset[:limit]]
+
+
+async def apage(game, limit=DEFAULT_LIMIT, after=None, before=None, around=None):
+    """
+    Página del ranking: los primeros, los que siguen a la clave `after`, los
+    que preceden a `before` o los que rodean al jugador `around`.
+    
+    Devuelve (participantes con su `rank`, cursor siguiente, cursor anterior);
+    los cursores son None en los extremos. None si `around` no participa.
+    """
+    ranked = game.participants.select_related('player__user').order_by(*ORDERING)
+    
+    if around is not None:
+        center = await game.participants.filter(player_id=around).values_list(*KEY_FIELDS).afirst()
+        if center is None:
+            return None
+        # El jugador queda en medio: la mitad de la página por delante y el resto desde él
+        half = (limit - 1) // 2
+        preceding = await _fetch(ranked.filter(ahead_of(center)).reverse(), half + 1)
+        has_previous = len(preceding) > half
+        rows = preceding[:half][::-1]
+        following = await _fetch(ranked.exclude(ahead_of(center)), limit - len(rows) + 1)
+        has_next = len(following) > limit - len(rows)
+        rows += following[:limit - len(rows)]
+    elif before is not None:
+        preceding = await _fetch(ranked.filter(ahead_of(before)).reverse(), limit + 1)
+        has_previous = len(preceding) > limit
+        rows = preceding[:limit][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            ranked = ranked.filter(behind(after))
+        rows = await _fetch(ranked, limit + 1)
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_previous = after is not None
+    
+    if not rows:
+        return [], None, None
+    
+    # Sin nada por delante la página empieza en el primer puesto
+    first_rank = 1
+    if has_previous:
+        first_rank = await game.participants.filter(ahead_of(key(rows[0]))).acount() + 1
+    for position, participant in enumerate(rows):
+        participant.rank = first_rank + position
+    
+    return (
+        rows,
+        encode_cursor(rows[-1]) if has_next else None,
+        encode_cursor(rows[0]) if has_previous else None,
+    )
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from master.scheduler import round_scheduler
+
+
+class Command(BaseCommand):
+    help = "Ejecuta el planificador de rondas en este proceso (uno solo por despliegue)"
+    
+    def handle(self, *args, **options):
+        round_scheduler.start()
+        self.stdout.write("Planificador de rondas en marcha")
+        try:
+            while round_scheduler.is_running:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            round_scheduler.stop(timeout=5)
@@ -0,0 +1,276 @@
+"""
+Métricas del juego en formato de texto de Prometheus.
+
+Contadores e histogramas se acumulan en memoria de cada proceso (un cerrojo
+que solo protege la suma) y cada proceso vuelca su copia, como mucho cada
+FLUSH_INTERVAL segundos, a un fichero propio en GAME_METRICS_DIR. La vista
+metrics_view suma los ficheros de todos los workers, así que da igual a cuál
+llegue el scrape.
+
+Los gauges no cuentan filas en cada scrape: los de cada juego salen de sus
+contadores desnormalizados (Game.participant_count, alive_count,
+round_guess_count) y los jugadores conectados de una instantánea de
+master.snapshots que dura GAUGE_TTL segundos.
+
+Se activa con MetricsMiddleware en MIDDLEWARE y la ruta metrics/ de
+master.urls. Configuración opcional en settings:
+    GAME_METRICS_DIR    directorio de los volcados por proceso (por defecto <tmp>/mindgame-metrics);
+                        también como variable de entorno. Con varios contenedores (el scheduler
+                        resuelve las rondas) debe ser un volumen compartido
+    GAME_METRICS_TOKEN  si se define, un scrape con "Authorization: Bearer <token>" no necesita sesión
+    GAME_METRICS_PUBLIC True para servir las métricas sin autenticar (por defecto solo staff o token)
+"""
+import bisect
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .gamelog import get_logger
+from .queryprofile import capture, install
+
+logger = get_logger('metrics')
+
+FLUSH_INTERVAL = 5
+GAUGE_TTL = 15
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_counters = {}  # (nombre, etiquetas) -> valor
+_histograms = {}  # (nombre, etiquetas) -> [cuentas por bucket..., +Inf, suma]
+_metrics = {}  # nombre -> métrica registrada
+_last_flush = 0.0
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter:
+    """Contador monótono"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        _metrics[name] = self
+    
+    def inc(self, amount=1, **labels):
+        key = (self.name, _label_key(labels))
+        with _lock:
+            _counters[key] = _counters.get(key, 0) + amount
+        _maybe_flush()
+
+
+class Histogram:
+    """Histograma de buckets fijos"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        _metrics[name] = self
+    
+    def observe(self, value, **labels):
+        key = (self.name, _label_key(labels))
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            values = _histograms.get(key)
+            if values is None:
+                values = _histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            values[index] += 1
+            values[-1] += value
+        _maybe_flush()
+
+
+REQUEST_SECONDS = Histogram('mindgame_request_duration_seconds', 'Duración de las peticiones por vista')
+REQUEST_QUERIES = Counter('mindgame_request_queries_total', 'Consultas SQL de las peticiones por vista')
+ROUND_RESOLUTION_SECONDS = Histogram(
+    'mindgame_round_resolution_seconds', 'Duración de Game.advance_round (resolución y nueva ronda)'
+)
+
+
+def metrics_dir():
+    from django.conf import settings
+    
+    directory = getattr(settings, 'GAME_METRICS_DIR', None) or os.environ.get('GAME_METRICS_DIR')
+    return directory or os.path.join(tempfile.gettempdir(), 'mindgame-metrics')
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Vuelca la copia de este proceso a su fichero (escritura atómica)"""
+    global _last_flush
+    with _lock:
+        _last_flush = time.monotonic()
+        data = {
+            'counters': [[name, labels, value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, labels, values] for (name, labels), values in _histograms.items()],
+        }
+    
+    directory = metrics_dir()
+    # El nombre del host distingue procesos con el mismo pid en contenedores distintos
+    path = os.path.join(directory, f'{socket.gethostname()}-{os.getpid()}.json')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as output:
+            json.dump(data, output)
+        os.replace(temporary, path)
+    except OSError as error:
+        logger.warning("No se pudieron volcar las métricas: %s", error, extra={'path': path})
+
+
+def collect():
+    """Contadores e histogramas sumados de todos los procesos"""
+    flush()
+    counters, histograms = {}, {}
+    directory = metrics_dir()
+    try:
+        filenames = os.listdir(directory)
+    except FileNotFoundError:
+        # Ningún proceso ha podido volcar todavía
+        filenames = []
+    for filename in filenames:
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as source:
+                data = json.load(source)
+        except (OSError, ValueError):
+            continue
+        
+        for name, labels, value in data['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in data['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.get(key)
+            histograms[key] = values if total is None else [a + b for a, b in zip(total, values)]
+    return counters, histograms
+
+
+def _online_players():
+    from players.models import Player
+    from . import snapshots
+    
+    # La "versión" es el intervalo de GAUGE_TTL segundos en curso
+    return snapshots.get_or_build(
+        'metrics-online', 'all', int(time.time() // GAUGE_TTL),
+        lambda: Player.objects.filter(is_online=True).count(),
+    )
+
+
+def _gauge_lines():
+    from .models import Game
+    
+    # Contadores desnormalizados del propio juego: una lectura sin COUNT
+    games = [
+        ((('game', game_id.hex),), counts)
+        for game_id, *counts in Game.objects.filter(status__in=['waiting', 'active']).values_list(
+            'pk', 'participant_count', 'alive_count', 'current_round', 'round_guess_count'
+        )
+    ]
+    gauges = [
+        ('mindgame_players_online', 'Jugadores conectados', [((), _online_players())]),
+        ('mindgame_game_players', 'Jugadores inscritos por juego',
+         [(labels, counts[0]) for labels, counts in games]),
+        ('mindgame_game_alive_players', 'Jugadores vivos por juego',
+         [(labels, counts[1]) for labels, counts in games]),
+        ('mindgame_game_round', 'Ronda actual por juego',
+         [(labels, counts[2]) for labels, counts in games]),
+        ('mindgame_round_guesses', 'Comunicaciones de la ronda actual por juego',
+         [(labels, counts[3]) for labels, counts in games]),
+    ]
+    
+    lines = []
+    for name, documentation, samples in gauges:
+        lines += [f'# HELP {name} {documentation}', f'# TYPE {name} gauge']
+        lines += [f'{name}{_format_labels(labels)} {value}' for labels, value in samples]
+    return lines
+
+
+def render():
+    """Texto de exposición de Prometheus con todas las métricas"""
+    counters, histograms = collect()
+    lines = []
+    for name, metric in _metrics.items():
+        lines += [f'# HELP {name} {metric.documentation}', f'# TYPE {name} {metric.kind}']
+        if metric.kind == 'counter':
+            lines += [
+                f'{name}{_format_labels(labels)} {value}'
+                for (sample_name, labels), value in sorted(counters.items()) if sample_name == name
+            ]
+            continue
+        
+        for (sample_name, labels), values in sorted(histograms.items()):
+            if sample_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {values[-1]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    
+    lines += _gauge_lines()
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Duración y consultas de cada petición, por nombre de vista"""
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with capture() as profile:
+            response = self.get_response(request)
+        self.observe(request, time.perf_counter() - started, profile)
+        return response
+    
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with capture() as profile:
+            response = await self.get_response(request)
+        self.observe(request, time.perf_counter() - started, profile)
+        return response
+    
+    def observe(self, request, elapsed, profile):
+        match = request.resolver_match
+        # Sin resolver no se usa la ruta: cada URL inventada sería una serie nueva
+        view = match.view_name if match else '<unresolved>'
+        REQUEST_SECONDS.observe(elapsed, view=view)
+        REQUEST_QUERIES.inc(profile.count, view=view)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:52
+
+import master.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0007_merge_20250806_1651'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='rng_seed',
+            field=models.BigIntegerField(default=master.models.generate_rng_seed, verbose_name='Semilla aleatoria'),
+        ),
+    ]
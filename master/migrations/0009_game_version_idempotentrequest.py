@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0008_game_rng_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotentRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Clave')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Código de respuesta')),
+                ('response', models.JSONField(blank=True, null=True, verbose_name='Respuesta')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Petición idempotente',
+                'verbose_name_plural': 'Peticiones idempotentes',
+            },
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Versión'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0009_game_version_idempotentrequest'),
+        ('players', '0009_playerguess_round_receiver_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameResult',
+            fields=[
+                ('game', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result', serialize=False, to='master.game')),
+                ('winner_reason', models.CharField(max_length=255, verbose_name='Motivo')),
+                ('alive_count', models.IntegerField(verbose_name='Supervivientes')),
+                ('is_tie', models.BooleanField(default=False, verbose_name='Empate')),
+                ('final_stats', models.JSONField(default=list, verbose_name='Estadísticas finales')),
+                ('finished_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de fin')),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='won_games', to='players.player', verbose_name='Ganador')),
+            ],
+            options={
+                'verbose_name': 'Resultado',
+                'verbose_name_plural': 'Resultados',
+                'ordering': ['-finished_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:03
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0010_gameresult'),
+        ('players', '0009_playerguess_round_receiver_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('round', 'Nueva ronda'), ('pause', 'Pausa o reanudación'), ('finished', 'Juego finalizado'), ('roster', 'Cambio de jugadores'), ('guess', 'Comunicación recibida')], max_length=20)),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='master.game')),
+                ('recipient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='game_events', to='players.player')),
+            ],
+            options={
+                'verbose_name': 'Evento de juego',
+                'verbose_name_plural': 'Eventos de juego',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['game', 'id'], name='game_event_feed_idx')],
+            },
+        ),
+    ]
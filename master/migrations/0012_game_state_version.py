@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0011_gameevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='state_version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Versión del estado'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0012_game_state_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='roster_reset_version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Versión de la lista completa'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0013_game_roster_reset_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoundSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round_number', models.IntegerField(verbose_name='Ronda')),
+                ('participants', models.IntegerField(verbose_name='Participantes')),
+                ('guesses', models.IntegerField(verbose_name='Comunicaciones')),
+                ('truths', models.IntegerField(verbose_name='Verdades')),
+                ('lies', models.IntegerField(verbose_name='Mentiras')),
+                ('deaths', models.JSONField(default=list, verbose_name='Muertes')),
+                ('karma_changes', models.JSONField(default=list, verbose_name='Cambios de karma')),
+                ('resolution_ms', models.FloatField(verbose_name='Tiempo de resolución (ms)')),
+                ('query_count', models.IntegerField(verbose_name='Consultas de la resolución')),
+                ('resolved_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='round_summaries', to='master.game')),
+            ],
+            options={
+                'verbose_name': 'Resumen de ronda',
+                'verbose_name_plural': 'Resúmenes de ronda',
+                'ordering': ['round_number'],
+                'constraints': [models.UniqueConstraint(fields=('game', 'round_number'), name='round_summary_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0014_roundsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['status', '-created_at'], name='game_status_created_idx'),
+        ),
+    ]
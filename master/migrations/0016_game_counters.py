@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:35
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Calcula los contadores de los juegos existentes"""
+    Game = apps.get_model('master', 'Game')
+    GameParticipant = apps.get_model('players', 'GameParticipant')
+    PlayerGuess = apps.get_model('players', 'PlayerGuess')
+    
+    def count(queryset):
+        counts = queryset.order_by().values('game').annotate(total=Count('pk')).values('total')[:1]
+        return Coalesce(Subquery(counts), Value(0))
+    
+    participants = GameParticipant.objects.filter(game=OuterRef('pk'))
+    Game.objects.update(
+        participant_count=count(participants),
+        alive_count=count(participants.filter(is_dead=False)),
+        round_guess_count=count(PlayerGuess.objects.filter(game=OuterRef('pk'), round_number=OuterRef('current_round'))),
+    )
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('master', '0015_hot_filter_indexes'),
+        ('players', '0011_hot_filter_indexes'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='alive_count',
+            field=models.IntegerField(default=0, verbose_name='Jugadores vivos'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='participant_count',
+            field=models.IntegerField(default=0, verbose_name='Participantes'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='round_guess_count',
+            field=models.IntegerField(default=0, verbose_name='Comunicaciones de la ronda'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
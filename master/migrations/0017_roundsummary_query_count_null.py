@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('master', '0016_game_counters'),
+    ]
+    
+    operations = [
+        migrations.AlterField(
+            model_name='roundsummary',
+            name='query_count',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Consultas de la resolución'),
+        ),
+    ]
@@ -1,8 +1,27 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+import logging
+import random
+import secrets
+import time
 import uuid
 
+from .gamelog import get_logger
+from .metrics import ROUND_RESOLUTION_SECONDS
+from .profiling import profiled
+from .queryprofile import capture, installed
+
+logger = get_logger('rounds')
+
+
+def generate_rng_seed():
+    """Semilla aleatoria para la secuencia de símbolos de un juego"""
+    return secrets.randbits(62)
+
+
 class Game(models.Model):
     """Modelo que representa una partida del juego local"""
     GAME_STATUS_CHOICES = [
@@ -29,32 +48,163 @@ class Game(models.Model):
     paused_at = models.DateTimeField(null=True, blank=True, verbose_name="Momento de pausa")
     paused_duration = models.IntegerField(default=0, verbose_name="Duración total pausada (segundos)")
     
+    # Semilla del reparto de símbolos: con la misma semilla las rondas se repiten igual
+    rng_seed = models.BigIntegerField(default=generate_rng_seed, verbose_name="Semilla aleatoria")
+    
+    # Versión del estado: cada transición la incrementa (compare-and-swap)
+    version = models.PositiveIntegerField(default=0, verbose_name="Versión")
+    
+    # Versión de lo que ven los dashboards: la sube cualquier cambio del juego o
+    # de sus jugadores (ETag de las vistas consultadas periódicamente)
+    state_version = models.PositiveBigIntegerField(default=0, verbose_name="Versión del estado")
+    # Última versión en la que cambió toda la lista de jugadores (nueva ronda,
+    # inscripciones en bloque o bajas): desde antes no sirve una actualización parcial
+    roster_reset_version = models.PositiveBigIntegerField(default=0, verbose_name="Versión de la lista completa")
+    
+    # Contadores desnormalizados para leer sin COUNT. Solo cambian dentro de
+    # UPDATE atómicas (ver bump_state_version) y reconcile_counters corrige
+    # cualquier desvío
+    participant_count = models.IntegerField(default=0, verbose_name="Participantes")
+    alive_count = models.IntegerField(default=0, verbose_name="Jugadores vivos")
+    round_guess_count = models.IntegerField(default=0, verbose_name="Comunicaciones de la ronda")
+    
     class Meta:
         verbose_name = "Juego"
         verbose_name_plural = "Juegos"
         ordering = ['-created_at']
+        indexes = [
+            # Juego actual o activo (get_current_game, ETags, dashboards), ya ordenado
+            models.Index(fields=['status', '-created_at'], name='game_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - Ronda {self.current_round} - {self.get_status_display()}"
     
+    COUNTER_FIELDS = {'participant_count', 'alive_count', 'round_guess_count'}
+    # Solo cambian con F() en su propia UPDATE (claim_transition, bump_state_version):
+    # un save() desde una copia antigua las haría retroceder
+    VERSION_FIELDS = {'version', 'state_version', 'roster_reset_version'}
+    
+    def save(self, *args, **kwargs):
+        # La versión del estado se incrementa en la propia UPDATE, nunca desde el
+        # valor en memoria (que puede haber quedado atrás por otro proceso)
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        
+        if kwargs.get('update_fields') is None:
+            # Tampoco se escriben los contadores en memoria: pisarían los de otros procesos
+            skipped = self.COUNTER_FIELDS | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        self.state_version = F('state_version') + 1
+        kwargs['update_fields'] = {
+            *(name for name in kwargs['update_fields'] if name not in self.VERSION_FIELDS), 'state_version'
+        }
+        super().save(*args, **kwargs)
+        # El valor real queda diferido: se lee de la base de datos solo si se usa
+        del self.state_version
+    
+    @classmethod
+    def bump_state_version(cls, reset_roster=False, counters=None, **filters):
+        """
+        Sube la versión del estado de los juegos indicados sin cargarlos.
+        
+        Con reset_roster los clientes reciben la lista completa de jugadores en
+        su siguiente consulta, aunque pidan solo los cambios. `counters` son
+        cambios de los contadores en la misma UPDATE (ver increments y recount).
+        """
+        changes = {'state_version': F('state_version') + 1, **(counters or {})}
+        if reset_roster:
+            changes['roster_reset_version'] = F('state_version') + 1
+        cls.objects.filter(**filters).update(**changes)
+    
+    @staticmethod
+    def increments(**deltas):
+        """Contadores que suben o bajan en la propia UPDATE (p. ej. alive_count=-1)"""
+        return {name: F(name) + delta for name, delta in deltas.items()}
+    
+    @staticmethod
+    def recount():
+        """Contadores recalculados desde participantes y comunicaciones, para una UPDATE"""
+        from django.db.models import Count, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce
+        from players.models import GameParticipant, PlayerGuess
+        
+        def count(queryset):
+            counts = queryset.order_by().values('game').annotate(total=Count('pk')).values('total')[:1]
+            return Coalesce(Subquery(counts), Value(0))
+        
+        participants = GameParticipant.objects.filter(game=OuterRef('pk'))
+        return {
+            'participant_count': count(participants),
+            'alive_count': count(participants.filter(is_dead=False)),
+            'round_guess_count': count(PlayerGuess.objects.filter(
+                game=OuterRef('pk'), round_number=OuterRef('current_round')
+            )),
+        }
+    
+    @classmethod
+    def reconcile_counters(cls, **filters):
+        """Corrige los contadores que no cuadren con las tablas; devuelve cuántos juegos"""
+        recount = cls.recount()
+        drifted = list(cls.objects.filter(**filters).annotate(
+            **{f'actual_{name}': expression for name, expression in recount.items()}
+        ).exclude(
+            **{name: F(f'actual_{name}') for name in recount}
+        ).values_list('pk', flat=True))
+        if drifted:
+            logger.warning("Contadores desviados en %d juegos", len(drifted))
+            cls.bump_state_version(counters=recount, pk__in=drifted)
+        return len(drifted)
+    
+    def claim_transition(self):
+        """
+        Reserva la siguiente transición de estado del juego.
+        
+        Debe llamarse dentro de una transacción. Bloquea la fila donde la base de
+        datos lo permite y solo incrementa la versión si sigue siendo la que se
+        leyó: si otro proceso ya cambió el juego devuelve False y no toca nada.
+        """
+        current_version = Game.objects.select_for_update().filter(
+            pk=self.pk
+        ).values_list('version', flat=True).first()
+        if current_version != self.version:
+            return False
+        
+        claimed = Game.objects.filter(pk=self.pk, version=self.version).update(
+            version=F('version') + 1
+        )
+        if not claimed:
+            return False
+        
+        self.version += 1
+        return True
+    
+    @profiled('Game.start_game')
     def start_game(self):
         """Inicia el juego y la primera ronda"""
-        
+        # El contador puede haber cambiado desde que se cargó el juego
+        self.refresh_from_db(fields=['participant_count'])
         if self.players_count < 1:  # Temporal para pruebas - era 3
             return False  # No se puede iniciar
         
-        
-        from players.models import Player
-        Player.reset_all_for_new_game()
+        with transaction.atomic():
+            if not self.claim_transition():
+                return False
             
-        self.status = 'active'
-        self.started_at = timezone.now()
-        self.start_new_round()
-        
-        
-        self.update_players_for_new_round()
-        
-        self.save()
+            self.reset_participants()
+            
+            self.status = 'active'
+            self.started_at = timezone.now()
+            self.start_new_round()
+            
+            
+            self.update_players_for_new_round()
+            
+            self.save()
+            self.record_event('round', deaths=[])
         return True
     
     def start_new_round(self):
@@ -69,95 +219,120 @@ class Game(models.Model):
         self.paused_duration = 0
         
         self.save()
-    
-    def advance_round(self):
-        """Avanza a la siguiente ronda o termina el juego si solo quedan 0-2 jugadores"""        
         
-        self.calculate_truths_and_lies(self.current_round)
-        
-        self.current_round += 1
-        self.start_new_round()
-        self.update_players_for_new_round()
+        self._schedule_on_commit()
     
-    def finish_game(self):
-        """Finaliza el juego y determina el ganador"""
-        from players.models import Player
-        
-        
-        alive_players = Player.objects.filter(is_in_game=True, is_dead=False)
-        alive_count = alive_players.count()
-        
-        winner = None
-        winner_reason = ""
-        
-        if alive_count == 0:
-            
-            winner_reason = "Todos los jugadores han muerto. Nadie gana."
-            
-        elif alive_count == 1:
-            
-            winner = alive_players.first()
-            winner_reason = f"{winner.display_name} es el ganador (único superviviente)"
-            
-        elif alive_count == 2:
-            
-            players_list = list(alive_players.order_by('-lies_told', '-truths_told'))
-            player1, player2 = players_list[0], players_list[1]
-            
+    def _schedule_on_commit(self):
+        """Planifica el fin de ronda cuando se confirme la transacción en curso"""
+        from .scheduler import round_scheduler
+        transaction.on_commit(lambda: round_scheduler.schedule(self))
+    
+    @profiled('Game.advance_round')
+    def advance_round(self):
+        """
+        Avanza a la siguiente ronda de forma atómica.
+        
+        Devuelve False si otro proceso ya avanzó o cambió el juego desde que se
+        leyó, de modo que una misma ronda nunca se resuelve dos veces.
+        """
+        started = time.perf_counter()
+        with transaction.atomic():
+            if not self.claim_transition():
+                return False
             
-            player1_interactions = player1.lies_told + player1.truths_told
-            player2_interactions = player2.lies_told + player2.truths_told
+            with capture() as profile:
+                resolution_started = time.perf_counter()
+                summary = self.calculate_truths_and_lies(self.current_round)
+                resolution_ms = (time.perf_counter() - resolution_started) * 1000
+            RoundSummary.record(self, summary, resolution_ms, profile.count if installed() else None)
             
-       
-            if player1_interactions > player2_interactions:
-                
-                winner = player1
-                winner_reason = f"{winner.display_name} gana por más interacciones ({player1_interactions} vs {player2_interactions})"
-            elif player2_interactions > player1_interactions:
-                
-                winner = player2
-                winner_reason = f"{winner.display_name} gana por más interacciones ({player2_interactions} vs {player1_interactions})"
-            else:
-                
-                if player1.lies_told > player2.lies_told:
-                    winner = player1
-                    winner_reason = f"{winner.display_name} gana por más mentiras en empate de interacciones ({player1.lies_told} vs {player2.lies_told})"
-                elif player2.lies_told > player1.lies_told:
-                    winner = player2
-                    winner_reason = f"{winner.display_name} gana por más mentiras en empate de interacciones ({player2.lies_told} vs {player1.lies_told})"
-                else:
-                    
-                    winner_reason = f"Empate entre {player1.display_name} y {player2.display_name} (mismas interacciones y mentiras)"
+            self.current_round += 1
+            self.start_new_round()
+            self.update_players_for_new_round()
+            self.record_event('round', deaths=[death['player_id'] for death in summary['deaths']])
+        ROUND_RESOLUTION_SECONDS.observe(time.perf_counter() - started)
+        return True
+    
+    @profiled('Game.finish_game')
+    def finish_game(self):
+        """Finaliza el juego y determina el ganador (False si otro proceso cambió el juego)"""
+        with transaction.atomic():
+            if not self.claim_transition():
+                return False
             
-            if winner:
-                print(f" GANADOR: {winner.display_name}")
-                print(f" RAZÓN: {winner_reason}")
-            else:
-                print(f" RESULTADO: {winner_reason}")
+            result = self._finish_game()
+            self.record_event('finished', winner_id=result.winner_id, winner_reason=result.winner_reason)
         
+        from .scheduler import round_scheduler
+        round_scheduler.unschedule(self.pk)
+        return True
+    
+    def _finish_game(self):
+        from players.models import PlayerStats
+        from .engine import decide_winner
+        from .resolution import load_players
+        
+        players = load_players(self.participants.all())
+        alive = [state for state in players if not state.is_dead]
+        alive_count = len(alive)
+        winner, winner_reason = decide_winner(alive)
+        
+        if alive_count > 2:
+            logger.warning("Juego finalizado con %d jugadores vivos", alive_count, extra={'game': self.pk})
         else:
-            
-            print(f" ADVERTENCIA: Juego finalizado con {alive_count} jugadores vivos")
-            winner_reason = f"Juego finalizado con {alive_count} supervivientes"
+            logger.info(
+                "Juego finalizado: %s", winner_reason,
+                extra={'game': self.pk, 'winner': winner.player_id if winner else None}
+            )
+        
+        # Foto final: las páginas de resultados no vuelven a calcular nada
+        result = GameResult.objects.create(
+            game=self,
+            winner_id=winner.player_id if winner else None,
+            winner_reason=winner_reason,
+            alive_count=alive_count,
+            is_tie=winner is None and alive_count == 2,
+            final_stats=[
+                {
+                    'player_id': state.player_id,
+                    'display_name': state.display_name,
+                    'suit_symbol': state.suit_symbol,
+                    'suit_emoji': state.suit_symbol or "❓",
+                    'chosen_symbol': state.chosen_symbol,
+                    'karma_score': state.karma_score,
+                    'truths_told': state.truths_told,
+                    'lies_told': state.lies_told,
+                    'current_game_score': state.current_game_score,
+                    'is_dead': state.is_dead,
+                    'death_reason': state.death_reason,
+                }
+                for state in sorted(players, key=lambda state: (-state.lies_told, -state.truths_told))
+            ],
+        )
+        
+        # Las participaciones se reinician en el siguiente juego: se guarda ya su carrera
+        PlayerStats.record_game(self, result.winner_id)
         
-        
-        self._game_result = {
-            'winner': winner,
-            'winner_reason': winner_reason,
-            'alive_count': alive_count
-        }
-                
         self.status = 'finished'
         self.save()
+        return result
     
     def pause_round(self):
         """Pausa la ronda actual"""
         if self.status != 'active' or self.is_paused:
             return False
         
-        self.is_paused = True
-        self.paused_at = timezone.now()
-        self.save()
+        with transaction.atomic():
+            if not self.claim_transition():
+                return False
+            
+            self.is_paused = True
+            self.paused_at = timezone.now()
+            self.save()
+            self.record_event('pause')
+        
+        from .scheduler import round_scheduler
+        round_scheduler.unschedule(self.pk)
         return True
     
     def resume_round(self):
@@ -165,135 +340,100 @@ class Game(models.Model):
         if self.status != 'active' or not self.is_paused:
             return False
         
-        
-        if self.paused_at:
-            pause_time = (timezone.now() - self.paused_at).total_seconds()
-            self.paused_duration += int(pause_time)
-        
-        self.is_paused = False
-        self.paused_at = None
-        self.save()
+        with transaction.atomic():
+            if not self.claim_transition():
+                return False
+            
+            if self.paused_at:
+                pause_time = (timezone.now() - self.paused_at).total_seconds()
+                self.paused_duration += int(pause_time)
+            
+            self.is_paused = False
+            self.paused_at = None
+            self.save()
+            self.record_event('pause')
+            
+            self._schedule_on_commit()
         return True
     
-    def update_players_for_new_round(self):
-        """Actualiza los datos de jugadores para la nueva ronda"""
-        import random
+    def record_event(self, kind, recipient=None, **payload):
+        """Publica un cambio en el feed del juego; los eventos de ronda y pausa llevan el temporizador"""
+        from .changefeed import record
+        
+        if kind in ('round', 'pause'):
+            payload.update(
+                round=self.current_round,
+                is_paused=self.is_paused,
+                round_started_at=self.round_started_at,
+                round_duration_seconds=self.round_duration_seconds,
+                paused_duration=self.paused_duration,
+                time_remaining_in_round=self.time_remaining_in_round,
+            )
+        return record(self, kind, recipient=recipient, **payload)
+    
+    def round_rng(self, round_number=None):
+        """Generador aleatorio de la ronda, derivado de la semilla del juego"""
+        if round_number is None:
+            round_number = self.current_round
+        return random.Random(f"{self.rng_seed}:{round_number}")
+    
+    def draw_suits(self, count, round_number=None):
+        """Sortea de una vez los símbolos de `count` jugadores para la ronda"""
         from players.models import Player
         
-        players = Player.objects.filter(is_in_game=True)
-        
-        
         available_symbols = [choice[0] for choice in Player.SUIT_CHOICES]  # ['♠', '♥', '♦', '♣']
-        
-        for player in players:
-            
-            random_symbol = random.choice(available_symbols)
-            player.suit_symbol = random_symbol
-            
-            player.chosen_symbol = ''
-            player.save()
-            
-        
-        from players.models import PlayerGuess
-        PlayerGuess.objects.filter(round_number__lt=self.current_round).delete()
-            
-        print(f"Ronda {self.current_round}: Símbolos asignados a {players.count()} jugadores")
+        return self.round_rng(round_number).choices(available_symbols, k=count)
+    
+    def update_players_for_new_round(self):
+        """Actualiza los datos de jugadores para la nueva ronda"""
+        from django.db.models import Case, Value, When
+        
+        # Orden estable por id para que la misma semilla dé el mismo reparto
+        participant_ids = list(self.participants.order_by('pk').values_list('pk', flat=True))
+        suits = self.draw_suits(len(participant_ids))
+        
+        ids_by_suit = {}
+        for participant_id, suit in zip(participant_ids, suits):
+            ids_by_suit.setdefault(suit, []).append(participant_id)
+        
+        # Una sola actualización para todos los participantes
+        if participant_ids:
+            self.participants.update(
+                suit_symbol=Case(
+                    *[When(pk__in=ids, then=Value(suit)) for suit, ids in ids_by_suit.items()],
+                    default=Value('')
+                ),
+                chosen_symbol=''
+            )
+            Game.bump_state_version(reset_roster=True, counters={'round_guess_count': 0}, pk=self.pk)
+        
+        # Las comunicaciones de rondas anteriores se conservan (ver PlayerGuess.expire)
+        logger.info(
+            "Símbolos asignados a %d jugadores", len(participant_ids),
+            extra={'game': self.pk, 'round': self.current_round}
+        )
     
     def calculate_truths_and_lies(self, finished_round):
         """Calcula las mentiras y verdades de la ronda que acaba de terminar"""
-        from players.models import Player, PlayerGuess
-        
-        all_guesses = PlayerGuess.objects.all()
-        for guess in all_guesses:
-            print(f"  - Ronda {guess.round_number}: {guess.teller.display_name} -> {guess.player.display_name} ({guess.told_symbol})")
-        
-        
-        round_guesses = PlayerGuess.objects.filter(round_number=finished_round)
-        
-        
-        
-        players = Player.objects.filter(is_in_game=True)
-        for player in players:
-            if not player.is_dead:  # Solo verificar jugadores vivos
-                death_occurred = player.check_symbol_death()
-                if death_occurred:
-                    print(f"  💀 {player.display_name} eliminado: eligió {player.chosen_symbol} pero tenía {player.suit_symbol}")
-                else:
-                    if player.chosen_symbol and player.suit_symbol:
-                        print(f"  ✅ {player.display_name} eligió correctamente: {player.chosen_symbol}")
-                    else:
-                        print(f"  ⚠️ {player.display_name} no eligió símbolo o no tiene símbolo asignado")
-        
-        
-        if round_guesses.count() == 0:
-            return
-        
-        
-        round_truths = {}  # Contador de verdades por jugador en esta ronda
-        round_lies = {}    # Contador de mentiras por jugador en esta ronda
-        
-        
-        for player in Player.objects.filter(is_in_game=True):
-            round_truths[player.id] = 0
-            round_lies[player.id] = 0
-        
-        for guess in round_guesses:
-            
-            
-            actual_symbol = guess.player.suit_symbol
-            told_symbol = guess.told_symbol
-
-            
-            if actual_symbol == told_symbol:
-                
-                guess.teller.truths_told += 1  # Contador global del juego
-                round_truths[guess.teller.id] += 1  # Contador de esta ronda
-            else:
-                
-                guess.teller.lies_told += 1  # Contador global del juego
-                round_lies[guess.teller.id] += 1  # Contador de esta ronda
-            
-            guess.teller.save()
-        
-        
-        players = Player.objects.filter(is_in_game=True)
-        for player in players:
-            print(f"  {player.display_name} -> mentiras: {player.lies_told}, verdades: {player.truths_told}")
-        
-        
-        for player in players:
-            old_karma = player.karma_score
-            
-            
-            player_round_lies = round_lies[player.id]
-            player_round_truths = round_truths[player.id]
-            
-            if player_round_lies > player_round_truths:
-                
-                player.increase_karma(1)  # Usar método que verifica muerte
-                change = f"📈 +1 (más mentiras: {player_round_lies} vs {player_round_truths})"
-            elif player_round_truths > player_round_lies:
-                
-                player.decrease_karma(1)  # Usar método que verifica muerte
-                change = f"📉 -1 (más verdades: {player_round_truths} vs {player_round_lies})"
-            else:
-                
-                if player_round_lies == 0 and player_round_truths == 0:
-                    change = "➡️ sin cambio (no comunicó)"
-                else:
-                    change = f"➡️ sin cambio (equilibrado: {player_round_truths} vs {player_round_lies})"
-            
-            
-            
-            if old_karma != player.karma_score:
-                print(f"  {player.display_name}: Karma {old_karma} → {player.karma_score} {change}")
-                if player.is_dead:
-                    print(f"    💀 {player.display_name} ha sido eliminado: {player.death_reason}")
-            else:
-                print(f"  {player.display_name}: Karma {player.karma_score} {change}")
-        
-    
-
+        from .resolution import resolve_round
+        
+        summary = resolve_round(self, finished_round)
+        if summary['deaths']:
+            Game.objects.filter(pk=self.pk).update(**Game.increments(alive_count=-len(summary['deaths'])))
+        
+        logger.info(
+            "Ronda resuelta: %d comunicaciones, %d cambios de karma, %d muertes",
+            summary['guesses'], len(summary['karma_changes']), len(summary['deaths']),
+            extra={'game': self.pk, 'round': finished_round, 'participants': summary['participants']}
+        )
+        # El detalle por jugador solo se recorre si se va a escribir
+        if logger.isEnabledFor(logging.DEBUG):
+            for change in summary['karma_changes']:
+                logger.debug("%s: karma %d → %d", change['display_name'], change['old_karma'], change['new_karma'])
+            for death in summary['deaths']:
+                logger.debug("%s eliminado: %s", death['display_name'], death['reason'])
+        
+        return summary
     
     @property
     def time_remaining_in_round(self):
@@ -315,6 +455,14 @@ class Game(models.Model):
         
         return int((adjusted_end_time - now).total_seconds())
     
+    @property
+    def round_deadline(self):
+        """Fin de la ronda actual ajustado con el tiempo pausado (None si no corre el tiempo)"""
+        if not self.round_ends_at or self.status != 'active' or self.is_paused:
+            return None
+        
+        return self.round_ends_at + timezone.timedelta(seconds=self.paused_duration)
+    
     @property
     def is_round_finished(self):
         """Verifica si la ronda actual ha terminado"""
@@ -328,13 +476,64 @@ class Game(models.Model):
     
     def finish_and_cleanup(self):
         """Finaliza el juego y limpia los datos"""
-        from players.models import Player
-        
-        
         self.finish_game()
         
-        # Resetear jugadores para el próximo juego
-        Player.reset_all_for_new_game()
+        # Resetear solo los participantes de este juego
+        self.reset_participants()
+    
+    def reset_participants(self):
+        """Reinicia el estado de los participantes de este juego"""
+        self.participants.update(
+            karma_score=3,
+            suit_symbol='',
+            chosen_symbol='',
+            current_game_score=0,
+            secrets_discovered_this_game=0,
+            truths_told=0,
+            lies_told=0,
+            is_dead=False,
+            death_reason='',
+            died_in_round=None,
+        )
+        Game.bump_state_version(reset_roster=True, counters=Game.recount(), pk=self.pk)
+    
+    def enroll_players(self, players):
+        """Inscribe en este juego a los jugadores indicados que aún no participan"""
+        from players.models import GameParticipant
+        
+        GameParticipant.objects.bulk_create(
+            [GameParticipant(game=self, player=player) for player in players],
+            ignore_conflicts=True
+        )
+        # ignore_conflicts no dice cuántos se crearon: se recuentan
+        Game.bump_state_version(reset_roster=True, counters=Game.recount(), pk=self.pk)
+    
+    def check_game_end_condition(self):
+        """
+        Verifica si el juego debe terminar automáticamente.
+        El juego termina cuando quedan 2 o menos jugadores vivos en el juego.
+        
+        Returns:
+            bool: True si el juego debe terminar, False en caso contrario
+        """
+        # El contador puede haber cambiado desde que se cargó el juego (p. ej. al resolver la ronda)
+        self.refresh_from_db(fields=['alive_count'])
+        alive_players_count = self.alive_count
+        
+        if alive_players_count <= 2:
+            logger.info("Condición de fin de juego: quedan %d jugadores vivos", alive_players_count, extra={'game': self.pk})
+            return True
+        
+        return False
+    
+    def get_survivors(self):
+        """
+        Obtiene la lista de jugadores supervivientes del juego.
+        
+        Returns:
+            QuerySet: Participantes que siguen vivos en el juego
+        """
+        return self.alive_players.order_by('player__display_name')
     
     @classmethod
     def get_current_game(cls):
@@ -343,11 +542,12 @@ class Game(models.Model):
             status__in=['waiting', 'active']
         ).first()
     
-    @classmethod 
-    def cleanup_finished_games(cls):
-        """Limpia juegos finalizados"""
-        finished_games = cls.objects.filter(status='finished')
-        finished_games.delete()
+    @classmethod
+    async def aget_current_game(cls):
+        """get_current_game() para vistas asíncronas"""
+        return await cls.objects.filter(
+            status__in=['waiting', 'active']
+        ).afirst()
     
     @property
     def is_active(self):
@@ -355,12 +555,146 @@ class Game(models.Model):
     
     @property
     def players_count(self):
-        """Cuenta jugadores INSCRITOS EN EL JUEGO"""
-        from players.models import Player
-        return Player.objects.filter(is_in_game=True).count()
+        """Jugadores INSCRITOS EN EL JUEGO (contador desnormalizado)"""
+        return self.participant_count
     
     @property
     def connected_players(self):
-        """Devuelve los jugadores INSCRITOS EN EL JUEGO"""
-        from players.models import Player
-        return Player.objects.filter(is_in_game=True)
+        """Devuelve los participantes INSCRITOS EN EL JUEGO"""
+        return self.participants.select_related('player__user')
+    
+    @property
+    def alive_players(self):
+        """Participantes del juego que siguen vivos"""
+        return self.participants.filter(is_dead=False).select_related('player')
+
+
+class GameResult(models.Model):
+    """Resultado de una partida, calculado una sola vez al finalizarla"""
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, primary_key=True, related_name='result')
+    winner = models.ForeignKey(
+        'players.Player', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='won_games', verbose_name="Ganador"
+    )
+    winner_reason = models.CharField(max_length=255, verbose_name="Motivo")
+    alive_count = models.IntegerField(verbose_name="Supervivientes")
+    is_tie = models.BooleanField(default=False, verbose_name="Empate")
+    # Estadísticas finales de cada participante, ordenadas por mentiras y verdades
+    final_stats = models.JSONField(default=list, verbose_name="Estadísticas finales")
+    finished_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de fin")
+    
+    class Meta:
+        verbose_name = "Resultado"
+        verbose_name_plural = "Resultados"
+        ordering = ['-finished_at']
+    
+    def __str__(self):
+        return f"{self.game_id}: {self.winner_reason}"
+    
+    def stats_for(self, player_id):
+        """Estadísticas finales de un jugador (None si no participó)"""
+        return next((stats for stats in self.final_stats if stats['player_id'] == player_id), None)
+    
+    @property
+    def winner_stats(self):
+        return self.stats_for(self.winner_id) if self.winner_id else None
+
+
+class RoundSummary(models.Model):
+    """Resumen de una ronda, guardado al resolverla en advance_round"""
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='round_summaries')
+    round_number = models.IntegerField(verbose_name="Ronda")
+    participants = models.IntegerField(verbose_name="Participantes")
+    guesses = models.IntegerField(verbose_name="Comunicaciones")
+    truths = models.IntegerField(verbose_name="Verdades")
+    lies = models.IntegerField(verbose_name="Mentiras")
+    # Mismo formato que el resumen de resolution.resolve_round
+    deaths = models.JSONField(default=list, verbose_name="Muertes")
+    karma_changes = models.JSONField(default=list, verbose_name="Cambios de karma")
+    resolution_ms = models.FloatField(verbose_name="Tiempo de resolución (ms)")
+    # Vacío si el proceso no mide las consultas (queryprofile.enabled)
+    query_count = models.IntegerField(null=True, blank=True, verbose_name="Consultas de la resolución")
+    resolved_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha")
+    
+    class Meta:
+        verbose_name = "Resumen de ronda"
+        verbose_name_plural = "Resúmenes de ronda"
+        ordering = ['round_number']
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'round_number'], name='round_summary_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.game_id} ronda {self.round_number}"
+    
+    @classmethod
+    def record(cls, game, summary, resolution_ms, query_count):
+        """Guarda el resumen devuelto por calculate_truths_and_lies"""
+        return cls.objects.create(
+            game=game,
+            round_number=summary['round'],
+            participants=summary['participants'],
+            guesses=summary['guesses'],
+            truths=summary['truths'],
+            lies=summary['lies'],
+            deaths=summary['deaths'],
+            karma_changes=summary['karma_changes'],
+            resolution_ms=resolution_ms,
+            query_count=query_count,
+        )
+
+
+class GameEvent(models.Model):
+    """
+    Cambio de estado de un juego (feed de cambios).
+    
+    El id autoincremental es la versión del feed: un cliente que ha visto el
+    evento N solo necesita los eventos con id > N. Los eventos con
+    destinatario solo los recibe ese jugador.
+    """
+    EVENT_KINDS = [
+        ('round', 'Nueva ronda'),
+        ('pause', 'Pausa o reanudación'),
+        ('finished', 'Juego finalizado'),
+        ('roster', 'Cambio de jugadores'),
+        ('guess', 'Comunicación recibida'),
+    ]
+    
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=EVENT_KINDS)
+    recipient = models.ForeignKey(
+        'players.Player', on_delete=models.CASCADE, null=True, blank=True, related_name='game_events'
+    )
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Evento de juego"
+        verbose_name_plural = "Eventos de juego"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['game', 'id'], name='game_event_feed_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.kind} ({self.game_id})"
+
+
+class IdempotentRequest(models.Model):
+    """Respuesta guardada de un POST con cabecera Idempotency-Key"""
+    key = models.CharField(max_length=64, unique=True, verbose_name="Clave")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Código de respuesta")
+    response = models.JSONField(null=True, blank=True, verbose_name="Respuesta")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Petición idempotente"
+        verbose_name_plural = "Peticiones idempotentes"
+    
+    def __str__(self):
+        return f"{self.key[:12]}… ({self.status_code or 'en curso'})"
+    
+    @classmethod
+    def cleanup_expired(cls, max_age=timezone.timedelta(days=1)):
+        """Borra las claves más antiguas que max_age"""
+        cls.objects.filter(created_at__lt=timezone.now() - max_age).delete()
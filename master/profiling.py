@@ -0,0 +1,175 @@
+"""
+Perfiles de CPU bajo demanda.
+
+Con cProfile se perfila una petición o una acción del juego y se guarda el
+resultado en formato pstats (.prof) en GAME_PROFILE_DIR, para abrirlo con
+`python -m pstats` o snakeviz. Nada se perfila salvo que se pida:
+
+    - un usuario staff añade la cabecera X-Profile: 1 o ?profile=1 a la
+      petición; la respuesta indica el fichero en X-Profile-File;
+    - una fracción de las peticiones (GAME_PROFILE_SAMPLE_RATE);
+    - una fracción de las llamadas a Game.start_game, advance_round y
+      finish_game (GAME_PROFILE_ACTIONS_RATE), vengan del scheduler, del
+      admin o de una vista.
+
+Se activa en MIDDLEWARE, después de AuthenticationMiddleware:
+
+    'master.profiling.ProfilerMiddleware',
+
+Configuración opcional en settings:
+    GAME_PROFILE_DIR           directorio de los .prof (por defecto <tmp>/mindgame-profiles)
+    GAME_PROFILE_SAMPLE_RATE   fracción de peticiones perfiladas (por defecto 0)
+    GAME_PROFILE_ACTIONS_RATE  fracción de acciones del juego perfiladas (por defecto 0)
+
+cProfile mide solo el hilo que lo activa. Con una vista asíncrona servida por
+WSGI el perfil recoge la parte síncrona (ORM, construcción de instantáneas);
+bajo ASGI recoge el bucle, con el resto de corrutinas, y las consultas
+aparecen como espera de sync_to_async.
+"""
+import cProfile
+import functools
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils import timezone
+
+from .gamelog import get_logger
+
+logger = get_logger('profiling')
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = 'profile'
+
+# Un solo perfilador por hilo: cProfile no admite perfiles anidados
+_state = threading.local()
+
+
+def _setting(name, default):
+    from django.conf import settings
+    
+    return getattr(settings, name, default)
+
+
+def profile_dir():
+    return _setting('GAME_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'mindgame-profiles'))
+
+
+def sampled(setting):
+    """True para la fracción de llamadas indicada en el setting"""
+    rate = _setting(setting, 0)
+    return rate > 0 and random.random() < rate
+
+
+class ProfileRun:
+    """Resultado de profile(): `path` es el .prof guardado (None si no se perfiló)"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+
+
+def _dump(profiler, name, elapsed):
+    directory = profile_dir()
+    filename = '{}-{}-{}-{:.0f}ms.prof'.format(
+        timezone.now().strftime('%Y%m%d-%H%M%S'),
+        re.sub(r'[^\w.-]+', '_', name).strip('_'),
+        os.getpid(),
+        elapsed * 1000,
+    )
+    path = os.path.join(directory, filename)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(path)
+    except OSError as error:
+        logger.warning("No se pudo guardar el perfil: %s", error, extra={'profile': name})
+        return None
+    logger.info("Perfil guardado: %s", path, extra={'profile': name, 'ms': round(elapsed * 1000, 1)})
+    return path
+
+
+@contextmanager
+def profile(name):
+    """
+    Perfila el bloque con cProfile. Dentro de otro perfil del mismo hilo no
+    hace nada: la petición que llama a advance_round ya lo incluye.
+    """
+    run = ProfileRun(name)
+    if getattr(_state, 'active', False):
+        yield run
+        return
+    
+    profiler = cProfile.Profile()
+    _state.active = True
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield run
+    finally:
+        profiler.disable()
+        _state.active = False
+        run.path = _dump(profiler, name, time.perf_counter() - started)
+
+
+def profiled(name):
+    """Decorador de las acciones del juego que se perfilan según GAME_PROFILE_ACTIONS_RATE"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not sampled('GAME_PROFILE_ACTIONS_RATE'):
+                return func(*args, **kwargs)
+            with profile(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _requested(request):
+    return request.headers.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1'
+
+
+def _request_name(request):
+    return f'{request.method}{request.path}'
+
+
+class ProfilerMiddleware:
+    """Perfila las peticiones pedidas por staff y una muestra del resto"""
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        
+        requested = _requested(request) and request.user.is_staff
+        if not (requested or sampled('GAME_PROFILE_SAMPLE_RATE')):
+            return self.get_response(request)
+        with profile(_request_name(request)) as run:
+            response = self.get_response(request)
+        return self._annotate(response, run, requested)
+    
+    async def __acall__(self, request):
+        requested = _requested(request) and (await request.auser()).is_staff
+        if not (requested or sampled('GAME_PROFILE_SAMPLE_RATE')):
+            return await self.get_response(request)
+        with profile(_request_name(request)) as run:
+            response = await self.get_response(request)
+        return self._annotate(response, run, requested)
+    
+    def _annotate(self, response, run, requested):
+        # Solo quien lo pidió (staff) ve dónde quedó el perfil
+        if requested and run.path:
+            response['X-Profile-File'] = os.path.basename(run.path)
+        return response
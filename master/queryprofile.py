@@ -0,0 +1,231 @@
+"""
+Perfil de SQL por petición y presupuestos de consultas.
+
+QueryProfileMiddleware cuenta las consultas y el tiempo de SQL de cada vista
+y detecta las que se repiten con la misma forma (la firma de un N+1: la misma
+SELECT con distintos parámetros). Si una vista pasa de su presupuesto se
+registra un aviso en el logger "mindgame.queries", o se lanza
+QueryBudgetExceeded si así se configura (en los tests).
+
+Se activa en MIDDLEWARE, después de AuthenticationMiddleware:
+
+    'master.queryprofile.QueryProfileMiddleware',
+
+Configuración opcional en settings:
+    GAME_QUERY_BUDGETS       {nombre de URL: máximo de consultas}; se suma a DEFAULT_BUDGETS
+    GAME_QUERY_DUPLICATES    repeticiones de una misma consulta a partir de las que se avisa (por defecto 3)
+    GAME_QUERY_BUDGET_RAISE  True para lanzar la excepción en lugar de registrar (por defecto False)
+    GAME_QUERY_TRACE         añade el resumen a las cabeceras de la respuesta (por defecto DEBUG)
+    GAME_QUERY_PROFILE       mide las consultas desde el arranque, también fuera de las peticiones
+                             (por defecto, si QueryProfileMiddleware o MetricsMiddleware están en MIDDLEWARE)
+
+Sin medición instalada capture() no ve ninguna consulta: RoundSummary guarda
+entonces query_count vacío en lugar de un cero.
+
+Las respuestas en streaming (SSE) consultan después de salir del middleware y
+no se miden.
+"""
+import contextvars
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .gamelog import get_logger
+
+logger = get_logger('queries')
+
+# Presupuestos de las vistas que consultan los dashboards (los de los benchmarks)
+DEFAULT_BUDGETS = {
+    'master:api_dashboard': 11,
+    'master:game_results': 3,
+    'players:ajax_game_state': 7,
+    'players:ajax_get_player_guesses': 6,
+    'players:ajax_tell_player_symbol': 11,
+    'players:ajax_choose_symbol': 7,
+    'players:api_leaderboard': 7,  # con ?around= (los primeros: 4)
+}
+
+_PLACEHOLDER_LIST_RE = re.compile(r'%s(?:\s*,\s*%s)+')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+_current = contextvars.ContextVar('mindgame_query_profile', default=None)
+_installed = False
+
+# Middlewares que miden las consultas de cada petición
+PROFILING_MIDDLEWARE = (
+    'master.queryprofile.QueryProfileMiddleware',
+    'master.metrics.MetricsMiddleware',
+)
+
+
+class QueryBudgetExceeded(Exception):
+    """Una vista hizo más consultas que su presupuesto"""
+
+
+def query_shape(sql):
+    """SQL sin los valores: las listas IN y los números literales se igualan"""
+    return _NUMBER_RE.sub('N', _PLACEHOLDER_LIST_RE.sub('%s, ...', sql))
+
+
+class QueryProfile:
+    """Consultas ejecutadas dentro de capture(); también cuentan en el capture() exterior"""
+    
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+    
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[query_shape(sql)] += 1
+        if self.parent is not None:
+            self.parent.record(sql, duration)
+    
+    def duplicates(self, threshold):
+        """{forma: repeticiones} de las consultas repetidas `threshold` veces o más"""
+        return {shape: times for shape, times in self.shapes.items() if times >= threshold}
+
+
+def _record(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record(sql, time.perf_counter() - started)
+
+
+def _install(sender=None, connection=None, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+def install():
+    """Mide las conexiones abiertas en este hilo y las que se abran después"""
+    global _installed
+    _installed = True
+    connection_created.connect(_install, dispatch_uid='mindgame-queryprofile')
+    for connection in connections.all(initialized_only=True):
+        _install(connection=connection)
+
+
+def installed():
+    """True si install() ya se llamó en este proceso"""
+    return _installed
+
+
+def uninstall():
+    """Deshace install() en las conexiones de este hilo y en las que se abran después"""
+    global _installed
+    _installed = False
+    connection_created.disconnect(dispatch_uid='mindgame-queryprofile')
+    for connection in connections.all(initialized_only=True):
+        if _record in connection.execute_wrappers:
+            connection.execute_wrappers.remove(_record)
+
+
+@contextmanager
+def profiling():
+    """Mide las consultas durante el bloque y después deja la medición como estaba (para los tests)"""
+    was_installed = _installed
+    install()
+    try:
+        yield
+    finally:
+        if not was_installed:
+            uninstall()
+
+
+def enabled():
+    """True si la configuración pide medir las consultas (ver GAME_QUERY_PROFILE)"""
+    profile = _setting('GAME_QUERY_PROFILE', None)
+    if profile is not None:
+        return profile
+    middleware = _setting('MIDDLEWARE', [])
+    return any(path in middleware for path in PROFILING_MIDDLEWARE)
+
+
+@contextmanager
+def capture():
+    """
+    Perfil de las consultas del bloque, incluidas las que una vista asíncrona
+    lanza en otros hilos con sync_to_async (heredan el contexto).
+    """
+    profile = QueryProfile(parent=_current.get())
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+def _setting(name, default):
+    from django.conf import settings
+    
+    return getattr(settings, name, default)
+
+
+class QueryProfileMiddleware:
+    """Mide las consultas de cada petición y aplica el presupuesto de su vista"""
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with capture() as profile:
+            response = self.get_response(request)
+        return self.check(request, response, profile)
+    
+    async def __acall__(self, request):
+        with capture() as profile:
+            response = await self.get_response(request)
+        return self.check(request, response, profile)
+    
+    def check(self, request, response, profile):
+        if response.streaming:
+            return response
+        
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        budget = {**DEFAULT_BUDGETS, **_setting('GAME_QUERY_BUDGETS', {})}.get(view)
+        duplicates = profile.duplicates(_setting('GAME_QUERY_DUPLICATES', 3))
+        
+        if duplicates:
+            shape, times = max(duplicates.items(), key=lambda item: item[1])
+            logger.warning(
+                "Consultas repetidas en %s (posible N+1): %d veces %s", view, times, shape[:200],
+                extra={'view': view, 'queries': profile.count},
+            )
+        
+        if budget is not None and profile.count > budget:
+            message = f"{view}: {profile.count} consultas (presupuesto {budget})"
+            if _setting('GAME_QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(
+                "Presupuesto de consultas superado en %s", view,
+                extra={'view': view, 'queries': profile.count, 'budget': budget, 'sql_ms': round(profile.duration * 1000, 1)},
+            )
+        
+        if _setting('GAME_QUERY_TRACE', _setting('DEBUG', False)):
+            response['X-Query-Count'] = profile.count
+            response['X-Query-Duplicates'] = sum(duplicates.values())
+            response['Server-Timing'] = f'db;dur={profile.duration * 1000:.1f};desc="{profile.count} consultas"'
+        return response
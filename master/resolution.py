@@ -0,0 +1,206 @@
+"""
+Resolución de rondas basada en conjuntos.
+
+Calcula verdades, mentiras, cambios de karma y muertes de una ronda con un
+número fijo de consultas, independientemente del número de jugadores.
+
+También contiene los adaptadores entre el ORM y el motor en memoria
+(master.engine): cargan participaciones y comunicaciones en el motor y
+guardan su resultado.
+"""
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.db.models.lookups import GreaterThan
+
+from . import engine
+from .engine import KARMA_MAX_DEATH_REASON, KARMA_MIN_DEATH_REASON, SYMBOL_DEATH_REASON
+
+STATE_FIELDS = ['karma_score', 'truths_told', 'lies_told', 'is_dead', 'death_reason', 'died_in_round']
+
+
+def _tally(guesses):
+    """Subconsulta correlacionada que cuenta las comunicaciones de cada emisor"""
+    counts = guesses.filter(teller=OuterRef('player_id')).order_by().values('teller').annotate(
+        total=Count('pk')
+    ).values('total')[:1]
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def _snapshot(players):
+    """Estado mínimo de los jugadores para comparar antes y después de resolver"""
+    return {
+        row['id']: row
+        for row in players.values(
+            'id', 'player_id', 'player__display_name', 'karma_score', 'truths_told', 'lies_told',
+            'is_dead', 'death_reason'
+        )
+    }
+
+
+def resolve_round(game, finished_round):
+    """
+    Resuelve la ronda indicada del juego y devuelve un resumen con lo ocurrido.
+    
+    Solo toca las participaciones y comunicaciones de ese juego.
+    Consultas: instantánea inicial, muertes por símbolo, comprobación de
+    comunicaciones, contadores y karma, e instantánea final.
+    """
+    from players.models import GameParticipant, PlayerGuess
+    
+    players = GameParticipant.objects.filter(game=game)
+    before = _snapshot(players)
+    
+    # Muertes por símbolo: quien no eligió o eligió mal su palo
+    players.filter(is_dead=False).exclude(suit_symbol='').exclude(
+        chosen_symbol=F('suit_symbol')
+    ).update(is_dead=True, death_reason=SYMBOL_DEATH_REASON, died_in_round=finished_round)
+    
+    round_guesses = PlayerGuess.objects.filter(game=game, round_number=finished_round)
+    guess_count = round_guesses.count()
+    
+    if guess_count:
+        # Es verdad si coincide con el palo que el receptor tiene en este juego
+        # (el filtro por receptor va en la misma llamada para reutilizar el JOIN)
+        received = {'player__participations__game': game}
+        truths = _tally(round_guesses.filter(
+            told_symbol=F('player__participations__suit_symbol'), **received
+        ))
+        lies = _tally(round_guesses.filter(**received)) - truths
+        more_lies = GreaterThan(lies, truths)
+        more_truths = GreaterThan(truths, lies)
+        
+        # Solo muere por karma quien sigue vivo y cruza el límite en esta ronda
+        dies_at_max = Q(is_dead=False, karma_score=5) & more_lies
+        dies_at_min = Q(is_dead=False, karma_score=1) & more_truths
+        
+        players.update(
+            truths_told=F('truths_told') + truths,
+            lies_told=F('lies_told') + lies,
+            karma_score=Case(
+                When(more_lies, then=Least(F('karma_score') + 1, Value(6))),
+                When(more_truths, then=Greatest(F('karma_score') - 1, Value(0))),
+                default=F('karma_score'),
+            ),
+            is_dead=Case(
+                When(dies_at_max | dies_at_min, then=Value(True)),
+                default=F('is_dead'),
+            ),
+            death_reason=Case(
+                When(dies_at_max, then=Value(KARMA_MAX_DEATH_REASON)),
+                When(dies_at_min, then=Value(KARMA_MIN_DEATH_REASON)),
+                default=F('death_reason'),
+            ),
+            died_in_round=Case(
+                When(dies_at_max | dies_at_min, then=Value(finished_round)),
+                default=F('died_in_round'),
+            ),
+        )
+    
+    after = _snapshot(players)
+    
+    deaths = []
+    karma_changes = []
+    truth_count = lie_count = 0
+    for participant_id, old in before.items():
+        new = after.get(participant_id)
+        if new is None:
+            continue
+        truth_count += new['truths_told'] - old['truths_told']
+        lie_count += new['lies_told'] - old['lies_told']
+        if new['is_dead'] and not old['is_dead']:
+            deaths.append({
+                'player_id': new['player_id'],
+                'display_name': new['player__display_name'],
+                'reason': new['death_reason'],
+            })
+        if new['karma_score'] != old['karma_score']:
+            karma_changes.append({
+                'player_id': new['player_id'],
+                'display_name': new['player__display_name'],
+                'old_karma': old['karma_score'],
+                'new_karma': new['karma_score'],
+            })
+    
+    return {
+        'game_id': game.pk,
+        'round': finished_round,
+        'participants': len(before),
+        'guesses': guess_count,
+        'truths': truth_count,
+        'lies': lie_count,
+        'deaths': deaths,
+        'karma_changes': karma_changes,
+    }
+
+
+def load_players(participants):
+    """Carga un queryset de participaciones en PlayerState (una consulta)"""
+    return [
+        engine.PlayerState(
+            participant_id=row['id'],
+            player_id=row['player_id'],
+            display_name=row['player__display_name'],
+            suit_symbol=row['suit_symbol'],
+            chosen_symbol=row['chosen_symbol'],
+            karma_score=row['karma_score'],
+            truths_told=row['truths_told'],
+            lies_told=row['lies_told'],
+            current_game_score=row['current_game_score'],
+            is_dead=row['is_dead'],
+            death_reason=row['death_reason'],
+            died_in_round=row['died_in_round'],
+        )
+        for row in participants.values(
+            'id', 'player_id', 'player__display_name', 'suit_symbol', 'chosen_symbol', 'current_game_score',
+            *STATE_FIELDS
+        )
+    ]
+
+
+def load_guesses(game, round_number):
+    """Comunicaciones de la ronda como tuplas (emisor, receptor, símbolo)"""
+    from players.models import PlayerGuess
+    
+    return list(PlayerGuess.objects.filter(game=game, round_number=round_number).values_list(
+        'teller_id', 'player_id', 'told_symbol'
+    ))
+
+
+def save_players(states, batch_size=500):
+    """Guarda en las participaciones el estado calculado por el motor"""
+    from players.models import GameParticipant
+    
+    GameParticipant.objects.bulk_update(
+        [
+            GameParticipant(pk=state.participant_id, **{field: getattr(state, field) for field in STATE_FIELDS})
+            for state in states
+        ],
+        STATE_FIELDS,
+        batch_size=batch_size,
+    )
+
+
+def resolve_round_in_memory(game, finished_round):
+    """
+    Igual que resolve_round pero resolviendo en el motor en memoria.
+    
+    Hace dos lecturas y guarda solo los participantes que cambian, por lotes.
+    Las partidas se resuelven con resolve_round; esta versión sirve de
+    referencia en los tests para contrastar las reglas.
+    """
+    from players.models import GameParticipant
+    
+    players = load_players(GameParticipant.objects.filter(game=game))
+    before = {state.participant_id: [getattr(state, field) for field in STATE_FIELDS] for state in players}
+    
+    summary = engine.resolve_round(players, load_guesses(game, finished_round))
+    dead = {death['player_id'] for death in summary['deaths']}
+    for state in players:
+        if state.player_id in dead:
+            state.died_in_round = finished_round
+    
+    save_players([
+        state for state in players
+        if [getattr(state, field) for field in STATE_FIELDS] != before[state.participant_id]
+    ])
+    return {'game_id': game.pk, 'round': finished_round, **summary}
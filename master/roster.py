@@ -0,0 +1,42 @@
+"""
+Actualizaciones incrementales de la lista de jugadores.
+
+Cada participante guarda en state_version la versión del juego en la que
+cambió por última vez. Un cliente que ya tiene la lista de la versión N pide
+?since=N y recibe solo los participantes con state_version > N.
+
+Los cambios en bloque (nueva ronda, inscripciones, bajas) no tocan la versión
+de cada fila: suben Game.roster_reset_version y el cliente que pide cambios
+desde antes de esa versión recibe la lista completa. Así las bajas no
+necesitan registrarse aparte.
+"""
+from django.db.models import Subquery
+
+
+def next_version(game):
+    """Expresión con la versión siguiente del juego (pk o OuterRef)"""
+    from .models import Game
+    
+    return Subquery(Game.objects.filter(pk=game).values('state_version')[:1]) + 1
+
+
+def parse_since(request):
+    """Versión ?since= de la petición, o None si no viene o no es válida"""
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        return None
+    return since if since >= 0 else None
+
+
+def changed_rows(game, rows, since):
+    """
+    Filas de `rows` que el cliente con la versión `since` no tiene.
+    
+    Devuelve (filas, completa): la lista entera si no hay `since` o si es
+    anterior al último cambio en bloque o posterior a la versión del juego.
+    Cada fila lleva su 'version'.
+    """
+    if since is None or since < game.roster_reset_version or since > game.state_version:
+        return rows, True
+    return [row for row in rows if row['version'] > since], False
@@ -0,0 +1,261 @@
+"""
+Planificador de rondas en el servidor.
+
+Sustituye al temporizador del navegador del master: mantiene un montículo con
+el fin ajustado de la ronda de cada juego activo y, al vencer, avanza la ronda
+y comprueba si el juego debe terminar.
+
+También caduca periódicamente el histórico de comunicaciones y corrige los
+contadores desnormalizados de los juegos, fuera del camino de las peticiones y
+de las transiciones de ronda.
+
+Debe ejecutarse en un solo proceso: `python manage.py run_scheduler` junto a
+los workers del servidor (ver should_autostart). Los juegos que los workers
+inician, reanudan o alargan no avisan a ese proceso: cada SYNC_INTERVAL
+segundos relee de la base de datos los juegos activos y sus plazos.
+"""
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .gamelog import get_logger
+
+logger = get_logger('scheduler')
+
+# Tarea interna que comparte el montículo con los plazos de los juegos
+GUESS_EXPIRY_TASK = 'expire-guesses'
+GUESS_EXPIRY_INTERVAL = 3600  # segundos
+COUNTER_RECONCILE_TASK = 'reconcile-counters'
+COUNTER_RECONCILE_INTERVAL = 300  # segundos
+GAME_SYNC_TASK = 'sync-games'
+SYNC_INTERVAL = 2  # segundos; ROUND_SCHEDULER_SYNC_INTERVAL en settings
+
+# Variable de entorno con la que un servidor de un solo proceso arranca el planificador
+AUTOSTART_ENV = 'GAME_SCHEDULER_AUTOSTART'
+
+
+class RoundScheduler:
+    """Avanza las rondas de los juegos activos cuando vence su tiempo"""
+    
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}  # game_id -> fin vigente (las entradas antiguas del montículo se ignoran)
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+    
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Arranca el hilo del planificador (idempotente)"""
+        with self._condition:
+            if self.is_running:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name='round-scheduler', daemon=True
+            )
+            self._thread.start()
+    
+    def stop(self, timeout=None):
+        """Detiene el hilo y descarta los plazos pendientes"""
+        with self._condition:
+            self._stopping = True
+            self._heap.clear()
+            self._deadlines.clear()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def schedule(self, game):
+        """Registra (o actualiza) el fin de ronda de un juego"""
+        if self.is_running:
+            self._track(game)
+    
+    def _track(self, game):
+        deadline = game.round_deadline
+        if deadline is None:
+            self.unschedule(game.pk)
+            return
+        self._push(game.pk, deadline.timestamp())
+    
+    def unschedule(self, game_id):
+        """Olvida el plazo de un juego; su entrada en el montículo queda obsoleta"""
+        with self._condition:
+            self._deadlines.pop(game_id, None)
+    
+    def next_deadline(self):
+        """Devuelve (timestamp, game_id) del próximo plazo vigente, o None"""
+        with self._condition:
+            self._discard_stale()
+            if not self._heap:
+                return None
+            deadline, _, game_id = self._heap[0]
+            return deadline, game_id
+    
+    def _push(self, game_id, deadline):
+        with self._condition:
+            if self._deadlines.get(game_id) == deadline:
+                return
+            self._deadlines[game_id] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._counter), game_id))
+            self._condition.notify_all()
+    
+    def _discard_stale(self):
+        while self._heap:
+            deadline, _, game_id = self._heap[0]
+            if self._deadlines.get(game_id) == deadline:
+                return
+            heapq.heappop(self._heap)
+    
+    def _next_due(self):
+        """Bloquea hasta que venza un plazo y devuelve su game_id (None al parar)"""
+        with self._condition:
+            while not self._stopping:
+                self._discard_stale()
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, game_id = self._heap[0]
+                delay = deadline - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                del self._deadlines[game_id]
+                return game_id
+            return None
+    
+    def sync_games(self):
+        """Planifica los juegos activos según la base de datos (otros procesos los inician o reanudan)"""
+        from .models import Game
+        
+        close_old_connections()
+        try:
+            games = Game.objects.filter(status='active', is_paused=False).only(
+                'pk', 'status', 'is_paused', 'round_ends_at', 'paused_duration'
+            )
+            for game in games:
+                self._track(game)
+        finally:
+            close_old_connections()
+    
+    def _run(self):
+        sync_interval = getattr(settings, 'ROUND_SCHEDULER_SYNC_INTERVAL', SYNC_INTERVAL)
+        self._push(GAME_SYNC_TASK, time.time())
+        self._push(GUESS_EXPIRY_TASK, time.time() + GUESS_EXPIRY_INTERVAL)
+        self._push(COUNTER_RECONCILE_TASK, time.time() + COUNTER_RECONCILE_INTERVAL)
+        while True:
+            game_id = self._next_due()
+            if game_id is None:
+                return
+            if game_id == GAME_SYNC_TASK:
+                try:
+                    self.sync_games()
+                except Exception:
+                    logger.exception("Error releyendo los juegos activos")
+                self._push(GAME_SYNC_TASK, time.time() + sync_interval)
+                continue
+            if game_id == GUESS_EXPIRY_TASK:
+                try:
+                    self.expire_guesses()
+                except Exception:
+                    logger.exception("Error caducando comunicaciones")
+                self._push(GUESS_EXPIRY_TASK, time.time() + GUESS_EXPIRY_INTERVAL)
+                continue
+            if game_id == COUNTER_RECONCILE_TASK:
+                try:
+                    self.reconcile_counters()
+                except Exception:
+                    logger.exception("Error corrigiendo los contadores")
+                self._push(COUNTER_RECONCILE_TASK, time.time() + COUNTER_RECONCILE_INTERVAL)
+                continue
+            try:
+                self.process(game_id)
+            except Exception:
+                logger.exception("Error procesando el juego", extra={'game': game_id})
+    
+    def expire_guesses(self):
+        """Borra las comunicaciones de rondas cerradas más antiguas que GUESS_LOG_RETENTION"""
+        from players.models import PlayerGuess
+        
+        retention = getattr(settings, 'GUESS_LOG_RETENTION', timedelta(days=7))
+        close_old_connections()
+        try:
+            deleted = PlayerGuess.expire(timezone.now() - retention)
+        finally:
+            close_old_connections()
+        if deleted:
+            logger.info("%d comunicaciones caducadas", deleted)
+        return deleted
+    
+    def reconcile_counters(self):
+        """Corrige los contadores de los juegos en curso que se hayan desviado"""
+        from .models import Game
+        
+        close_old_connections()
+        try:
+            return Game.reconcile_counters(status__in=['waiting', 'active'])
+        finally:
+            close_old_connections()
+    
+    def process(self, game_id):
+        """Avanza la ronda del juego si ha vencido y termina el juego si procede"""
+        from .models import Game
+        
+        close_old_connections()
+        try:
+            game = Game.objects.filter(pk=game_id).first()
+            if game is None or game.status != 'active' or game.is_paused:
+                # Al reanudar una ronda pausada se vuelve a planificar (schedule o sync_games)
+                return
+            
+            if not game.is_round_finished:
+                self._track(game)
+                return
+            
+            if game.check_game_end_condition():
+                game.finish_game()
+                return
+            
+            if not game.advance_round():
+                # Otro proceso ya avanzó esta ronda
+                return
+            
+            if game.check_game_end_condition():
+                game.finish_game()
+        finally:
+            close_old_connections()
+
+
+def should_autostart():
+    """
+    Solo un proceso debe avanzar las rondas y ejecutar las tareas periódicas.
+    
+    Arranca si se pide expresamente (ROUND_SCHEDULER_AUTOSTART en settings o
+    GAME_SCHEDULER_AUTOSTART=1 en el entorno, para servidores de un solo
+    proceso) y con runserver, que es un único proceso. Con varios workers
+    ningún worker lo arranca: se ejecuta aparte `python manage.py run_scheduler`.
+    """
+    if getattr(settings, 'ROUND_SCHEDULER_AUTOSTART', False) or os.environ.get(AUTOSTART_ENV) == '1':
+        return True
+    argv = sys.argv
+    if not argv or not os.path.basename(argv[0]).startswith('manage.py') or argv[1:2] != ['runserver']:
+        return False
+    # Con el autoreloader solo el proceso hijo sirve peticiones
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+
+
+round_scheduler = RoundScheduler()
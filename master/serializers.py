@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Game
+from .models import Game, RoundSummary
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -24,17 +24,17 @@ class GameSerializer(serializers.ModelSerializer):
             'created_at', 'started_at', 'current_round',
             'round_duration_seconds', 'round_started_at', 'round_ends_at',
             'players_count', 'connected_players', 'time_remaining_in_round',
-            'is_round_finished', 'is_paused', 'paused_at', 'paused_duration'
+            'is_round_finished', 'is_paused', 'paused_at', 'paused_duration', 'version'
         ]
         read_only_fields = [
             'id', 'created_at', 'started_at', 'current_round',
-            'round_started_at', 'round_ends_at', 'is_paused', 'paused_at', 'paused_duration'
+            'round_started_at', 'round_ends_at', 'is_paused', 'paused_at', 'paused_duration', 'version'
         ]
     
     def get_connected_players(self, obj):
         """Devuelve información básica de jugadores conectados"""
-        from players.serializers import PlayerSerializer
-        return PlayerSerializer(obj.connected_players, many=True).data
+        from players.serializers import GameParticipantSerializer
+        return GameParticipantSerializer(obj.connected_players, many=True).data
 
 
 class GameCreateSerializer(serializers.ModelSerializer):
@@ -43,4 +43,13 @@ class GameCreateSerializer(serializers.ModelSerializer):
         model = Game
         fields = [
             'name', 'description', 'round_duration_seconds'
-        ]
\ No newline at end of file
+        ]
+
+class RoundSummarySerializer(serializers.ModelSerializer):
+    """Resumen de una ronda resuelta"""
+    class Meta:
+        model = RoundSummary
+        fields = [
+            'round_number', 'participants', 'guesses', 'truths', 'lies',
+            'deaths', 'karma_changes', 'resolution_ms', 'query_count', 'resolved_at'
+        ]
@@ -0,0 +1,111 @@
+"""
+Caché de instantáneas de los dashboards.
+
+Las respuestas que consultan periódicamente los dashboards se guardan ya
+serializadas en el framework de caché de Django, con una clave por juego y
+Game.state_version. Cualquier cambio del juego o de sus jugadores sube esa
+versión (ver Game.save y Game.bump_state_version), así que la instantánea
+anterior deja de usarse sin borrarla: caduca sola.
+
+Cuando cambia la versión (p. ej. al empezar una ronda) todos los clientes
+piden a la vez la nueva instantánea. Solo uno la construye: dentro del
+proceso se espera a un cerrojo y entre procesos a una marca con cache.add().
+
+Configuración opcional en settings:
+    GAME_SNAPSHOT_CACHE    alias de CACHES a usar (por defecto "default")
+    GAME_SNAPSHOT_TIMEOUT  segundos que se conserva cada instantánea (por defecto 300)
+"""
+import threading
+import time
+import uuid
+import zlib
+
+from asgiref.sync import sync_to_async
+
+KEY_PREFIX = 'mindgame:snapshot'
+
+# Tiempo máximo que otro proceso puede tardar en construir una instantánea
+BUILD_LOCK_SECONDS = 10
+BUILD_WAIT_INTERVAL = 0.05
+
+# Cerrojos repartidos por clave: acotados y sin limpiar entradas viejas
+_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _cache():
+    from django.conf import settings
+    from django.core.cache import caches
+    
+    return caches[getattr(settings, 'GAME_SNAPSHOT_CACHE', 'default')]
+
+
+def _timeout():
+    from django.conf import settings
+    
+    return getattr(settings, 'GAME_SNAPSHOT_TIMEOUT', 300)
+
+
+def snapshot_key(name, game_id, state_version):
+    return f'{KEY_PREFIX}:{name}:{game_id}:{state_version}'
+
+
+def _wait_for(cache, key, lock_key):
+    """Espera a que otro proceso guarde la instantánea o suelte la marca"""
+    deadline = time.monotonic() + BUILD_LOCK_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(BUILD_WAIT_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            return None
+    return None
+
+
+def get_or_build(name, game_id, state_version, build):
+    """
+    Devuelve la instantánea `name` del juego en esa versión.
+    
+    Si no está en caché llama a build() una sola vez aunque la pidan a la
+    vez muchos hilos o procesos; el resto espera y reutiliza el resultado.
+    """
+    cache = _cache()
+    key = snapshot_key(name, game_id, state_version)
+    value = cache.get(key)
+    if value is not None:
+        return value
+    
+    with _LOCKS[zlib.crc32(key.encode()) % len(_LOCKS)]:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        
+        lock_key = f'{key}:building'
+        token = uuid.uuid4().hex
+        owned = cache.add(lock_key, token, BUILD_LOCK_SECONDS)
+        if not owned:
+            value = _wait_for(cache, key, lock_key)
+            if value is not None:
+                return value
+            # Quien construía falló o tardó demasiado: se intenta tomar la marca
+            owned = cache.add(lock_key, token, BUILD_LOCK_SECONDS)
+        
+        try:
+            value = build()
+            cache.set(key, value, _timeout())
+        finally:
+            # Solo se suelta la marca propia: la de otro constructor sigue protegiendo su build
+            if owned and cache.get(lock_key) == token:
+                cache.delete(lock_key)
+    return value
+
+
+async def aget_or_build(name, game_id, state_version, build):
+    """
+    get_or_build() para vistas asíncronas: el acierto se lee sin salir del
+    bucle y solo la construcción (build() síncrona) pasa a un hilo.
+    """
+    value = await _cache().aget(snapshot_key(name, game_id, state_version))
+    if value is not None:
+        return value
+    return await sync_to_async(get_or_build)(name, game_id, state_version, build)
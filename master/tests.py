@@ -1,3 +1,1289 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import pstats
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from players.models import GameParticipant, Player, PlayerGuess
+from . import broadcast, changefeed, engine, gateway, idempotency, metrics, profiling, queryprofile, snapshots
+from .models import Game, GameResult, IdempotentRequest, RoundSummary
+from .queryprofile import DEFAULT_BUDGETS
+from .resolution import load_players, resolve_round_in_memory
+from .scheduler import RoundScheduler, should_autostart
+
+
+SUITS = ['♠', '♥', '♦', '♣']
+
+
+def create_players(game, count, prefix='jugador'):
+    """Crea jugadores inscritos en el juego con un número mínimo de consultas"""
+    users = User.objects.bulk_create([
+        User(username=f'{prefix}{i}') for i in range(count)
+    ])
+    players = Player.objects.bulk_create([
+        Player(user=user, display_name=user.username) for user in users
+    ])
+    participants = GameParticipant.objects.bulk_create([
+        GameParticipant(
+            game=game,
+            player=player,
+            suit_symbol=SUITS[i % len(SUITS)],
+            chosen_symbol=SUITS[i % len(SUITS)],
+        )
+        for i, player in enumerate(players)
+    ])
+    # bulk_create no pasa por save(): los contadores del juego se recalculan
+    Game.reconcile_counters(pk=game.pk)
+    return participants
+
+
+BENCHMARK_SIZES = (10, 100, 1000)
+
+
+def seed_benchmark_game(size):
+    """Juego activo con `size` jugadores conectados y dos comunicaciones por jugador"""
+    game = Game.objects.create(name=f'Benchmark {size}', status='active')
+    participants = create_players(game, size, prefix=f'b{size}_')
+    Player.objects.filter(participations__game=game).update(is_online=True)
+    PlayerGuess.objects.bulk_create([
+        PlayerGuess(
+            game=game, teller=participant.player, told_symbol=SUITS[i % 3], round_number=1,
+            player=participants[(i + step) % size].player,
+        )
+        for i, participant in enumerate(participants) for step in (1, 2)
+    ])
+    Game.reconcile_counters(pk=game.pk)
+    return game, participants
+
+
+class QueryBudgetMixin:
+    """
+    Mide consultas y tiempo de un endpoint con 10, 100 y 1000 jugadores.
+    
+    El presupuesto es el máximo de consultas permitido en cualquier tamaño: si
+    aparece un N+1 el test falla. Las peticiones pasan además por
+    QueryProfileMiddleware, que aquí lanza QueryBudgetExceeded si una vista
+    supera su presupuesto de DEFAULT_BUDGETS en lugar de solo registrarlo.
+    """
+    
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(GAME_QUERY_BUDGET_RAISE=True))
+        self.enterContext(modify_settings(MIDDLEWARE={'append': 'master.queryprofile.QueryProfileMiddleware'}))
+        self.enterContext(queryprofile.profiling())
+    
+    def assertQueryBudget(self, name, budget, run, user=None, prepare=None):
+        """
+        run(game, participants) ejecuta el endpoint; user(game, participants)
+        devuelve el usuario con el que iniciar sesión y prepare(game,
+        participants) deja el juego en el estado necesario antes de medir.
+        """
+        results = {}
+        for size in BENCHMARK_SIZES:
+            with transaction.atomic():
+                game, participants = seed_benchmark_game(size)
+                if prepare is not None:
+                    prepare(game, participants)
+                if user is not None:
+                    self.client.force_login(user(game, participants))
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    run(game, participants)
+                    elapsed = time.perf_counter() - started
+                results[size] = (len(context.captured_queries), elapsed)
+                transaction.set_rollback(True)
+        
+        summary = ", ".join(
+            f"{size} jugadores → {count} consultas / {elapsed * 1000:.1f} ms"
+            for size, (count, elapsed) in results.items()
+        )
+        for size, (count, _) in results.items():
+            self.assertLessEqual(
+                count, budget,
+                f"{name} con {size} jugadores: {count} consultas (presupuesto {budget}); {summary}"
+            )
+
+
+class RoundResolutionTests(TestCase):
+    """Reglas de resolución de ronda"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Test', status='active')
+    
+    def guess(self, receiver, teller, symbol, round_number=1):
+        return PlayerGuess.objects.create(
+            game=self.game, player=receiver.player, teller=teller.player,
+            told_symbol=symbol, round_number=round_number
+        )
+    
+    def test_symbol_death(self):
+        player, = create_players(self.game, 1)
+        player.chosen_symbol = ''
+        player.save()
+        
+        self.game.calculate_truths_and_lies(1)
+        
+        player.refresh_from_db()
+        self.assertTrue(player.is_dead)
+        self.assertEqual(player.death_reason, 'No has elegido tu símbolo correctamente')
+    
+    def test_truths_and_lies_update_karma(self):
+        liar, honest, listener = create_players(self.game, 3)
+        self.guess(listener, liar, '♠')
+        self.guess(listener, honest, listener.suit_symbol)
+        # Una comunicación de otra ronda no debe contar
+        self.guess(liar, honest, '♦', round_number=2)
+        
+        self.game.calculate_truths_and_lies(1)
+        
+        liar.refresh_from_db()
+        honest.refresh_from_db()
+        listener.refresh_from_db()
+        self.assertEqual((liar.lies_told, liar.truths_told, liar.karma_score), (1, 0, 4))
+        self.assertEqual((honest.lies_told, honest.truths_told, honest.karma_score), (0, 1, 2))
+        self.assertEqual(listener.karma_score, 3)
+    
+    def test_karma_death_keeps_first_reason(self):
+        liar, listener = create_players(self.game, 2)
+        GameParticipant.objects.filter(pk=liar.pk).update(karma_score=5)
+        GameParticipant.objects.filter(pk=listener.pk).update(karma_score=1, chosen_symbol='')
+        self.guess(liar, listener, liar.suit_symbol)
+        self.guess(listener, liar, '♠')
+        
+        summary = self.game.calculate_truths_and_lies(1)
+        
+        liar.refresh_from_db()
+        listener.refresh_from_db()
+        self.assertEqual((liar.karma_score, liar.is_dead), (6, True))
+        self.assertEqual(liar.death_reason, 'has llegado a karma 6')
+        # Muere por símbolo antes de resolver el karma: conserva ese motivo
+        self.assertEqual(listener.karma_score, 0)
+        self.assertEqual(listener.death_reason, 'No has elegido tu símbolo correctamente')
+        self.assertEqual(len(summary['deaths']), 2)
+
+
+class RoundResolutionBenchmark(TestCase):
+    """El número de consultas no depende del número de jugadores"""
+    
+    def _resolve_queries(self, size):
+        game = Game.objects.create(name=f'Benchmark {size}', status='active')
+        participants = create_players(game, size, prefix=f'n{size}_')
+        PlayerGuess.objects.bulk_create([
+            PlayerGuess(
+                game=game,
+                player=participants[(i + 1) % size].player,
+                teller=participant.player,
+                told_symbol=SUITS[i % 3],
+                round_number=1,
+            )
+            for i, participant in enumerate(participants)
+        ])
+        
+        with CaptureQueriesContext(connection) as context:
+            game.calculate_truths_and_lies(1)
+        return len(context.captured_queries)
+    
+    def test_query_count_is_constant(self):
+        counts = {size: self._resolve_queries(size) for size in (10, 100, 1000, 10000)}
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+
+class SymbolAssignmentTests(TestCase):
+    """Reparto de símbolos por lotes y reproducible"""
+    
+    def test_same_seed_same_suits(self):
+        suits = []
+        for name in ('A', 'B'):
+            game = Game.objects.create(name=name, status='active', rng_seed=1234)
+            create_players(game, 20, prefix=name)
+            game.update_players_for_new_round()
+            suits.append(list(game.participants.order_by('pk').values_list('suit_symbol', flat=True)))
+        
+        self.assertEqual(suits[0], suits[1])
+        self.assertEqual(suits[0], Game(rng_seed=1234).draw_suits(20))
+    
+    def test_assignment_queries_are_constant(self):
+        counts = []
+        for size in (10, 500):
+            game = Game.objects.create(name=f'Reparto {size}', status='active')
+            create_players(game, size, prefix=f'r{size}_')
+            with CaptureQueriesContext(connection) as context:
+                game.update_players_for_new_round()
+            counts.append(len(context.captured_queries))
+            self.assertFalse(game.participants.filter(suit_symbol='').exists())
+            self.assertFalse(game.participants.exclude(chosen_symbol='').exists())
+        
+        self.assertEqual(counts[0], counts[1])
+
+
+class ConcurrentAdvanceTests(TestCase):
+    """Una ronda solo se resuelve una vez aunque la avancen varios procesos"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Concurrencia', status='active')
+        self.liar, self.listener, _ = create_players(self.game, 3)
+        PlayerGuess.objects.create(
+            game=self.game, player=self.listener.player, teller=self.liar.player,
+            told_symbol='♠', round_number=1
+        )
+    
+    def test_stale_copy_cannot_advance_again(self):
+        first = Game.objects.get(pk=self.game.pk)
+        second = Game.objects.get(pk=self.game.pk)
+        
+        self.assertTrue(first.advance_round())
+        self.assertFalse(second.advance_round())
+        
+        self.game.refresh_from_db()
+        self.liar.refresh_from_db()
+        self.assertEqual(self.game.current_round, 2)
+        self.assertEqual(self.game.version, 1)
+        self.assertEqual((self.liar.lies_told, self.liar.karma_score), (1, 4))
+    
+    def test_stale_full_save_keeps_version(self):
+        stale = Game.objects.get(pk=self.game.pk)
+        old_reader = Game.objects.get(pk=self.game.pk)
+        self.assertTrue(Game.objects.get(pk=self.game.pk).advance_round())
+        
+        # Un save() completo desde una copia anterior no devuelve la versión atrás
+        stale.description = 'Editado'
+        stale.save()
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.version, self.game.description), (1, 'Editado'))
+        self.assertFalse(old_reader.advance_round())
+    
+    def test_idempotency_key_replays_response(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('master', is_staff=True))
+        url = f'/api/master/api/games/{self.game.pk}/advance_round/'
+        
+        first = client.post(url, HTTP_IDEMPOTENCY_KEY='ronda-1')
+        retry = client.post(url, HTTP_IDEMPOTENCY_KEY='ronda-1')
+        
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.current_round, 2)
+        
+        # Sin clave (o con otra) la petición se ejecuta de nuevo
+        self.assertEqual(client.post(url, HTTP_IDEMPOTENCY_KEY='ronda-2').status_code, 200)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.current_round, 3)
+    
+    def test_abandoned_idempotency_key_expires(self):
+        user = User.objects.create_user('master', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/master/api/games/{self.game.pk}/advance_round/'
+        # La primera petición murió con el proceso sin terminar
+        record = IdempotentRequest.objects.create(
+            key=idempotency._scoped_key(SimpleNamespace(user=user, path=url), 'ronda-1')
+        )
+        
+        self.assertEqual(client.post(url, HTTP_IDEMPOTENCY_KEY='ronda-1').status_code, 409)
+        
+        IdempotentRequest.objects.filter(pk=record.pk).update(
+            created_at=timezone.now() - idempotency.IN_FLIGHT_LEASE - timezone.timedelta(seconds=1)
+        )
+        self.assertEqual(client.post(url, HTTP_IDEMPOTENCY_KEY='ronda-1').status_code, 200)
+        self.assertEqual(Game.objects.get(pk=self.game.pk).current_round, 2)
+        self.assertEqual(client.post(url, HTTP_IDEMPOTENCY_KEY='ronda-1')['Idempotent-Replayed'], 'true')
+
+
+class RoundSchedulerTests(TestCase):
+    """Montículo de plazos y procesado de rondas, sin arrancar el hilo"""
+    
+    def setUp(self):
+        self.scheduler = RoundScheduler()
+        self.game = Game.objects.create(name='Planificador', status='active')
+        self.participants = create_players(self.game, 4)
+    
+    def end_round(self, seconds_ago=1):
+        ends_at = timezone.now() - timezone.timedelta(seconds=seconds_ago)
+        Game.objects.filter(pk=self.game.pk).update(
+            round_started_at=ends_at - timezone.timedelta(seconds=30), round_ends_at=ends_at
+        )
+    
+    def current_round(self):
+        return Game.objects.values_list('current_round', flat=True).get(pk=self.game.pk)
+    
+    def test_heap_returns_earliest_deadline(self):
+        self.scheduler._push('tarde', 300.0)
+        self.scheduler._push('pronto', 100.0)
+        self.scheduler._push('medio', 200.0)
+        self.assertEqual(self.scheduler.next_deadline(), (100.0, 'pronto'))
+    
+    def test_new_deadline_replaces_stale_entry(self):
+        self.scheduler._push('a', 100.0)
+        self.scheduler._push('b', 200.0)
+        self.scheduler._push('a', 300.0)
+        self.assertEqual(self.scheduler.next_deadline(), (200.0, 'b'))
+        
+        self.scheduler.unschedule('b')
+        self.assertEqual(self.scheduler.next_deadline(), (300.0, 'a'))
+        self.scheduler.unschedule('a')
+        self.assertIsNone(self.scheduler.next_deadline())
+    
+    def test_pause_and_resume_reschedule(self):
+        running = mock.patch.object(RoundScheduler, 'is_running', new_callable=mock.PropertyMock, return_value=True)
+        with running, mock.patch('master.scheduler.round_scheduler', self.scheduler):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.game.start_new_round()
+            self.assertEqual(self.scheduler.next_deadline(), (self.game.round_deadline.timestamp(), self.game.pk))
+            
+            self.assertTrue(self.game.pause_round())
+            self.assertIsNone(self.scheduler.next_deadline())
+            
+            Game.objects.filter(pk=self.game.pk).update(paused_at=timezone.now() - timezone.timedelta(seconds=10))
+            self.game.refresh_from_db()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(self.game.resume_round())
+            deadline, game_id = self.scheduler.next_deadline()
+        
+        # El plazo se retrasa lo que duró la pausa
+        self.assertEqual(game_id, self.game.pk)
+        self.assertEqual(deadline, (self.game.round_ends_at + timezone.timedelta(seconds=10)).timestamp())
+    
+    def test_sync_picks_up_games_started_and_resumed_elsewhere(self):
+        # El planificador corre en otro proceso: el round_scheduler de este no está en marcha
+        Game.objects.filter(pk=self.game.pk).update(status='waiting')
+        self.scheduler.sync_games()
+        self.assertIsNone(self.scheduler.next_deadline())
+        
+        game = Game.objects.get(pk=self.game.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(game.start_game())
+        self.scheduler.sync_games()
+        self.assertEqual(self.scheduler.next_deadline(), (game.round_deadline.timestamp(), game.pk))
+        
+        # La pausa descarta el plazo al vencer; la reanudación lo recupera en la siguiente lectura
+        self.assertTrue(game.pause_round())
+        self.end_round()
+        self.scheduler.process(game.pk)
+        Game.objects.filter(pk=game.pk).update(paused_at=timezone.now() - timezone.timedelta(seconds=60))
+        game.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(game.resume_round())
+        self.scheduler.sync_games()
+        deadline, game_id = self.scheduler.next_deadline()
+        self.assertEqual((deadline, game_id), (game.round_deadline.timestamp(), game.pk))
+        
+        self.end_round(seconds_ago=120)
+        self.scheduler.process(game.pk)
+        self.assertEqual(self.current_round(), 2)
+    
+    def test_process_ignores_unfinished_or_paused_round(self):
+        self.end_round(seconds_ago=-30)
+        self.scheduler.process(self.game.pk)
+        self.assertEqual(self.current_round(), 1)
+        
+        self.end_round()
+        Game.objects.filter(pk=self.game.pk).update(is_paused=True, paused_at=timezone.now())
+        self.scheduler.process(self.game.pk)
+        self.assertEqual(self.current_round(), 1)
+    
+    def test_process_advances_finished_round(self):
+        self.end_round()
+        self.scheduler.process(self.game.pk)
+        self.assertEqual(self.current_round(), 2)
+        
+        # La ronda nueva aún no ha vencido: un plazo repetido no la avanza
+        self.scheduler.process(self.game.pk)
+        self.assertEqual(self.current_round(), 2)
+    
+    def test_process_does_not_advance_twice(self):
+        self.end_round()
+        
+        def advanced_elsewhere(game):
+            # Otro proceso avanza la ronda entre la lectura y el avance de process()
+            if game.current_round == 1:
+                self.assertTrue(Game.objects.get(pk=game.pk).advance_round())
+            return False
+        
+        with mock.patch.object(Game, 'check_game_end_condition', autospec=True, side_effect=advanced_elsewhere):
+            self.scheduler.process(self.game.pk)
+        self.assertEqual(self.current_round(), 2)
+    
+    def test_autostart_is_opt_in(self):
+        def autostart(argv, **environ):
+            with mock.patch.object(sys, 'argv', argv), mock.patch.dict(os.environ, environ, clear=True):
+                return should_autostart()
+        
+        self.assertFalse(autostart(['uvicorn', 'master.asgi:application', '--workers', '4']))
+        self.assertFalse(autostart(['django-admin', 'migrate']))
+        self.assertFalse(autostart(['-c']))
+        self.assertFalse(autostart(['celery', 'worker']))
+        self.assertFalse(autostart(['manage.py', 'shell']))
+        self.assertFalse(autostart(['manage.py', 'runserver']))
+        self.assertTrue(autostart(['manage.py', 'runserver'], RUN_MAIN='true'))
+        self.assertTrue(autostart(['manage.py', 'runserver', '--noreload']))
+        self.assertTrue(autostart(['uvicorn', 'master.asgi:application'], GAME_SCHEDULER_AUTOSTART='1'))
+        with override_settings(ROUND_SCHEDULER_AUTOSTART=True):
+            self.assertTrue(autostart(['gunicorn']))
+    
+    def test_process_finishes_game_with_two_alive(self):
+        GameParticipant.objects.filter(pk__in=[p.pk for p in self.participants[:2]]).update(is_dead=True)
+        Game.reconcile_counters(pk=self.game.pk)
+        self.end_round()
+        self.scheduler.process(self.game.pk)
+        self.assertEqual(Game.objects.get(pk=self.game.pk).status, 'finished')
+
+
+class RoundSummaryTests(TestCase):
+    """Resumen guardado de cada ronda resuelta"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Resumen', status='active')
+        self.liar, self.listener, _ = create_players(self.game, 3)
+        PlayerGuess.objects.create(
+            game=self.game, player=self.listener.player, teller=self.liar.player,
+            told_symbol='♠', round_number=1
+        )
+    
+    def test_advance_records_summary(self):
+        with queryprofile.profiling():
+            self.assertTrue(self.game.advance_round())
+        
+        summary = RoundSummary.objects.get(game=self.game, round_number=1)
+        self.assertEqual((summary.participants, summary.guesses, summary.truths, summary.lies), (3, 1, 0, 1))
+        self.assertEqual(summary.karma_changes, [{
+            'player_id': self.liar.player_id, 'display_name': 'jugador0', 'old_karma': 3, 'new_karma': 4,
+        }])
+        self.assertEqual(summary.deaths, [])
+        self.assertGreater(summary.query_count, 0)
+        self.assertGreaterEqual(summary.resolution_ms, 0)
+    
+    def test_rounds_endpoint(self):
+        self.game.advance_round()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('master', is_staff=True))
+        
+        with self.assertNumQueries(1):
+            response = client.get(f'/api/master/api/games/{self.game.pk}/rounds/', {'round': 1})
+        [summary] = response.json()
+        self.assertEqual((summary['round_number'], summary['lies']), (1, 1))
+        self.assertEqual(client.get(f'/api/master/api/games/{self.game.pk}/rounds/', {'round': 'x'}).status_code, 400)
+
+
+class GameCounterTests(TestCase):
+    """Contadores desnormalizados de jugadores, vivos y comunicaciones"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Contadores', status='active')
+        self.participants = create_players(self.game, 4)
+    
+    def counters(self):
+        return Game.objects.values_list('participant_count', 'alive_count', 'round_guess_count').get(pk=self.game.pk)
+    
+    def test_join_and_leave(self):
+        player = Player.objects.create(user=User.objects.create_user('nuevo'), display_name='Nuevo')
+        player.join_game(self.game)
+        self.assertEqual(self.counters(), (5, 5, 0))
+        
+        player.leave_game(self.game)
+        self.assertEqual(self.counters(), (4, 4, 0))
+    
+    def test_guesses_and_deaths(self):
+        first, second = self.participants[:2]
+        PlayerGuess.objects.create(
+            game=self.game, player=first.player, teller=second.player, told_symbol='♠', round_number=1
+        )
+        self.assertEqual(self.counters(), (4, 4, 1))
+        
+        # Elige mal su palo: muere al resolver la ronda, que empieza sin comunicaciones
+        GameParticipant.objects.filter(pk=first.pk).update(chosen_symbol='♦')
+        self.assertTrue(self.game.advance_round())
+        self.assertEqual(self.counters(), (4, 3, 0))
+    
+    def test_end_condition_reads_counter(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(self.game.check_game_end_condition())
+        self.assertEqual(Game.objects.get(pk=self.game.pk).players_count, 4)
+    
+    def test_full_save_keeps_counters(self):
+        stale = Game.objects.get(pk=self.game.pk)
+        self.participants[0].kill_player('Prueba')
+        stale.description = 'cambio'
+        stale.save()
+        self.assertEqual(self.counters(), (4, 3, 0))
+    
+    def test_reconcile_fixes_drift(self):
+        Game.objects.filter(pk=self.game.pk).update(participant_count=9, alive_count=0)
+        self.assertEqual(Game.reconcile_counters(pk=self.game.pk), 1)
+        self.assertEqual(self.counters(), (4, 4, 0))
+        self.assertEqual(Game.reconcile_counters(pk=self.game.pk), 0)
+
+
+class GuessLogTests(TestCase):
+    """Las comunicaciones se conservan entre rondas y caducan aparte"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Histórico', status='active')
+        self.teller, self.receiver, _ = create_players(self.game, 3)
+    
+    def tell(self, round_number):
+        return PlayerGuess.objects.create(
+            game=self.game, player=self.receiver.player, teller=self.teller.player,
+            told_symbol='♠', round_number=round_number
+        )
+    
+    def test_new_round_keeps_history(self):
+        self.tell(1)
+        
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(self.game.advance_round())
+        
+        self.assertFalse(any(q['sql'].startswith('DELETE') for q in context.captured_queries))
+        self.assertTrue(PlayerGuess.objects.filter(game=self.game, round_number=1).exists())
+    
+    def test_expire_skips_current_round(self):
+        old, current = self.tell(1), self.tell(2)
+        Game.objects.filter(pk=self.game.pk).update(current_round=2)
+        
+        deleted = PlayerGuess.expire(timezone.now() + timezone.timedelta(seconds=1), batch_size=1)
+        
+        self.assertEqual(deleted, 1)
+        self.assertFalse(PlayerGuess.objects.filter(pk=old.pk).exists())
+        self.assertTrue(PlayerGuess.objects.filter(pk=current.pk).exists())
+    
+    def test_one_guess_per_round_and_receiver(self):
+        self.tell(1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.tell(1)
+
+
+class EngineTests(SimpleTestCase):
+    """Reglas del motor en memoria, sin base de datos"""
+    
+    def state(self, player_id, suit='♠', chosen='♠', **kwargs):
+        return engine.PlayerState(player_id, player_id, f'p{player_id}', suit, chosen, **kwargs)
+    
+    def test_round_rules(self):
+        liar, honest, listener = self.state(1), self.state(2, karma_score=1), self.state(3, chosen='')
+        summary = engine.resolve_round(
+            [liar, honest, listener],
+            [(1, 3, '♥'), (2, 3, '♠'), (2, 99, '♠')]  # el receptor 99 no participa
+        )
+        
+        self.assertEqual((liar.lies_told, liar.karma_score, liar.is_dead), (1, 4, False))
+        self.assertEqual((honest.truths_told, honest.karma_score, honest.is_dead), (1, 0, True))
+        self.assertEqual(honest.death_reason, engine.KARMA_MIN_DEATH_REASON)
+        self.assertEqual(listener.death_reason, engine.SYMBOL_DEATH_REASON)
+        self.assertEqual(len(summary['deaths']), 2)
+    
+    def test_decide_winner(self):
+        first = self.state(1, truths_told=2, lies_told=1)
+        second = self.state(2, truths_told=0, lies_told=3)
+        self.assertIs(engine.decide_winner([first, second])[0], second)
+        
+        second.truths_told, second.lies_told = 2, 1
+        self.assertIsNone(engine.decide_winner([first, second])[0])
+        self.assertIsNone(engine.decide_winner([])[0])
+    
+    def test_large_round_tallies_every_guess(self):
+        rng = random.Random(7)
+        size = 5000
+        players = [self.state(i, rng.choice(SUITS), rng.choice(SUITS)) for i in range(size)]
+        guesses = [(i, rng.randrange(size), rng.choice(SUITS)) for i in range(size) for _ in range(2)]
+        suits = {state.player_id: state.suit_symbol for state in players}
+        
+        summary = engine.resolve_round(players, guesses)
+        
+        truths = sum(told_symbol == suits[receiver_id] for _, receiver_id, told_symbol in guesses)
+        self.assertEqual((summary['truths'], summary['lies']), (truths, len(guesses) - truths))
+        self.assertEqual(sum(state.interactions for state in players), len(guesses))
+        self.assertEqual(len(summary['deaths']), sum(state.is_dead for state in players))
+
+
+class EngineMatchesSQLTests(TestCase):
+    """La resolución en SQL y la del motor producen el mismo estado"""
+    
+    def build_game(self, name):
+        rng = random.Random(42)
+        game = Game.objects.create(name=name, status='active')
+        participants = create_players(game, 60, prefix=name)
+        for i, participant in enumerate(participants):
+            participant.karma_score = rng.choice([1, 3, 5])
+            participant.chosen_symbol = participant.suit_symbol if rng.random() > 0.1 else ''
+        GameParticipant.objects.bulk_update(participants, ['karma_score', 'chosen_symbol'])
+        PlayerGuess.objects.bulk_create([
+            PlayerGuess(
+                game=game, teller=participant.player, told_symbol=rng.choice(SUITS), round_number=1,
+                player=participants[(i + step) % len(participants)].player,
+            )
+            for i, participant in enumerate(participants) for step in range(1, rng.randint(1, 4))
+        ])
+        return game
+    
+    def test_same_outcome(self):
+        by_sql, in_memory = self.build_game('sql'), self.build_game('mem')
+        
+        sql_summary = by_sql.calculate_truths_and_lies(1)
+        memory_summary = resolve_round_in_memory(in_memory, 1)
+        
+        def outcome(game):
+            return [
+                (
+                    state.display_name[3:], state.karma_score, state.truths_told, state.lies_told,
+                    state.current_game_score, state.is_dead, state.death_reason, state.died_in_round,
+                )
+                for state in load_players(game.participants.order_by('pk'))
+            ]
+        
+        self.assertEqual(outcome(by_sql), outcome(in_memory))
+        self.assertEqual(len(sql_summary['deaths']), len(memory_summary['deaths']))
+        self.assertEqual(len(sql_summary['karma_changes']), len(memory_summary['karma_changes']))
+        self.assertEqual(
+            (sql_summary['truths'], sql_summary['lies']), (memory_summary['truths'], memory_summary['lies'])
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', "Los planes se comprueban con EXPLAIN QUERY PLAN de SQLite")
+class QueryPlanTests(TestCase):
+    """Las consultas frecuentes usan un índice y no recorren la tabla entera"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Planes', status='active')
+        self.participants = create_players(self.game, 3)
+    
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        # SQLite marca el recorrido completo como "SCAN tabla" (sin USING ... INDEX)
+        full_scans = [
+            line for line in plan.splitlines()
+            if re.search(r'\bSCAN\b', line) and 'INDEX' not in line
+        ]
+        self.assertEqual(full_scans, [], f"Recorrido completo en:\n{queryset.query}\n{plan}")
+    
+    def test_current_game(self):
+        self.assertUsesIndex(Game.objects.filter(status__in=['waiting', 'active'])[:1])
+        self.assertUsesIndex(Game.objects.filter(status='active')[:1])
+    
+    def test_alive_players(self):
+        self.assertUsesIndex(self.game.alive_players)
+        self.assertUsesIndex(self.game.get_survivors())
+    
+    def test_round_guesses_of_player(self):
+        self.assertUsesIndex(PlayerGuess.objects.filter(
+            game=self.game, player=self.participants[0].player, round_number=self.game.current_round
+        ).select_related('teller'))
+    
+    def test_online_players(self):
+        self.assertUsesIndex(Player.objects.filter(is_online=True).order_by('display_name'))
+    
+    def test_leaderboard(self):
+        from .leaderboard import ORDERING, ahead_of, key
+        
+        top = self.game.participants.select_related('player__user').order_by(*ORDERING)[:20]
+        self.assertUsesIndex(top)
+        # El índice ya da el orden: no se ordena en una tabla temporal
+        self.assertNotIn('TEMP B-TREE', top.explain())
+        self.assertUsesIndex(self.game.participants.filter(ahead_of(key(self.participants[0]))))
+
+
+class MasterEndpointBenchmark(QueryBudgetMixin, TestCase):
+    """Presupuestos de consultas de los endpoints del master"""
+    
+    def staff_user(self, game, participants):
+        return User.objects.create_user(f'master{game.pk.hex[:8]}', is_staff=True)
+    
+    def test_dashboard_api(self):
+        def run(game, participants):
+            self.assertEqual(self.client.get('/api/master/api/dashboard/').status_code, 200)
+        self.assertQueryBudget(
+            'master_dashboard_api_view', DEFAULT_BUDGETS['master:api_dashboard'], run, user=self.staff_user
+        )
+    
+    @override_settings(GAME_QUERY_BUDGETS={'master:api_dashboard': 1})
+    def test_default_budgets_raise(self):
+        game, participants = seed_benchmark_game(10)
+        self.client.force_login(self.staff_user(game, participants))
+        with self.assertRaises(queryprofile.QueryBudgetExceeded):
+            self.client.get('/api/master/api/dashboard/')
+    
+    def test_dashboard_api_not_modified(self):
+        def prepare(game, participants):
+            self.client.force_login(self.staff_user(game, participants))
+            self.etag = self.client.get('/api/master/api/dashboard/')['ETag']
+        
+        def run(game, participants):
+            response = self.client.get('/api/master/api/dashboard/', HTTP_IF_NONE_MATCH=self.etag)
+            self.assertEqual(response.status_code, 304)
+        self.assertQueryBudget('master_dashboard_api_view 304', 4, run, prepare=prepare)
+    
+    def test_dashboard_api_cached(self):
+        def prepare(game, participants):
+            self.client.force_login(self.staff_user(game, participants))
+            self.client.get('/api/master/api/dashboard/')
+        
+        def run(game, participants):
+            response = self.client.get('/api/master/api/dashboard/')
+            self.assertEqual(len(response.json()['online_players']), len(participants))
+        self.assertQueryBudget('master_dashboard_api_view (instantánea)', 7, run, prepare=prepare)
+    
+    def test_dashboard_etag_follows_game_state(self):
+        game, participants = seed_benchmark_game(10)
+        self.client.force_login(self.staff_user(game, participants))
+        etag = self.client.get('/api/master/api/dashboard/')['ETag']
+        player = Player.objects.get(pk=participants[0].player_id)
+        
+        # Ya estaba conectado: solo cambia la última actividad
+        player.set_online()
+        self.assertEqual(self.client.get('/api/master/api/dashboard/')['ETag'], etag)
+        
+        player.set_offline()
+        response = self.client.get('/api/master/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_advance_round(self):
+        def run(game, participants):
+            self.assertTrue(game.advance_round())
+        self.assertQueryBudget('Game.advance_round', 15, run)
+    
+    def test_game_results(self):
+        def run(game, participants):
+            response = self.client.get(f'/api/master/game/{game.pk}/results/')
+            self.assertEqual(len(response.context['all_players']), len(participants))
+        self.assertQueryBudget(
+            'game_results_view', DEFAULT_BUDGETS['master:game_results'], run,
+            user=self.staff_user, prepare=lambda game, _: game.finish_game(),
+        )
+
+
+@modify_settings(MIDDLEWARE={'append': 'master.queryprofile.QueryProfileMiddleware'})
+class QueryProfileTests(TestCase):
+    """Perfil de SQL por petición y presupuestos de consultas"""
+    
+    url = '/api/master/api/dashboard/'
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Perfil', status='active')
+        create_players(self.game, 5)
+        self.client.force_login(User.objects.create_user('master', is_staff=True))
+        # El middleware y el test instalan la medición; al terminar queda como estaba
+        self.enterContext(queryprofile.profiling())
+    
+    @override_settings(GAME_QUERY_TRACE=True)
+    def test_trace_headers(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(int(response['X-Query-Count']), len(context.captured_queries))
+        self.assertEqual(response['X-Query-Duplicates'], '0')
+        self.assertTrue(response['Server-Timing'].startswith('db;dur='))
+    
+    def test_no_trace_headers_by_default(self):
+        self.assertNotIn('X-Query-Count', self.client.get(self.url))
+    
+    @override_settings(GAME_QUERY_BUDGETS={'master:api_dashboard': 1}, GAME_QUERY_BUDGET_RAISE=True)
+    def test_budget_raises(self):
+        with self.assertRaises(queryprofile.QueryBudgetExceeded):
+            self.client.get(self.url)
+    
+    @override_settings(GAME_QUERY_BUDGETS={'master:api_dashboard': 1})
+    def test_budget_logs(self):
+        with self.assertLogs('mindgame.queries', 'WARNING') as logs:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('master:api_dashboard', logs.output[0])
+    
+    def test_repeated_queries_are_flagged(self):
+        with queryprofile.capture() as profile:
+            for participant in GameParticipant.objects.filter(game=self.game):
+                participant.player.display_name
+        self.assertEqual(profile.count, 6)
+        self.assertEqual(list(profile.duplicates(3).values()), [5])
+    
+    def test_profiling_restores_previous_state(self):
+        queryprofile.uninstall()
+        with queryprofile.profiling():
+            self.assertTrue(queryprofile.installed())
+            self.assertIn(queryprofile._record, connection.execute_wrappers)
+        self.assertFalse(queryprofile.installed())
+        self.assertNotIn(queryprofile._record, connection.execute_wrappers)
+        queryprofile.install()
+    
+    def test_in_lists_share_shape(self):
+        self.assertEqual(
+            queryprofile.query_shape('SELECT 1 FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            queryprofile.query_shape('SELECT 1 FROM t WHERE id IN (%s, %s, %s) LIMIT 1'),
+        )
+    
+    def test_enabled_by_middleware_or_setting(self):
+        with self.settings(MIDDLEWARE=[], GAME_QUERY_PROFILE=None):
+            self.assertFalse(queryprofile.enabled())
+        with self.settings(MIDDLEWARE=['master.metrics.MetricsMiddleware'], GAME_QUERY_PROFILE=None):
+            self.assertTrue(queryprofile.enabled())
+        with self.settings(MIDDLEWARE=['master.metrics.MetricsMiddleware'], GAME_QUERY_PROFILE=False):
+            self.assertFalse(queryprofile.enabled())
+
+
+@modify_settings(MIDDLEWARE={'append': 'master.profiling.ProfilerMiddleware'})
+class ProfilingTests(TestCase):
+    """Perfiles de CPU bajo demanda"""
+    
+    url = '/api/master/api/dashboard/'
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Perfil', status='active')
+        self.participants = create_players(self.game, 3)
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        self.profile_dir = profile_dir.name
+        settings_override = override_settings(GAME_PROFILE_DIR=self.profile_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+    
+    def test_staff_request_is_profiled(self):
+        self.client.force_login(User.objects.create_user('master', is_staff=True))
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+        
+        path = os.path.join(self.profile_dir, response['X-Profile-File'])
+        # La vista es asíncrona: en este hilo corre la parte síncrona (ORM, instantánea)
+        self.assertIn('build_dashboard_snapshot', {name for _, _, name in pstats.Stats(path).stats})
+    
+    def test_players_cannot_request_profiles(self):
+        self.client.force_login(self.participants[0].player.user)
+        response = self.client.get('/players/ajax/game-state/?profile=1')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-File', response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+    
+    @override_settings(GAME_PROFILE_ACTIONS_RATE=1)
+    def test_game_actions_are_sampled(self):
+        self.assertTrue(self.game.advance_round())
+        
+        [filename] = os.listdir(self.profile_dir)
+        self.assertIn('Game.advance_round', filename)
+
+
+@modify_settings(MIDDLEWARE={'append': 'master.metrics.MetricsMiddleware'})
+class MetricsTests(TestCase):
+    """Endpoint de métricas de Prometheus"""
+    
+    url = '/api/master/metrics/'
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Métricas', status='active')
+        create_players(self.game, 4)
+        self.client.force_login(User.objects.create_user('master', is_staff=True))
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        self.metrics_dir = metrics_dir.name
+        settings_override = override_settings(GAME_METRICS_DIR=self.metrics_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+    
+    def sample(self, text, series):
+        """Valor de la serie en el texto de exposición (0 si aún no existe)"""
+        lines = [line for line in text.splitlines() if line.startswith(f'{series} ')]
+        return float(lines[0].rsplit(' ', 1)[1]) if lines else 0
+    
+    def test_request_latency_and_queries(self):
+        before = metrics.render()
+        self.client.get('/api/master/api/dashboard/')
+        after = self.client.get(self.url).content.decode()
+        
+        count = 'mindgame_request_duration_seconds_count{view="master:api_dashboard"}'
+        queries = 'mindgame_request_queries_total{view="master:api_dashboard"}'
+        self.assertEqual(self.sample(after, count), self.sample(before, count) + 1)
+        self.assertGreater(self.sample(after, queries), 0)
+    
+    def test_game_gauges(self):
+        text = self.client.get(self.url).content.decode()
+        self.assertEqual(self.sample(text, f'mindgame_game_alive_players{{game="{self.game.pk.hex}"}}'), 4)
+        self.assertIn(f'mindgame_round_guesses{{game="{self.game.pk.hex}"}} 0', text)
+        self.assertEqual(self.sample(text, f'mindgame_game_round{{game="{self.game.pk.hex}"}}'), 1)
+        
+        # Sin cambios en el juego los gauges salen de la caché
+        with self.assertNumQueries(1):
+            metrics.render()
+    
+    def test_sums_other_processes(self):
+        own = self.sample(metrics.render(), 'mindgame_round_resolution_seconds_count')
+        buckets = len(metrics.ROUND_RESOLUTION_SECONDS.buckets) + 1
+        with open(os.path.join(self.metrics_dir, '99999.json'), 'w') as output:
+            json.dump({'counters': [], 'histograms': [
+                ['mindgame_round_resolution_seconds', [], [2] + [0] * (buckets - 1) + [0.004]],
+            ]}, output)
+        
+        self.assertEqual(self.sample(metrics.render(), 'mindgame_round_resolution_seconds_count'), own + 2)
+    
+    def test_missing_directory_is_empty(self):
+        missing = os.path.join(self.metrics_dir, 'sin-volcar')
+        with override_settings(GAME_METRICS_DIR=None), mock.patch.dict(os.environ, {'GAME_METRICS_DIR': missing}):
+            self.assertEqual(metrics.metrics_dir(), missing)
+            with mock.patch.object(metrics, 'flush'):
+                self.assertEqual(metrics.collect(), ({}, {}))
+                self.assertEqual(self.client.get(self.url).status_code, 200)
+    
+    @override_settings(GAME_METRICS_TOKEN='secreto')
+    def test_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer otro').status_code, 401)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+    
+    def test_staff_only_by_default(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(User.objects.create_user('jugador'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        with override_settings(GAME_METRICS_PUBLIC=True):
+            self.client.logout()
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class GameResultTests(TestCase):
+    """El resultado se guarda al finalizar y no depende del estado posterior"""
+    
+    def test_result_survives_reset(self):
+        game = Game.objects.create(name='Final', status='active')
+        winner, loser, dead = create_players(game, 3)
+        GameParticipant.objects.filter(pk=winner.pk).update(lies_told=2, truths_told=1)
+        GameParticipant.objects.filter(pk=dead.pk).update(is_dead=True, death_reason='has llegado a karma 6')
+        
+        self.assertTrue(game.finish_game())
+        game.reset_participants()
+        
+        result = game.result
+        self.assertEqual(result.winner_id, winner.player_id)
+        self.assertEqual(result.alive_count, 2)
+        self.assertFalse(result.is_tie)
+        self.assertEqual(result.winner_stats['lies_told'], 2)
+        self.assertTrue(result.stats_for(dead.player_id)['is_dead'])
+        self.assertEqual(result.final_stats[0]['player_id'], winner.player_id)
+    
+    def test_new_game_keeps_finished_games(self):
+        game = Game.objects.create(name='Anterior', status='active')
+        create_players(game, 3)
+        self.assertTrue(game.finish_game())
+        
+        self.client.force_login(User.objects.create_user('master', is_staff=True))
+        self.client.post('/api/master/game/create/', {'round_duration': 5})
+        
+        self.assertTrue(GameResult.objects.filter(game=game).exists())
+        self.assertEqual(Game.objects.filter(status='finished').count(), 1)
+        self.assertEqual(Game.objects.count(), 2)
+
+
+class ChangeFeedTests(TestCase):
+    """Feed de cambios y stream SSE"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Feed', status='waiting')
+        self.receiver, self.teller = create_players(self.game, 2)
+    
+    def read_stream(self, after_id=0, player_id=None):
+        return ''.join(changefeed.stream(self.game.pk, after_id, player_id, max_seconds=0))
+    
+    def test_transitions_are_published(self):
+        self.game.start_game()
+        self.game.pause_round()
+        self.game.resume_round()
+        
+        kinds = list(self.game.events.values_list('kind', flat=True))
+        self.assertEqual(kinds, ['round', 'pause', 'pause'])
+        paused = self.game.events.all()[1].payload
+        self.assertTrue(paused['is_paused'])
+        self.assertEqual(paused['round'], 1)
+    
+    def test_private_events_only_reach_recipient(self):
+        public = self.game.record_event('roster', player_id=self.teller.player_id)
+        private = self.game.record_event('guess', recipient=self.receiver.player, told_symbol='♠')
+        
+        self.assertIn(f'id: {private.pk}\nevent: guess', self.read_stream(player_id=self.receiver.player_id))
+        self.assertNotIn('event: guess', self.read_stream(player_id=self.teller.player_id))
+        self.assertNotIn('event: guess', self.read_stream())
+        # Reanudar desde un evento solo devuelve los posteriores
+        self.assertNotIn(f'id: {public.pk}\n', self.read_stream(after_id=public.pk, player_id=self.receiver.player_id))
+    
+    def test_stream_ends_after_finish(self):
+        self.game.start_game()
+        self.game.finish_game()
+        
+        body = self.read_stream()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertTrue(body.endswith('event: finished\ndata: ' + json_payload(self.game.events.last()) + '\n\n'))
+    
+    @mock.patch.object(changefeed, 'STREAM_MAX_SECONDS', 0)
+    def test_events_view(self):
+        self.client.force_login(self.receiver.player.user)
+        event = self.game.record_event('roster', player_id=self.teller.player_id)
+        
+        response = self.client.get(f'/api/master/game/{self.game.pk}/events/', HTTP_LAST_EVENT_ID=str(event.pk - 1))
+        
+        self.assertTrue(response['Content-Type'].startswith('text/event-stream'))
+        self.assertIn(f'id: {event.pk}\n', b''.join(response.streaming_content).decode())
+
+
+class SnapshotCacheTests(TestCase):
+    """Instantáneas por versión del juego y construcción única"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Instantánea', status='active')
+        self.participants = create_players(self.game, 3)
+        self.client.force_login(User.objects.create_user('master', is_staff=True))
+    
+    def dashboard_players(self):
+        return {row['id']: row for row in self.client.get('/api/master/api/dashboard/').json()['online_players']}
+    
+    def test_changes_invalidate_snapshot(self):
+        participant = self.participants[0]
+        self.assertFalse(self.dashboard_players()[participant.player_id]['is_dead'])
+        
+        participant.kill_player('Test')
+        self.assertTrue(self.dashboard_players()[participant.player_id]['is_dead'])
+        
+        player = participant.player
+        player.display_name = 'Renombrado'
+        player.save()
+        self.assertEqual(self.dashboard_players()[player.pk]['display_name'], 'Renombrado')
+    
+    def test_single_flight(self):
+        calls = []
+        barrier = threading.Barrier(8)
+        
+        def build():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'built': len(calls)}
+        
+        def request():
+            barrier.wait()
+            results.append(snapshots.get_or_build('test', self.game.pk, 1, build))
+        
+        results = []
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'built': 1}] * 8)
+        # Otra versión del juego es otra instantánea
+        self.assertEqual(snapshots.get_or_build('test', self.game.pk, 2, build), {'built': 2})
+    
+    def test_waiter_keeps_foreign_build_lock(self):
+        lock_key = snapshots.snapshot_key('test', self.game.pk, 1) + ':building'
+        snapshots._cache().add(lock_key, 'otro proceso', 10)
+        
+        # La espera vence sin instantánea: construye, pero la marca sigue siendo del otro
+        with mock.patch.object(snapshots, 'BUILD_LOCK_SECONDS', 0.1):
+            self.assertEqual(snapshots.get_or_build('test', self.game.pk, 1, lambda: {'built': True}), {'built': True})
+        self.assertEqual(snapshots._cache().get(lock_key), 'otro proceso')
+        snapshots._cache().delete(lock_key)
+
+
+class RosterDeltaTests(TestCase):
+    """Lista de jugadores incremental con ?since="""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Delta', status='active')
+        self.participants = create_players(self.game, 5)
+        self.client.force_login(User.objects.create_user('master', is_staff=True))
+    
+    def dashboard(self, since=None):
+        url = '/api/master/api/dashboard/' if since is None else f'/api/master/api/dashboard/?since={since}'
+        data = self.client.get(url).json()
+        return data['roster_version'], data['roster_full'], [row['id'] for row in data['online_players']]
+    
+    def test_only_changed_players(self):
+        version, full, ids = self.dashboard()
+        self.assertTrue(full)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(self.dashboard(version), (version, False, []))
+        
+        changed = self.participants[2]
+        changed.kill_player('Test')
+        new_version, full, ids = self.dashboard(version)
+        self.assertGreater(new_version, version)
+        self.assertFalse(full)
+        self.assertEqual(ids, [changed.player_id])
+        
+        # Cambios del jugador (conexión) también cuentan
+        Player.objects.get(pk=self.participants[3].player_id).set_online()
+        self.assertEqual(self.dashboard(new_version)[2], [self.participants[3].player_id])
+    
+    def test_bulk_changes_send_full_roster(self):
+        version = self.dashboard()[0]
+        
+        self.participants[0].player.leave_game(self.game)
+        version, full, ids = self.dashboard(version)
+        self.assertTrue(full)
+        self.assertEqual(len(ids), 4)
+        
+        self.game.update_players_for_new_round()
+        self.assertTrue(self.dashboard(version)[1])
+    
+    def test_unknown_since_sends_full_roster(self):
+        version = self.dashboard()[0]
+        self.assertTrue(self.dashboard(version + 1)[1])
+        self.assertTrue(self.dashboard('x')[1])
+
+
+class GatewayTests(TestCase):
+    """Gateway WebSocket y backends de difusión"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Gateway', status='active')
+        self.receiver, self.teller = create_players(self.game, 2)
+    
+    def scope(self, user=None, query=b''):
+        headers = []
+        if user is not None:
+            self.client.force_login(user)
+            headers.append((b'cookie', f"sessionid={self.client.cookies['sessionid'].value}".encode()))
+        return {
+            'type': 'websocket', 'path': f'/ws/game/{self.game.pk}/', 'query_string': query, 'headers': headers,
+        }
+    
+    async def connect(self, scope):
+        communicator = ApplicationCommunicator(gateway.websocket_router(None), scope)
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await communicator.receive_output(1), {'type': 'websocket.accept'})
+        # El gateway lee el feed antes de escuchar la difusión
+        await asyncio.sleep(0.1)
+        return communicator
+    
+    async def receive_event(self, communicator):
+        return json.loads((await communicator.receive_output(1))['text'])
+    
+    def record(self, kind, recipient=None, **payload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.game.record_event(kind, recipient=recipient, **payload)
+    
+    async def subscribe(self, backend):
+        return backend.subscribe(self.game.pk)
+    
+    async def test_player_receives_public_and_own_events(self):
+        player_socket = await self.connect(await sync_to_async(self.scope)(self.receiver.player.user))
+        teller_socket = await self.connect(await sync_to_async(self.scope)(self.teller.player.user))
+        
+        guess = await sync_to_async(self.record)('guess', recipient=self.receiver.player, told_symbol='♠')
+        roster = await sync_to_async(self.record)('roster', player_id=self.teller.player_id)
+        
+        self.assertEqual(await self.receive_event(player_socket), {
+            'id': guess.pk, 'event': 'guess', 'data': {'told_symbol': '♠'},
+        })
+        self.assertEqual((await self.receive_event(player_socket))['id'], roster.pk)
+        self.assertEqual((await self.receive_event(teller_socket))['id'], roster.pk)
+        
+        await player_socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await player_socket.wait(1)
+        await teller_socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await teller_socket.wait(1)
+    
+    async def test_since_replays_and_finish_closes(self):
+        staff = await sync_to_async(User.objects.create_user)('master', is_staff=True)
+        pause = await sync_to_async(self.record)('pause')
+        finished = await sync_to_async(self.record)('finished', winner_id=None)
+        
+        communicator = await self.connect(await sync_to_async(self.scope)(staff, query=f'since={pause.pk - 1}'.encode()))
+        self.assertEqual((await self.receive_event(communicator))['id'], pause.pk)
+        self.assertEqual((await self.receive_event(communicator))['id'], finished.pk)
+        self.assertEqual(await communicator.receive_output(1), {'type': 'websocket.close', 'code': 1000})
+    
+    async def test_anonymous_is_rejected(self):
+        communicator = ApplicationCommunicator(gateway.websocket_router(None), self.scope())
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(
+            await communicator.receive_output(1), {'type': 'websocket.close', 'code': gateway.CLOSE_FORBIDDEN}
+        )
+    
+    async def test_socket_backend_between_instances(self):
+        with tempfile.TemporaryDirectory() as socket_dir:
+            subscriber = broadcast.SocketBroadcast(socket_dir)
+            publisher = broadcast.SocketBroadcast(socket_dir)
+            
+            with subscriber.subscribe(self.game.pk) as subscription:
+                publisher.publish(self.game.pk, {'id': 1, 'event': 'pause', 'recipient': None, 'data': {}})
+                message = await asyncio.wait_for(subscription.get(), 1)
+        
+        self.assertEqual(message['event'], 'pause')
+    
+    async def test_socket_listener_skips_malformed_envelopes(self):
+        with tempfile.TemporaryDirectory() as socket_dir:
+            with mock.patch.dict(os.environ, {'GAME_BROADCAST_SOCKET_DIR': socket_dir}):
+                subscriber = broadcast.SocketBroadcast()
+                publisher = broadcast.SocketBroadcast()
+            self.assertEqual(subscriber.socket_dir, socket_dir)
+            
+            with subscriber.subscribe(self.game.pk) as subscription:
+                [name] = os.listdir(socket_dir)
+                with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+                    for data in (b'no es json', b'{"game": "x"}', b'[1, 2]'):
+                        sender.sendto(data, os.path.join(socket_dir, name))
+                publisher.publish(self.game.pk, {'id': 1, 'event': 'pause', 'recipient': None, 'data': {}})
+                message = await asyncio.wait_for(subscription.get(), 1)
+        
+        self.assertEqual(message['id'], 1)
+    
+    def test_closed_loop_drops_subscription(self):
+        backend = broadcast.InProcessBroadcast()
+        loop = asyncio.new_event_loop()
+        subscription = loop.run_until_complete(self.subscribe(backend))
+        loop.close()
+        
+        backend.publish(self.game.pk, {'id': 1, 'event': 'pause', 'recipient': None, 'data': {}})
+        self.assertNotIn(subscription.game_id, backend._subscriptions)
+    
+    async def test_catch_up_without_broadcast(self):
+        # Evento escrito por otro proceso: no llega aviso a este
+        player_socket = await self.connect(await sync_to_async(self.scope)(self.receiver.player.user))
+        pause = await sync_to_async(self.game.record_event)('pause')
+        
+        with mock.patch.object(gateway, 'CATCH_UP_INTERVAL', 0.1):
+            # El intervalo se lee en cada vuelta del bucle
+            await player_socket.send_input({'type': 'websocket.receive', 'text': 'ping'})
+            self.assertEqual((await self.receive_event(player_socket))['id'], pause.pk)
+        
+        await player_socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await player_socket.wait(1)
+    
+    async def test_broadcast_delivers_missed_events_in_order(self):
+        player_socket = await self.connect(await sync_to_async(self.scope)(self.receiver.player.user))
+        # El primero no avisa (como si lo escribiera otro worker); el segundo sí
+        pause = await sync_to_async(self.game.record_event)('pause')
+        roster = await sync_to_async(self.record)('roster', player_id=self.teller.player_id)
+        
+        self.assertEqual((await self.receive_event(player_socket))['id'], pause.pk)
+        self.assertEqual((await self.receive_event(player_socket))['id'], roster.pk)
+        
+        await player_socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await player_socket.wait(1)
+    
+    async def test_async_stream_wakes_on_broadcast(self):
+        stream = changefeed.astream(self.game.pk, 0, max_seconds=5)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.1)
+        pause = await sync_to_async(self.record)('pause')
+        chunk = await asyncio.wait_for(pending, 1)
+        self.assertTrue(chunk.startswith(f'id: {pause.pk}\nevent: pause'))
+        await stream.aclose()
+
+
+def json_payload(event):
+    return changefeed.format_event(event).split('data: ', 1)[1].rstrip('\n')
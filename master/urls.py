@@ -11,7 +11,7 @@ app_name = 'master'
 urlpatterns = [
     # API URLs
     path('api/', include(router.urls)),
-    path('api/dashboard/', views.MasterDashboardView.as_view(), name='api_dashboard'),
+    path('api/dashboard/', views.master_dashboard_api_view, name='api_dashboard'),
     
     # Web URLs para interfaz del master
     path('login/', views.master_login_view, name='login'),
@@ -20,6 +20,10 @@ urlpatterns = [
     path('game/<uuid:game_id>/start/', views.start_game_view, name='start_game'),
     path('game/<uuid:game_id>/finish/', views.finish_game_view, name='finish_game'),
     path('game/<uuid:game_id>/results/', views.game_results_view, name='game_results'),
+    path('game/<uuid:game_id>/events/', views.game_events_view, name='game_events'),
     path('game/create/', views.create_game_view, name='create_game'),
     path('game/<uuid:game_id>/', views.game_detail_view, name='game_detail'),
+    
+    # Métricas para Prometheus
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
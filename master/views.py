@@ -2,17 +2,26 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_http_methods
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.views import APIView
 from django.db.models import Q
-from .models import Game
+from . import changefeed, metrics, roster, snapshots
+from .decorators import api_login_required, async_condition
+from .etags import dashboard_etag
+from .gamelog import get_logger
+from .idempotency import idempotent
+from .models import Game, GameResult, IdempotentRequest, RoundSummary
 from players.models import Player
 from .serializers import GameSerializer
 
+logger = get_logger('master')
+
 class GameViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar juegos"""
     serializer_class = GameSerializer
@@ -28,6 +37,7 @@ class GameViewSet(viewsets.ModelViewSet):
         serializer.save()
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def start_game(self, request, pk=None):
         """Inicia un juego"""
         game = self.get_object()
@@ -51,6 +61,7 @@ class GameViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Juego iniciado correctamente'})
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def finish_game(self, request, pk=None):
         """Finaliza un juego"""
         game = self.get_object()
@@ -60,10 +71,15 @@ class GameViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        game.finish_game()
+        if not game.finish_game():
+            return Response(
+                {'error': 'El juego ha cambiado mientras se finalizaba'}, 
+                status=status.HTTP_409_CONFLICT
+            )
         return Response({'message': 'Juego finalizado correctamente'})
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def advance_round(self, request, pk=None):
         """Avanza a la siguiente ronda manualmente"""
         game = self.get_object()
@@ -73,10 +89,25 @@ class GameViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        game.advance_round()
+        if not game.advance_round():
+            game.refresh_from_db()
+            return Response(
+                {
+                    'error': 'La ronda ya ha sido avanzada por otro proceso',
+                    'current_round': game.current_round,
+                    'status': game.status,
+                }, 
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        # Misma comprobación que hace el planificador al vencer una ronda
+        if game.check_game_end_condition():
+            game.finish_game()
+        
         return Response({
             'message': 'Ronda avanzada correctamente',
             'current_round': game.current_round,
+            'status': game.status,
             'players_with_symbols': [
                 {
                     'display_name': p.display_name, 
@@ -87,6 +118,7 @@ class GameViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def pause_round(self, request, pk=None):
         """Pausa o reanuda la ronda actual"""
         game = self.get_object()
@@ -124,14 +156,30 @@ class GameViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def players(self, request, pk=None):
-        """Lista los jugadores conectados (ya que solo hay un juego activo)"""
+        """Lista los jugadores conectados inscritos en este juego"""
         from players.serializers import OnlinePlayerSerializer
-        from players.models import Player
         
-        online_players = Player.objects.filter(is_online=True).order_by('display_name')
+        game = self.get_object()
+        online_players = game.participants.filter(
+            player__is_online=True
+        ).select_related('player__user').order_by('player__display_name')
         serializer = OnlinePlayerSerializer(online_players, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def rounds(self, request, pk=None):
+        """Resúmenes de las rondas resueltas; ?round=N para una sola"""
+        from .serializers import RoundSummarySerializer
+        
+        summaries = RoundSummary.objects.filter(game_id=pk)
+        round_number = request.query_params.get('round')
+        if round_number is not None:
+            try:
+                summaries = summaries.filter(round_number=int(round_number))
+            except ValueError:
+                return Response({'error': 'Ronda no válida'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(RoundSummarySerializer(summaries, many=True).data)
+    
     @action(detail=True, methods=['get'])
     def statistics(self, request, pk=None):
         """Estadísticas del juego"""
@@ -145,48 +193,95 @@ class GameViewSet(viewsets.ModelViewSet):
         return Response(stats)
 
 
-class MasterDashboardView(APIView):
-    """Vista del panel de control del master"""
-    permission_classes = [permissions.IsAuthenticated]
+def build_dashboard_snapshot(current_game):
+    """Juego serializado y sus jugadores, tal como los muestra el dashboard del master"""
+    # Serializar jugadores manualmente para incluir más información
+    players_data = []
+    players_in_game = current_game.participants.select_related(
+        'player__user'
+    ).order_by('player__display_name')
     
-    def get(self, request):
-        """Dashboard con resumen del juego actual"""
-        current_game = Game.get_current_game()
-        
-        # Obtener jugadores en el juego
-        players_in_game = Player.objects.filter(is_in_game=True).order_by('display_name')
-        
-        # Serializar jugadores manualmente para incluir más información
+    for participant in players_in_game:
+        player = participant.player
+        players_data.append({
+            'id': player.id,
+            'display_name': player.display_name,
+            'username': player.user.username,
+            'karma_score': participant.karma_score,
+            'is_online': player.is_online,
+            'is_in_game': True,
+            'suit_emoji': participant.suit_emoji,
+            'suit_symbol': participant.suit_symbol,
+            'is_dead': participant.is_dead,
+            'death_reason': participant.death_reason,
+            'version': participant.state_version,
+        })
+    
+    return {
+        'current_game': GameSerializer(current_game).data,
+        'online_players': players_data,
+        # Contar solo jugadores vivos para las estadísticas
+        'alive_players_count': sum(1 for row in players_data if not row['is_dead']),
+    }
+
+
+@api_login_required
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@async_condition(etag_func=dashboard_etag)
+async def master_dashboard_api_view(request):
+    """Dashboard con resumen del juego actual (API del panel de control del master)"""
+    current_game = await Game.aget_current_game()
+    
+    if current_game:
+        # Juego y jugadores salen de la instantánea de esta versión del juego
+        snapshot = await snapshots.aget_or_build(
+            'master-dashboard', current_game.pk, current_game.state_version,
+            lambda: build_dashboard_snapshot(current_game)
+        )
+        game_data = dict(snapshot['current_game'])
+        # Campos que dependen del reloj: no se guardan en la instantánea
+        game_data['time_remaining_in_round'] = current_game.time_remaining_in_round
+        game_data['is_round_finished'] = current_game.is_round_finished
+        # Con ?since= solo los jugadores que han cambiado desde esa versión
+        players_data, roster_full = roster.changed_rows(
+            current_game, snapshot['online_players'], roster.parse_since(request)
+        )
+        alive_players_count = snapshot['alive_players_count']
+    else:
+        game_data = None
+        roster_full = True
+        # Sin juego: jugadores conectados esperando a la siguiente partida
         players_data = []
-        for player in players_in_game:
+        async for player in Player.objects.filter(is_online=True).select_related('user').order_by('display_name'):
             players_data.append({
                 'id': player.id,
                 'display_name': player.display_name,
                 'username': player.user.username,
-                'karma_score': player.karma_score,
-                'is_online': player.is_online,
-                'is_in_game': player.is_in_game,
-                'suit_emoji': player.suit_emoji,
-                'suit_symbol': player.suit_symbol,
-                'is_dead': player.is_dead,
-                'death_reason': player.death_reason,
+                'karma_score': 3,
+                'is_online': True,
+                'is_in_game': False,
+                'suit_emoji': '❓',
+                'suit_symbol': '',
+                'is_dead': False,
+                'death_reason': '',
             })
-        
-        # Contar solo jugadores vivos para las estadísticas
-        alive_players_count = players_in_game.filter(is_dead=False).count()
-        
-        dashboard_data = {
-            'current_game': GameSerializer(current_game).data if current_game else None,
-            'online_players': players_data,
-            'stats': {
-                'online_players': alive_players_count,  # Solo jugadores vivos
-                'total_players': Player.objects.count(),
-                'active_games': Game.objects.filter(status='active').count(),
-            },
-            'game_status': current_game.status if current_game else 'none',
-        }
-        
-        return Response(dashboard_data)
+        alive_players_count = len(players_data)
+    
+    dashboard_data = {
+        'current_game': game_data,
+        'online_players': players_data,
+        'stats': {
+            'online_players': alive_players_count,  # Solo jugadores vivos
+            'total_players': await Player.objects.acount(),
+            'active_games': await Game.objects.filter(status='active').acount(),
+        },
+        'game_status': current_game.status if current_game else 'none',
+        'roster_version': current_game.state_version if current_game else None,
+        'roster_full': roster_full,
+    }
+    
+    return JsonResponse(dashboard_data)
 
 
 # ============= VISTAS WEB PARA EL MASTER =============
@@ -221,11 +316,19 @@ def master_login_view(request):
 @user_passes_test(is_staff_user)
 def master_dashboard_view(request):
     """Dashboard principal del master"""
-    # Obtener jugadores INSCRITOS EN EL JUEGO (tanto conectados como desconectados)
-    online_players = Player.objects.filter(is_in_game=True).order_by('display_name')
+    # Obtener juego actual (activo o en espera)
+    current_game = Game.get_current_game()
     
-    # Contar solo jugadores vivos para las estadísticas
-    alive_players_count = online_players.filter(is_dead=False).count()
+    if current_game:
+        # Obtener jugadores INSCRITOS EN EL JUEGO (tanto conectados como desconectados)
+        online_players = current_game.participants.select_related('player').order_by('player__display_name')
+        
+        # Contar solo jugadores vivos para las estadísticas
+        alive_players_count = online_players.filter(is_dead=False).count()
+    else:
+        # Sin juego: mostrar quién está conectado esperando a jugar
+        online_players = Player.objects.filter(is_online=True).order_by('display_name')
+        alive_players_count = online_players.count()
     
     # Obtener estadísticas
     stats = {
@@ -233,9 +336,6 @@ def master_dashboard_view(request):
         'active_games': Game.objects.filter(status='active').count(),
     }
     
-    # Obtener juego actual (activo o en espera)
-    current_game = Game.get_current_game()
-    
     context = {
         'online_players': online_players,
         'stats': stats,
@@ -277,7 +377,9 @@ def finish_game_view(request, game_id):
     
     if request.method == 'POST':
         if game.status == 'active':
-            game.finish_game()
+            if not game.finish_game():
+                messages.error(request, 'El juego ha cambiado mientras se finalizaba.')
+                return redirect('master:dashboard')
             
             # Redirigir a la pantalla de resultados
             return redirect('master:game_results', game_id=game.id)
@@ -289,61 +391,20 @@ def finish_game_view(request, game_id):
 @login_required
 @user_passes_test(is_staff_user)
 def game_results_view(request, game_id):
-    """Muestra los resultados del juego finalizado"""
-    from players.models import Player
-    
-    game = get_object_or_404(Game, id=game_id)
+    """Muestra los resultados del juego finalizado (guardados al finalizarlo)"""
+    result = GameResult.objects.select_related('game').filter(game_id=game_id).first()
     
-    if game.status != 'finished':
+    if result is None:
+        get_object_or_404(Game, id=game_id)
         messages.error(request, 'Solo se pueden ver resultados de juegos finalizados.')
         return redirect('master:dashboard')
     
-    # Obtener todos los jugadores que participaron en el juego
-    all_players = Player.objects.filter(is_in_game=True).order_by('-lies_told', '-truths_told', 'display_name')
-    
-    # Determinar ganador usando la misma lógica que finish_game
-    alive_players = all_players.filter(is_dead=False)
-    alive_count = alive_players.count()
-    
-    winner = None
-    winner_reason = ""
-    
-    if alive_count == 0:
-        winner_reason = "Todos los jugadores han muerto. Nadie gana."
-    elif alive_count == 1:
-        winner = alive_players.first()
-        winner_reason = f"{winner.display_name} es el ganador (único superviviente)"
-    elif alive_count == 2:
-        players_list = list(alive_players.order_by('-lies_told', '-truths_told'))
-        player1, player2 = players_list[0], players_list[1]
-        
-        player1_interactions = player1.lies_told + player1.truths_told
-        player2_interactions = player2.lies_told + player2.truths_told
-        
-        if player1_interactions > player2_interactions:
-            winner = player1
-            winner_reason = f"{winner.display_name} gana por más interacciones ({player1_interactions} vs {player2_interactions})"
-        elif player2_interactions > player1_interactions:
-            winner = player2
-            winner_reason = f"{winner.display_name} gana por más interacciones ({player2_interactions} vs {player1_interactions})"
-        else:
-            if player1.lies_told > player2.lies_told:
-                winner = player1
-                winner_reason = f"{winner.display_name} gana por más mentiras en empate de interacciones ({player1.lies_told} vs {player2.lies_told})"
-            elif player2.lies_told > player1.lies_told:
-                winner = player2
-                winner_reason = f"{winner.display_name} gana por más mentiras en empate de interacciones ({player2.lies_told} vs {player1.lies_told})"
-            else:
-                winner_reason = f"Empate entre {player1.display_name} y {player2.display_name} (mismas interacciones y mentiras)"
-    else:
-        winner_reason = f"Juego finalizado con {alive_count} supervivientes"
-    
     context = {
-        'game': game,
-        'winner': winner,
-        'winner_reason': winner_reason,
-        'alive_count': alive_count,
-        'all_players': all_players,
+        'game': result.game,
+        'winner': result.winner_stats,
+        'winner_reason': result.winner_reason,
+        'alive_count': result.alive_count,
+        'all_players': result.final_stats,
     }
     
     return render(request, 'master/game_results.html', context)
@@ -352,8 +413,6 @@ def game_results_view(request, game_id):
 @user_passes_test(is_staff_user) 
 def create_game_view(request):
     """Crear e iniciar un nuevo juego directamente"""
-    from players.models import Player
-    
     # Verificar si ya existe un juego activo o en espera
     existing_game = Game.get_current_game()
     if existing_game:
@@ -361,10 +420,8 @@ def create_game_view(request):
         return redirect('master:dashboard')
     
     if request.method == 'POST':
-        # LIMPIAR JUEGOS FINALIZADOS Y RESETEAR JUGADORES
-        Game.cleanup_finished_games()
-        Player.reset_all_for_new_game()
-        print("[NEW_GAME] Juegos finalizados limpiados y jugadores reseteados")
+        # Los juegos finalizados se conservan: sus resultados, resúmenes e histórico
+        IdempotentRequest.cleanup_expired()
         
         round_duration = request.POST.get('round_duration', 10)  # Por defecto 10 minutos
         try:
@@ -384,14 +441,9 @@ def create_game_view(request):
         )
         
         # Inscribir automáticamente a todos los jugadores conectados
-        online_players = Player.objects.filter(is_online=True)
-        for player in online_players:
-            player.join_game()
-        
-        # Asignar símbolos automáticamente
-        Player.assign_suits_to_online_players()
+        game.enroll_players(Player.objects.filter(is_online=True))
         
-        # Iniciar el juego inmediatamente
+        # Iniciar el juego inmediatamente (sortea los símbolos de la primera ronda)
         game.start_game()
         
         messages.success(request, f'¡Nuevo juego iniciado! Rondas de {round_duration} minutos.')
@@ -404,3 +456,61 @@ def create_game_view(request):
 def game_detail_view(request, game_id):
     """Ver detalles de un juego (redirige al admin por ahora)"""
     return redirect('admin:master_game_change', game_id)
+
+@login_required
+def game_events_view(request, game_id):
+    """
+    Stream SSE con los cambios del juego.
+    
+    El master recibe los eventos públicos; cada jugador, además, los suyos
+    (comunicaciones recibidas). Se reanuda desde la cabecera Last-Event-ID o
+    el parámetro ?since=; sin ninguno empieza en el último evento.
+    """
+    game = get_object_or_404(Game, id=game_id)
+    
+    player_id = None
+    if not request.user.is_staff:
+        player = Player.objects.filter(user=request.user).only('id').first()
+        if player is None:
+            return JsonResponse({'error': 'No tienes un perfil de jugador'}, status=403)
+        player_id = player.id
+    
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        after_id = int(since)
+    except (TypeError, ValueError):
+        after_id = changefeed.latest_event_id(game.pk)
+    
+    # Bajo ASGI un generador síncrono se consumiría entero antes de enviarse
+    stream = changefeed.astream if isinstance(request, ASGIRequest) else changefeed.stream
+    response = StreamingHttpResponse(
+        stream(game.pk, after_id, player_id), content_type='text/event-stream; charset=utf-8'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: no almacenar el stream
+    return response
+
+def _metrics_response(request):
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    Métricas en formato de texto de Prometheus (ver master.metrics).
+    
+    Solo para el master o para un scrape con el token de GAME_METRICS_TOKEN;
+    el acceso anónimo exige GAME_METRICS_PUBLIC = True.
+    """
+    import hmac
+    from django.conf import settings
+    
+    if getattr(settings, 'GAME_METRICS_PUBLIC', False):
+        return _metrics_response(request)
+    
+    token = getattr(settings, 'GAME_METRICS_TOKEN', None)
+    authorization = request.headers.get('Authorization')
+    if token and authorization is not None:
+        if not hmac.compare_digest(authorization, f'Bearer {token}'):
+            return HttpResponse(status=401)
+        return _metrics_response(request)
+    return user_passes_test(is_staff_user)(_metrics_response)(request)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Player
+from .models import Player, GameParticipant, PlayerStats
 
 
 class PlayerInline(admin.StackedInline):
@@ -10,10 +10,8 @@ class PlayerInline(admin.StackedInline):
     can_delete = False
     verbose_name_plural = 'Perfil de Jugador'
     fields = [
-        'display_name', 'karma_score', 'suit_symbol', 
-        'is_online', 'current_game_score', 'secrets_discovered_this_game'
+        'display_name', 'is_online'
     ]
-    readonly_fields = ['current_game_score', 'secrets_discovered_this_game']
 
 
 class UserAdmin(BaseUserAdmin):
@@ -30,46 +28,33 @@ class UserAdmin(BaseUserAdmin):
 class PlayerAdmin(admin.ModelAdmin):
     """Administración de jugadores"""
     list_display = [
-        'display_name', 'user_username', 'suit_symbol', 
-        'karma_score', 'karma_level', 'is_online', 
-        'current_game_score', 'last_activity'
+        'display_name', 'user_username', 'is_online', 'last_activity'
     ]
     list_filter = [
-        'suit_symbol', 'karma_score', 'is_online', 
-        'created_at', 'last_activity'
+        'is_online', 'created_at', 'last_activity'
     ]
     search_fields = [
         'display_name', 'user__username', 'user__first_name', 
         'user__last_name', 'user__email'
     ]
     readonly_fields = [
-        'created_at', 'last_activity', 'karma_level', 
-        'current_game_score', 'secrets_discovered_this_game'
+        'created_at', 'last_activity'
     ]
     
     fieldsets = (
         ('Información del Jugador', {
             'fields': ('user', 'display_name')
         }),
-        ('Características del Juego', {
-            'fields': ('karma_score', 'karma_level', 'suit_symbol')
-        }),
         ('Estado de Conexión', {
             'fields': ('is_online', 'last_activity')
         }),
-        ('Estadísticas del Juego Actual', {
-            'fields': (
-                'current_game_score', 'secrets_discovered_this_game'
-            ),
-            'classes': ['collapse']
-        }),
         ('Fechas', {
             'fields': ('created_at',),
             'classes': ['collapse']
         })
     )
     
-    actions = ['set_online', 'set_offline', 'reset_karma']
+    actions = ['set_online', 'set_offline']
     
     def user_username(self, obj):
         """Muestra el username del usuario asociado"""
@@ -94,6 +79,23 @@ class PlayerAdmin(admin.ModelAdmin):
             f'{updated} jugador(es) marcado(s) como desconectado(s).'
         )
     set_offline.short_description = "Marcar como desconectados"
+
+
+@admin.register(GameParticipant)
+class GameParticipantAdmin(admin.ModelAdmin):
+    """Administración del estado de cada jugador en cada partida"""
+    list_display = [
+        'player', 'game', 'suit_symbol', 'karma_score', 'karma_level',
+        'truths_told', 'lies_told', 'is_dead'
+    ]
+    list_filter = ['game', 'suit_symbol', 'karma_score', 'is_dead']
+    search_fields = ['player__display_name', 'player__user__username', 'game__name']
+    list_select_related = ['player', 'game']
+    readonly_fields = [
+        'joined_at', 'karma_level', 'current_game_score', 'secrets_discovered_this_game'
+    ]
+    
+    actions = ['reset_karma']
     
     def reset_karma(self, request, queryset):
         """Acción para resetear el karma a 3 (valor por defecto)"""
@@ -105,6 +107,21 @@ class PlayerAdmin(admin.ModelAdmin):
     reset_karma.short_description = "Resetear karma a 3"
 
 
+@admin.register(PlayerStats)
+class PlayerStatsAdmin(admin.ModelAdmin):
+    """Estadísticas de carrera, sumadas al finalizar cada juego (solo lectura)"""
+    list_display = ['player', 'games_played', 'wins', 'truths_told', 'lies_told', 'rounds_survived', 'last_game_at']
+    search_fields = ['player__display_name', 'player__user__username']
+    list_select_related = ['player']
+    readonly_fields = [
+        'player', 'games_played', 'wins', 'truths_told', 'lies_told', 'total_score', 'rounds_survived',
+        'symbol_deaths', 'karma_max_deaths', 'karma_min_deaths', 'other_deaths', 'last_game_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+
+
 # Re-registrar UserAdmin
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
@@ -0,0 +1,122 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:47
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_state_to_participants(apps, schema_editor):
+    """Pasa el estado de la partida en curso de Player a GameParticipant"""
+    Game = apps.get_model('master', 'Game')
+    Player = apps.get_model('players', 'Player')
+    GameParticipant = apps.get_model('players', 'GameParticipant')
+    PlayerGuess = apps.get_model('players', 'PlayerGuess')
+    
+    game = Game.objects.filter(status__in=['waiting', 'active']).order_by('-created_at').first()
+    if game is None:
+        game = Game.objects.order_by('-created_at').first()
+    if game is None:
+        return
+    
+    GameParticipant.objects.bulk_create([
+        GameParticipant(
+            game=game,
+            player=player,
+            karma_score=player.karma_score,
+            suit_symbol=player.suit_symbol,
+            chosen_symbol=player.chosen_symbol,
+            current_game_score=player.current_game_score,
+            secrets_discovered_this_game=player.secrets_discovered_this_game,
+            truths_told=player.truths_told,
+            lies_told=player.lies_told,
+            is_dead=player.is_dead,
+            death_reason=player.death_reason,
+        )
+        for player in Player.objects.filter(is_in_game=True)
+    ])
+    PlayerGuess.objects.update(game=game)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0007_merge_20250806_1651'),
+        ('players', '0007_player_death_reason_player_is_dead'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('karma_score', models.IntegerField(default=3, help_text='Valor entre 0 y 6 que representa el karma del jugador en esta partida', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(6)], verbose_name='Puntuación de Karma')),
+                ('suit_symbol', models.CharField(blank=True, choices=[('♠', 'Picas (Spades)'), ('♥', 'Corazones (Hearts)'), ('♦', 'Diamantes (Diamonds)'), ('♣', 'Tréboles (Clubs)')], help_text='Símbolo correspondiente a los palos de la baraja (se asigna cada ronda)', max_length=1, verbose_name='Símbolo de palo (asignado por el master)')),
+                ('chosen_symbol', models.CharField(blank=True, choices=[('♠', 'Picas (Spades)'), ('♥', 'Corazones (Hearts)'), ('♦', 'Diamantes (Diamonds)'), ('♣', 'Tréboles (Clubs)')], help_text='Símbolo que el jugador cree que le corresponde (su elección/adivinanza)', max_length=1, verbose_name='Símbolo elegido por el jugador')),
+                ('current_game_score', models.IntegerField(default=0, help_text='Puntos obtenidos en esta partida', verbose_name='Puntuación del juego')),
+                ('secrets_discovered_this_game', models.IntegerField(default=0, help_text='Número de secretos descubiertos en esta partida', verbose_name='Secretos descubiertos este juego')),
+                ('truths_told', models.IntegerField(default=0, help_text='Número de veces que este jugador ha dicho la verdad sobre símbolos de otros', verbose_name='Verdades dichas')),
+                ('lies_told', models.IntegerField(default=0, help_text='Número de veces que este jugador ha mentido sobre símbolos de otros', verbose_name='Mentiras dichas')),
+                ('is_dead', models.BooleanField(default=False, help_text='Indica si el jugador ha sido eliminado de esta partida', verbose_name='¿Está muerto?')),
+                ('death_reason', models.CharField(blank=True, help_text='Razón por la cual el jugador fue eliminado', max_length=100, verbose_name='Motivo de muerte')),
+                ('joined_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de inscripción')),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='master.game')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participations', to='players.player')),
+            ],
+            options={
+                'verbose_name': 'Participante',
+                'verbose_name_plural': 'Participantes',
+                'ordering': ['player__display_name'],
+                'unique_together': {('game', 'player')},
+            },
+        ),
+        migrations.AddField(
+            model_name='playerguess',
+            name='game',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='guesses', to='master.game'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='playerguess',
+            unique_together={('game', 'round_number', 'teller', 'player')},
+        ),
+        migrations.RunPython(copy_state_to_participants, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='player',
+            name='chosen_symbol',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='current_game_score',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='death_reason',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='is_dead',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='is_in_game',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='karma_score',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='lies_told',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='secrets_discovered_this_game',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='suit_symbol',
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='truths_told',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('players', '0008_gameparticipant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playerguess',
+            index=models.Index(fields=['game', 'round_number', 'player'], name='guess_round_receiver_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0015_hot_filter_indexes'),
+        ('players', '0010_gameparticipant_state_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gameparticipant',
+            index=models.Index(condition=models.Q(('is_dead', False)), fields=['game'], name='participant_alive_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(condition=models.Q(('is_online', True)), fields=['display_name'], name='player_online_idx'),
+        ),
+    ]
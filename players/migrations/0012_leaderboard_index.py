@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('master', '0016_game_counters'),
+        ('players', '0011_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gameparticipant',
+            index=models.Index(fields=['game', '-karma_score', '-current_game_score', '-secrets_discovered_this_game', 'player'], name='participant_leaderboard_idx'),
+        ),
+    ]
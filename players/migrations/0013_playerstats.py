@@ -0,0 +1,76 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_stats(apps, schema_editor):
+    """Estadísticas de las partidas ya terminadas, desde sus resultados y resúmenes de ronda"""
+    GameResult = apps.get_model('master', 'GameResult')
+    RoundSummary = apps.get_model('master', 'RoundSummary')
+    Player = apps.get_model('players', 'Player')
+    PlayerStats = apps.get_model('players', 'PlayerStats')
+    
+    # Motivos de master.engine al crear esta migración
+    death_fields = {
+        "No has elegido tu símbolo correctamente": 'symbol_deaths',
+        "has llegado a karma 6": 'karma_max_deaths',
+        "has llegado a karma 0": 'karma_min_deaths',
+    }
+    existing = set(Player.objects.values_list('pk', flat=True))
+    stats = {}
+    for result in GameResult.objects.order_by('finished_at'):
+        last_round = 0
+        died_in = {}
+        for round_number, deaths in RoundSummary.objects.filter(game_id=result.game_id).values_list('round_number', 'deaths'):
+            last_round = max(last_round, round_number)
+            died_in.update({death['player_id']: round_number for death in deaths})
+        
+        for row in result.final_stats:
+            if row['player_id'] not in existing:
+                continue
+            player = stats.setdefault(row['player_id'], PlayerStats(player_id=row['player_id']))
+            player.games_played += 1
+            player.wins += row['player_id'] == result.winner_id
+            player.truths_told += row['truths_told']
+            player.lies_told += row['lies_told']
+            player.total_score += row.get('current_game_score', 0)
+            player.rounds_survived += died_in.get(row['player_id'], last_round)
+            if row['is_dead']:
+                field = death_fields.get(row['death_reason'], 'other_deaths')
+                setattr(player, field, getattr(player, field) + 1)
+            player.last_game_at = result.finished_at
+    PlayerStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('master', '0016_game_counters'),
+        ('players', '0012_leaderboard_index'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='players.player')),
+                ('games_played', models.PositiveIntegerField(default=0, verbose_name='Partidas jugadas')),
+                ('wins', models.PositiveIntegerField(default=0, verbose_name='Victorias')),
+                ('truths_told', models.PositiveIntegerField(default=0, verbose_name='Verdades dichas')),
+                ('lies_told', models.PositiveIntegerField(default=0, verbose_name='Mentiras dichas')),
+                ('total_score', models.IntegerField(default=0, verbose_name='Puntuación total')),
+                ('rounds_survived', models.PositiveIntegerField(default=0, verbose_name='Rondas sobrevividas')),
+                ('symbol_deaths', models.PositiveIntegerField(default=0, verbose_name='Muertes por símbolo')),
+                ('karma_max_deaths', models.PositiveIntegerField(default=0, verbose_name='Muertes por karma 6')),
+                ('karma_min_deaths', models.PositiveIntegerField(default=0, verbose_name='Muertes por karma 0')),
+                ('other_deaths', models.PositiveIntegerField(default=0, verbose_name='Otras muertes')),
+                ('last_game_at', models.DateTimeField(blank=True, null=True, verbose_name='Última partida')),
+            ],
+            options={
+                'verbose_name': 'Estadísticas del jugador',
+                'verbose_name_plural': 'Estadísticas de los jugadores',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
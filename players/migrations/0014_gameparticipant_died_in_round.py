@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+def fill_death_rounds(apps, schema_editor):
+    """Ronda de la muerte de los jugadores ya muertos, desde los resúmenes de ronda"""
+    GameParticipant = apps.get_model('players', 'GameParticipant')
+    RoundSummary = apps.get_model('master', 'RoundSummary')
+    
+    dead = GameParticipant.objects.filter(is_dead=True).select_related('game')
+    for participant in dead.iterator():
+        died_in = participant.game.current_round
+        for round_number, deaths in RoundSummary.objects.filter(game_id=participant.game_id).values_list('round_number', 'deaths'):
+            if any(death['player_id'] == participant.player_id for death in deaths):
+                died_in = min(died_in, round_number)
+        participant.died_in_round = died_in
+        participant.save(update_fields=['died_in_round'])
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('master', '0016_game_counters'),
+        ('players', '0013_playerstats'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='gameparticipant',
+            name='died_in_round',
+            field=models.IntegerField(blank=True, help_text='Ronda en la que murió, al resolverla o eliminado por el master', null=True, verbose_name='Ronda de la muerte'),
+        ),
+        migrations.RunPython(fill_death_rounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def delete_orphan_guesses(apps, schema_editor):
+    """Las comunicaciones sin juego son anteriores a 0008 y ya no se leen"""
+    PlayerGuess = apps.get_model('players', 'PlayerGuess')
+    PlayerGuess.objects.filter(game__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('players', '0014_gameparticipant_died_in_round'),
+    ]
+    
+    operations = [
+        migrations.RunPython(delete_orphan_guesses, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='playerguess',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='guesses', to='master.game'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from master.engine import KARMA_MAX_DEATH_REASON, KARMA_MIN_DEATH_REASON, SYMBOL_DEATH_REASON
+from master.gamelog import get_logger
+
+logger = get_logger('players')
 
 class Player(models.Model):
     """Modelo extendido para jugadores del juego"""
@@ -14,75 +18,151 @@ class Player(models.Model):
     ]
     
     user = models.OneToOneField(
-        User, 
-        on_delete=models.CASCADE, 
+        User,
+        on_delete=models.CASCADE,
         related_name='player_profile'
     )
     display_name = models.CharField(
-        max_length=50, 
+        max_length=50,
         verbose_name="Nombre para mostrar",
         help_text="Nombre que se mostrará en el juego"
     )
+    is_online = models.BooleanField(
+        default=False,
+        verbose_name="¿Está conectado a la web?",
+        help_text="Indica si el jugador está actualmente conectado a la interfaz web"
+    )
+    
+    # DATOS PERSISTENTES (se mantienen entre juegos)
+    # El estado de cada partida vive en GameParticipant
+    last_activity = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Última actividad"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Fecha de creación"
+    )
+    
+    class Meta:
+        verbose_name = "Jugador"
+        verbose_name_plural = "Jugadores"
+        ordering = ['display_name']
+        indexes = [
+            # Jugadores conectados en orden alfabético (dashboards e inscripción).
+            # Parcial: Django filtra los booleanos como WHERE "is_online", que
+            # SQLite no busca en un índice normal
+            models.Index(fields=['display_name'], condition=models.Q(is_online=True), name='player_online_idx'),
+        ]
+    
+    def __str__(self):
+        return self.display_name
     
-    # DATOS DEL JUEGO ACTUAL (se resetean cada partida)
+    # Campos del jugador que muestran los dashboards de sus juegos
+    DASHBOARD_FIELDS = {'display_name', 'is_online'}
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.DASHBOARD_FIELDS.intersection(update_fields):
+            from master.models import Game
+            from master.roster import next_version
+            
+            current = self.participations.filter(game__status__in=['waiting', 'active'])
+            current.update(state_version=next_version(models.OuterRef('game_id')))
+            Game.bump_state_version(participants__player=self, status__in=['waiting', 'active'])
+    
+    def _set_online_status(self, is_online):
+        """Guarda la conexión; si no cambia solo se actualiza la última actividad"""
+        if self.is_online == is_online:
+            self.save(update_fields=['last_activity'])
+            return
+        self.is_online = is_online
+        self.save(update_fields=['is_online', 'last_activity'])
+    
+    def set_online(self):
+        """Marca al jugador como conectado a la web"""
+        self._set_online_status(True)
+    
+    def set_offline(self):
+        """Marca al jugador como desconectado de la web (pero sigue en el juego si estaba)"""
+        self._set_online_status(False)
+    
+    def join_game(self, game):
+        """Inscribe al jugador en el juego indicado y devuelve su participación"""
+        participant, created = GameParticipant.objects.get_or_create(game=game, player=self)
+        if created:
+            game.record_event('roster', player_id=self.pk, display_name=self.display_name)
+        return participant
+    
+    def leave_game(self, game):
+        """Saca al jugador del juego indicado"""
+        from master.models import Game
+        
+        GameParticipant.objects.filter(game=game, player=self).delete()
+        Game.bump_state_version(reset_roster=True, counters=Game.recount(), pk=game.pk)
+    
+    def participation_in(self, game):
+        """Devuelve la participación del jugador en el juego indicado (o None)"""
+        if game is None:
+            return None
+        return GameParticipant.objects.filter(game=game, player=self).first()
+
+
+class GameParticipant(models.Model):
+    """Estado de un jugador dentro de una partida concreta"""
+    game = models.ForeignKey('master.Game', on_delete=models.CASCADE, related_name='participants')
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='participations')
+    
+    # DATOS DEL JUEGO (propios de esta partida)
     karma_score = models.IntegerField(
         default=3,
         validators=[MinValueValidator(0), MaxValueValidator(6)],
         verbose_name="Puntuación de Karma",
-        help_text="Valor entre 0 y 6 que representa el karma del jugador (se resetea cada juego)"
+        help_text="Valor entre 0 y 6 que representa el karma del jugador en esta partida"
     )
     suit_symbol = models.CharField(
         max_length=1,
-        choices=SUIT_CHOICES,
+        choices=Player.SUIT_CHOICES,
         blank=True,
         verbose_name="Símbolo de palo (asignado por el master)",
-        help_text="Símbolo correspondiente a los palos de la baraja (se asigna cada juego por el master)"
+        help_text="Símbolo correspondiente a los palos de la baraja (se asigna cada ronda)"
     )
     chosen_symbol = models.CharField(
         max_length=1,
-        choices=SUIT_CHOICES,
+        choices=Player.SUIT_CHOICES,
         blank=True,
         verbose_name="Símbolo elegido por el jugador",
         help_text="Símbolo que el jugador cree que le corresponde (su elección/adivinanza)"
     )
-    is_online = models.BooleanField(
-        default=False,
-        verbose_name="¿Está conectado a la web?",
-        help_text="Indica si el jugador está actualmente conectado a la interfaz web"
-    )
-    is_in_game = models.BooleanField(
-        default=False,
-        verbose_name="¿Está participando en el juego?",
-        help_text="Indica si el jugador está inscrito en el juego actual (independiente de conexión web)"
-    )
     current_game_score = models.IntegerField(
         default=0,
-        verbose_name="Puntuación del juego actual",
-        help_text="Puntos obtenidos en el juego actual (se resetea cada juego)"
+        verbose_name="Puntuación del juego",
+        help_text="Puntos obtenidos en esta partida"
     )
     secrets_discovered_this_game = models.IntegerField(
         default=0,
         verbose_name="Secretos descubiertos este juego",
-        help_text="Número de secretos descubiertos en el juego actual (se resetea cada juego)"
+        help_text="Número de secretos descubiertos en esta partida"
     )
     
-    # CONTADORES DE MENTIRAS/VERDADES (se resetean cada juego)
+    # CONTADORES DE MENTIRAS/VERDADES
     truths_told = models.IntegerField(
         default=0,
         verbose_name="Verdades dichas",
-        help_text="Número de veces que este jugador ha dicho la verdad sobre símbolos de otros (se resetea cada juego)"
+        help_text="Número de veces que este jugador ha dicho la verdad sobre símbolos de otros"
     )
     lies_told = models.IntegerField(
         default=0,
         verbose_name="Mentiras dichas",
-        help_text="Número de veces que este jugador ha mentido sobre símbolos de otros (se resetea cada juego)"
+        help_text="Número de veces que este jugador ha mentido sobre símbolos de otros"
     )
     
-    # ESTADO DE MUERTE (se resetea cada juego)
+    # ESTADO DE MUERTE
     is_dead = models.BooleanField(
         default=False,
         verbose_name="¿Está muerto?",
-        help_text="Indica si el jugador ha sido eliminado del juego actual"
+        help_text="Indica si el jugador ha sido eliminado de esta partida"
     )
     death_reason = models.CharField(
         max_length=100,
@@ -90,31 +170,74 @@ class Player(models.Model):
         verbose_name="Motivo de muerte",
         help_text="Razón por la cual el jugador fue eliminado"
     )
-    
-    # DATOS PERSISTENTES (se mantienen entre juegos)
-    last_activity = models.DateTimeField(
-        auto_now=True,
-        verbose_name="Última actividad"
+    died_in_round = models.IntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Ronda de la muerte",
+        help_text="Ronda en la que murió, al resolverla o eliminado por el master"
     )
-    created_at = models.DateTimeField(
+    
+    joined_at = models.DateTimeField(
         auto_now_add=True,
-        verbose_name="Fecha de creación"
+        verbose_name="Fecha de inscripción"
     )
     
+    # Versión del juego en la que cambió este participante (actualizaciones
+    # incrementales de la lista de jugadores, ver master.roster)
+    state_version = models.PositiveBigIntegerField(default=0, verbose_name="Versión del estado")
+    
     class Meta:
-        verbose_name = "Jugador"
-        verbose_name_plural = "Jugadores"
-        ordering = ['display_name']
+        verbose_name = "Participante"
+        verbose_name_plural = "Participantes"
+        unique_together = ['game', 'player']
+        ordering = ['player__display_name']
+        indexes = [
+            # Vivos de un juego (check_game_end_condition, get_survivors)
+            models.Index(fields=['game'], condition=models.Q(is_dead=False), name='participant_alive_idx'),
+            # Ranking de un juego en el orden de master.leaderboard
+            models.Index(
+                fields=['game', '-karma_score', '-current_game_score', '-secrets_discovered_this_game', 'player'],
+                name='participant_leaderboard_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.display_name} ({self.get_suit_symbol_display() if self.suit_symbol else 'Sin palo'}) - Karma: {self.karma_score}"
     
+    def save(self, *args, **kwargs):
+        from master.models import Game
+        from master.roster import next_version
+        
+        # Primero el participante con la versión siguiente y después el juego:
+        # quien lea la versión del juego nunca se salta este cambio
+        adding = self._state.adding
+        self.state_version = next_version(self.game_id)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'state_version'}
+        super().save(*args, **kwargs)
+        del self.state_version
+        counters = Game.increments(participant_count=1, alive_count=0 if self.is_dead else 1) if adding else None
+        Game.bump_state_version(counters=counters, pk=self.game_id)
+    
+    def delete(self, *args, **kwargs):
+        from master.models import Game
+        
+        game_id = self.game_id
+        result = super().delete(*args, **kwargs)
+        # Las bajas no dejan rastro: los clientes vuelven a pedir la lista entera
+        Game.bump_state_version(reset_roster=True, counters=Game.recount(), pk=game_id)
+        return result
+    
+    @property
+    def display_name(self):
+        return self.player.display_name
+    
     @property
     def karma_level(self):
         """Devuelve el nivel de karma como texto"""
         levels = {
             0: "Muy Bajo",
-            1: "Bajo", 
+            1: "Bajo",
             2: "Regular",
             3: "Normal",
             4: "Bueno",
@@ -135,7 +258,7 @@ class Player(models.Model):
         
         # Verificar si el jugador muere por karma 0
         if not self.is_dead and self.karma_score == 0 and old_karma > 0:
-            self.kill_player("has llegado a karma 0")
+            self.kill_player(KARMA_MIN_DEATH_REASON)
         
         self.save()
     
@@ -146,171 +269,161 @@ class Player(models.Model):
         
         # Verificar si el jugador muere por karma 6
         if not self.is_dead and self.karma_score == 6 and old_karma < 6:
-            self.kill_player("has llegado a karma 6")
+            self.kill_player(KARMA_MAX_DEATH_REASON)
         
         self.save()
     
     def kill_player(self, reason):
         """Mata al jugador por el motivo especificado"""
         if not self.is_dead:
+            from master.models import Game
+            
             self.is_dead = True
             self.death_reason = reason
+            self.died_in_round = self.game.current_round
             self.save()
-            print(f"{self.display_name} ha muerto: {reason}")
+            Game.objects.filter(pk=self.game_id).update(**Game.increments(alive_count=-1))
+            logger.info("Jugador eliminado: %s", reason, extra={'game': self.game_id, 'player': self.player_id})
     
     def revive_player(self):
         """Revive al jugador (para nuevos juegos)"""
+        from master.models import Game
+        
+        was_dead = self.is_dead
         self.is_dead = False
         self.death_reason = ""
+        self.died_in_round = None
         self.save()
+        if was_dead:
+            Game.objects.filter(pk=self.game_id).update(**Game.increments(alive_count=1))
     
     def check_symbol_death(self):
         """Verifica si el jugador debe morir por elegir mal su símbolo"""
         if not self.is_dead and self.suit_symbol:
             if (self.chosen_symbol != self.suit_symbol) or (not self.chosen_symbol):
-                print(f"  - MUERTE: {self.chosen_symbol} != {self.suit_symbol}")
-                self.kill_player("No has elegido tu símbolo correctamente")
+                logger.debug("Símbolo elegido %r != %r", self.chosen_symbol, self.suit_symbol)
+                self.kill_player(SYMBOL_DEATH_REASON)
                 return True
         
         return False
     
-    def set_online(self):
-        """Marca al jugador como conectado a la web"""
-        self.is_online = True
-        self.save()
-    
-    def set_offline(self):
-        """Marca al jugador como desconectado de la web (pero sigue en el juego si estaba)"""
-        self.is_online = False
-        self.save()
-    
-    def join_game(self):
-        """Inscribe al jugador en el juego actual"""
-        self.is_in_game = True
-        self.save()
-    
-    def leave_game(self):
-        """Saca al jugador del juego actual"""
-        self.is_in_game = False
-        self.suit_symbol = ''  # Quitar símbolo cuando sale del juego
-        self.save()
-    
-    def reset_for_new_game(self):
-        """Reinicia el jugador para un nuevo juego - SOLO conserva user y display_name"""
-        self.karma_score = 3  # Valor por defecto
-        self.suit_symbol = ''  # Se asignará cuando se una al juego
-        self.chosen_symbol = ''  # Limpiar elección del símbolo
-        self.is_in_game = False  # No está en ningún juego hasta que se inscriba
-        self.current_game_score = 0
-        self.secrets_discovered_this_game = 0
-        self.truths_told = 0  # Resetear verdades
-        self.lies_told = 0  # Resetear mentiras
-        self.is_dead = False  # Revivir para nuevo juego
-        self.death_reason = ''  # Limpiar motivo de muerte
-        self.save()
-        
-        # Limpiar todas las adivinanzas de este jugador
-        PlayerGuess.objects.filter(player=self).delete()
-        PlayerGuess.objects.filter(teller=self).delete()
-    
-    def reset_for_new_round(self, round_number):
-        """Reinicia el jugador para una nueva ronda"""
-        self.chosen_symbol = ''  # Limpiar elección del símbolo para la nueva ronda
-        self.save()
-        
-        # Limpiar adivinanzas de rondas anteriores (mantener solo la ronda actual)
-        PlayerGuess.objects.filter(player=self).exclude(round_number=round_number).delete()
-        PlayerGuess.objects.filter(teller=self).exclude(round_number=round_number).delete()
-    
     def assign_suit(self, suit_symbol):
-        """Asigna un palo al jugador para el juego actual"""
+        """Asigna un palo al jugador para la ronda actual"""
         self.suit_symbol = suit_symbol
         self.save()
     
     def add_score(self, points):
-        """Agrega puntos al jugador en el juego actual"""
+        """Agrega puntos al jugador en esta partida"""
         self.current_game_score += points
         self.save()
     
     def discover_secret(self):
-        """Incrementa el contador de secretos descubiertos en este juego"""
+        """Incrementa el contador de secretos descubiertos en esta partida"""
         self.secrets_discovered_this_game += 1
         self.save()
+
+
+class PlayerStats(models.Model):
+    """
+    Estadísticas de toda la carrera de un jugador, una fila por jugador.
     
-    @classmethod
-    def reset_all_for_new_game(cls):
-        """Reinicia todos los jugadores para un nuevo juego"""
-        cls.objects.all().update(
-            karma_score=3,
-            suit_symbol='',
-            chosen_symbol='',
-            is_online=False,
-            current_game_score=0,
-            secrets_discovered_this_game=0,
-            truths_told=0,
-            lies_told=0,
-            is_dead=False,
-            death_reason=''
-        )
-        # Limpiar todas las adivinanzas
-        PlayerGuess.objects.all().delete()
+    Las participaciones se reinician entre partidas: al finalizar cada juego
+    record_game suma aquí lo que hizo cada participante, así que los perfiles y
+    rankings leen una sola fila sin recorrer resultados anteriores.
+    """
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    games_played = models.PositiveIntegerField(default=0, verbose_name="Partidas jugadas")
+    wins = models.PositiveIntegerField(default=0, verbose_name="Victorias")
+    truths_told = models.PositiveIntegerField(default=0, verbose_name="Verdades dichas")
+    lies_told = models.PositiveIntegerField(default=0, verbose_name="Mentiras dichas")
+    total_score = models.IntegerField(default=0, verbose_name="Puntuación total")
+    # Rondas resueltas con el jugador vivo, contando la de su muerte
+    rounds_survived = models.PositiveIntegerField(default=0, verbose_name="Rondas sobrevividas")
     
-    @classmethod
-    def reset_all_for_new_round(cls, round_number):
-        """Reinicia todos los jugadores para una nueva ronda"""
-        cls.objects.all().update(chosen_symbol='')
-        # Limpiar adivinanzas de rondas anteriores
-        PlayerGuess.objects.exclude(round_number=round_number).delete()
+    # MUERTES POR CAUSA
+    symbol_deaths = models.PositiveIntegerField(default=0, verbose_name="Muertes por símbolo")
+    karma_max_deaths = models.PositiveIntegerField(default=0, verbose_name="Muertes por karma 6")
+    karma_min_deaths = models.PositiveIntegerField(default=0, verbose_name="Muertes por karma 0")
+    other_deaths = models.PositiveIntegerField(default=0, verbose_name="Otras muertes")
     
-    @classmethod
-    def assign_suits_to_online_players(cls):
-        """Asigna palos automáticamente a jugadores conectados"""
-        online_players = cls.objects.filter(is_online=True, suit_symbol='')
-        suits = ['♠', '♥', '♦', '♣']
-        
-        for i, player in enumerate(online_players):
-            if i < len(suits):
-                player.assign_suit(suits[i])
-            else:
-                # Si hay más de 4 jugadores, reutilizar palos
-                player.assign_suit(suits[i % len(suits)])
+    last_game_at = models.DateTimeField(null=True, blank=True, verbose_name="Última partida")
+    
+    class Meta:
+        verbose_name = "Estadísticas del jugador"
+        verbose_name_plural = "Estadísticas de los jugadores"
+    
+    def __str__(self):
+        return f"{self.player_id}: {self.games_played} partidas, {self.wins} victorias"
+    
+    @property
+    def deaths(self):
+        return self.symbol_deaths + self.karma_max_deaths + self.karma_min_deaths + self.other_deaths
+    
+    @property
+    def lie_ratio(self):
+        """Fracción de mentiras entre sus comunicaciones (None si no ha hablado)"""
+        told = self.truths_told + self.lies_told
+        return self.lies_told / told if told else None
+    
+    @property
+    def average_survival_rounds(self):
+        return self.rounds_survived / self.games_played if self.games_played else None
     
     @classmethod
-    def check_game_end_condition(cls):
+    def record_game(cls, game, winner_id):
         """
-        Verifica si el juego debe terminar automáticamente.
-        El juego termina cuando quedan 2 o menos jugadores vivos en el juego.
+        Suma a las estadísticas de sus jugadores el juego que acaba de terminar.
         
-        Returns:
-            bool: True si el juego debe terminar, False en caso contrario
+        Se llama una vez por juego desde Game.finish_game, antes de reiniciar
+        las participaciones. Consultas fijas, sin importar los jugadores: lee
+        los jugadores, crea las filas que falten y actualiza todas en un único
+        UPDATE con subconsultas.
         """
-        alive_players_count = cls.objects.filter(
-            is_in_game=True,
-            is_dead=False
-        ).count()
+        from django.db.models import Case, Exists, OuterRef, Subquery, Value, When
+        from django.db.models.functions import Coalesce, Least
+        from django.utils import timezone
         
-        if alive_players_count <= 2:
-            print(f"CONDICIÓN DE FIN DE JUEGO: Solo quedan {alive_players_count} jugador(es) vivo(s)")
-            return True
+        player_ids = list(game.participants.order_by().values_list('player_id', flat=True))
+        if not player_ids:
+            return 0
+        cls.objects.bulk_create([cls(player_id=player_id) for player_id in player_ids], ignore_conflicts=True)
         
-        return False
-    
-    @classmethod
-    def get_survivors(cls):
-        """
-        Obtiene la lista de jugadores supervivientes del juego.
+        # Rondas resueltas: las vivas hasta la última y las muertas hasta la de su muerte
+        last_round = Value(max(game.current_round - 1, 0))
         
-        Returns:
-            QuerySet: Jugadores que siguen vivos en el juego
-        """
-        return cls.objects.filter(
-            is_in_game=True,
-            is_dead=False
-        ).order_by('display_name')
+        participant = GameParticipant.objects.filter(game=game, player=OuterRef('player')).order_by()
+        
+        def value(field):
+            return Subquery(participant.values(field)[:1])
+        
+        def died(condition):
+            return Case(When(Exists(participant.filter(condition, is_dead=True)), then=Value(1)), default=Value(0))
+        
+        known_reasons = [SYMBOL_DEATH_REASON, KARMA_MAX_DEATH_REASON, KARMA_MIN_DEATH_REASON]
+        return cls.objects.filter(player_id__in=player_ids).update(
+            games_played=models.F('games_played') + 1,
+            wins=models.F('wins') + Case(When(player_id=winner_id, then=Value(1)), default=Value(0)),
+            truths_told=models.F('truths_told') + value('truths_told'),
+            lies_told=models.F('lies_told') + value('lies_told'),
+            total_score=models.F('total_score') + value('current_game_score'),
+            rounds_survived=models.F('rounds_survived') + Least(Coalesce(value('died_in_round'), last_round), last_round),
+            symbol_deaths=models.F('symbol_deaths') + died(models.Q(death_reason=SYMBOL_DEATH_REASON)),
+            karma_max_deaths=models.F('karma_max_deaths') + died(models.Q(death_reason=KARMA_MAX_DEATH_REASON)),
+            karma_min_deaths=models.F('karma_min_deaths') + died(models.Q(death_reason=KARMA_MIN_DEATH_REASON)),
+            other_deaths=models.F('other_deaths') + died(~models.Q(death_reason__in=known_reasons)),
+            last_game_at=timezone.now(),
+        )
 
 
 class PlayerGuess(models.Model):
-    """Modelo para rastrear lo que otros jugadores le dicen a un jugador sobre su símbolo"""
+    """
+    Registro de lo que otros jugadores le dicen a un jugador sobre su símbolo.
+    
+    Es un histórico: las rondas nuevas no borran las anteriores. Las lecturas
+    van siempre a la porción (juego, ronda) y las filas antiguas se caducan en
+    segundo plano con expire().
+    """
+    game = models.ForeignKey('master.Game', on_delete=models.CASCADE, related_name='guesses')
     player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='received_guesses')
     teller = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='given_guesses')
     told_symbol = models.CharField(max_length=2, choices=Player.SUIT_CHOICES)
@@ -318,8 +431,42 @@ class PlayerGuess(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        unique_together = ['player', 'teller', 'round_number']
+        unique_together = ['game', 'round_number', 'teller', 'player']
+        indexes = [
+            # Comunicaciones recibidas por un jugador en una ronda
+            models.Index(fields=['game', 'round_number', 'player'], name='guess_round_receiver_idx'),
+        ]
         ordering = ['-timestamp']
     
     def __str__(self):
-        return f"{self.teller.username} told {self.player.username}: {self.told_symbol} (Round {self.round_number})"
+        return f"{self.teller.display_name} told {self.player.display_name}: {self.told_symbol} (Round {self.round_number})"
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        from master.models import Game
+        
+        counters = None
+        if adding:
+            # Solo cuenta si es de la ronda en curso
+            counters = {'round_guess_count': models.Case(
+                models.When(current_round=self.round_number, then=models.F('round_guess_count') + 1),
+                default=models.F('round_guess_count'),
+            )}
+        Game.bump_state_version(counters=counters, pk=self.game_id)
+    
+    @classmethod
+    def expire(cls, before, batch_size=1000):
+        """
+        Borra por lotes las comunicaciones anteriores a `before` de rondas ya
+        cerradas (nunca las de la ronda en curso). Devuelve cuántas se borraron.
+        """
+        expired = cls.objects.filter(timestamp__lt=before).filter(
+            models.Q(game__status='finished') | models.Q(round_number__lt=models.F('game__current_round'))
+        )
+        deleted = 0
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return deleted
+            deleted += cls.objects.filter(pk__in=batch).delete()[0]
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Player
+from .models import Player, GameParticipant, PlayerStats
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -13,29 +13,47 @@ class UserSerializer(serializers.ModelSerializer):
 class PlayerSerializer(serializers.ModelSerializer):
     """Serializer para jugadores"""
     user = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = Player
+        fields = [
+            'id', 'user', 'display_name', 'is_online', 'last_activity', 'created_at'
+        ]
+        read_only_fields = [
+            'last_activity', 'created_at'
+        ]
+
+
+class GameParticipantSerializer(serializers.ModelSerializer):
+    """Serializer para el estado de un jugador en una partida"""
+    id = serializers.IntegerField(source='player.id', read_only=True)
+    user = UserSerializer(source='player.user', read_only=True)
+    display_name = serializers.CharField(source='player.display_name', read_only=True)
+    is_online = serializers.BooleanField(source='player.is_online', read_only=True)
+    last_activity = serializers.DateTimeField(source='player.last_activity', read_only=True)
     karma_level = serializers.ReadOnlyField()
     suit_emoji = serializers.ReadOnlyField()
     
     class Meta:
-        model = Player
+        model = GameParticipant
         fields = [
             'id', 'user', 'display_name', 'karma_score', 'karma_level',
             'suit_symbol', 'suit_emoji', 'is_online', 'last_activity',
-            'current_game_score', 'secrets_discovered_this_game', 'created_at'
-        ]
-        read_only_fields = [
-            'last_activity', 'current_game_score', 
-            'secrets_discovered_this_game', 'created_at'
+            'current_game_score', 'secrets_discovered_this_game',
+            'is_dead', 'death_reason'
         ]
 
 
 class OnlinePlayerSerializer(serializers.ModelSerializer):
-    """Serializer simplificado para jugadores conectados"""
-    user_username = serializers.CharField(source='user.username', read_only=True)
+    """Serializer simplificado para jugadores conectados de una partida"""
+    id = serializers.IntegerField(source='player.id', read_only=True)
+    display_name = serializers.CharField(source='player.display_name', read_only=True)
+    user_username = serializers.CharField(source='player.user.username', read_only=True)
+    last_activity = serializers.DateTimeField(source='player.last_activity', read_only=True)
     suit_emoji = serializers.ReadOnlyField()
     
     class Meta:
-        model = Player
+        model = GameParticipant
         fields = [
             'id', 'display_name', 'user_username', 'karma_score', 
             'suit_symbol', 'suit_emoji', 'last_activity', 'is_dead', 'death_reason'
@@ -43,14 +61,33 @@ class OnlinePlayerSerializer(serializers.ModelSerializer):
 
 
 class LeaderboardSerializer(serializers.ModelSerializer):
-    """Serializer para el ranking de jugadores"""
-    user_username = serializers.CharField(source='user.username', read_only=True)
+    """Serializer para el ranking de jugadores de una partida"""
+    id = serializers.IntegerField(source='player.id', read_only=True)
+    display_name = serializers.CharField(source='player.display_name', read_only=True)
+    user_username = serializers.CharField(source='player.user.username', read_only=True)
     karma_level = serializers.ReadOnlyField()
+    rank = serializers.IntegerField(read_only=True)
     
     class Meta:
-        model = Player
+        model = GameParticipant
         fields = [
-            'id', 'display_name', 'user_username', 'karma_score', 
+            'rank', 'id', 'display_name', 'user_username', 'karma_score', 
             'karma_level', 'suit_symbol', 'current_game_score',
             'secrets_discovered_this_game'
         ]
+
+
+class PlayerStatsSerializer(serializers.ModelSerializer):
+    """Serializer para las estadísticas de carrera de un jugador"""
+    deaths = serializers.ReadOnlyField()
+    lie_ratio = serializers.ReadOnlyField()
+    average_survival_rounds = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = PlayerStats
+        fields = [
+            'games_played', 'wins', 'truths_told', 'lies_told', 'lie_ratio',
+            'total_score', 'rounds_survived', 'average_survival_rounds', 'deaths',
+            'symbol_deaths', 'karma_max_deaths', 'karma_min_deaths', 'other_deaths',
+            'last_game_at'
+        ]
@@ -1,3 +1,271 @@
+from django.db.models import F
 from django.test import TestCase
 
- 
+import random
+
+from master.models import Game
+from master.queryprofile import DEFAULT_BUDGETS
+from master.tests import SUITS, QueryBudgetMixin, create_players
+from players.models import GameParticipant, PlayerGuess, PlayerStats
+
+
+class PlayerEndpointBenchmark(QueryBudgetMixin, TestCase):
+    """Presupuestos de consultas de los endpoints de los jugadores"""
+    
+    def first_player(self, game, participants):
+        return participants[0].player.user
+    
+    def test_dashboard(self):
+        def run(game, participants):
+            self.assertEqual(self.client.get('/players/dashboard/').status_code, 200)
+        self.assertQueryBudget('player_dashboard_view', 9, run, user=self.first_player)
+    
+    def test_get_player_guesses(self):
+        def run(game, participants):
+            response = self.client.get('/players/ajax/get-player-guesses/')
+            self.assertEqual(response.json()['count'], 2)
+        self.assertQueryBudget(
+            'get_player_guesses_view', DEFAULT_BUDGETS['players:ajax_get_player_guesses'], run, user=self.first_player
+        )
+    
+    def test_get_player_guesses_not_modified(self):
+        def prepare(game, participants):
+            self.client.force_login(self.first_player(game, participants))
+            self.etag = self.client.get('/players/ajax/get-player-guesses/')['ETag']
+        
+        def run(game, participants):
+            response = self.client.get('/players/ajax/get-player-guesses/', HTTP_IF_NONE_MATCH=self.etag)
+            self.assertEqual(response.status_code, 304)
+        self.assertQueryBudget('get_player_guesses_view 304', 3, run, prepare=prepare)
+    
+    def test_new_guess_changes_etag(self):
+        def prepare(game, participants):
+            self.client.force_login(self.first_player(game, participants))
+            self.etag = self.client.get('/players/ajax/get-player-guesses/')['ETag']
+            self.client.post('/players/ajax/tell-player-symbol/', {
+                'target_player_id': participants[3].player_id, 'symbol': SUITS[0]
+            })
+        
+        def run(game, participants):
+            response = self.client.get('/players/ajax/get-player-guesses/', HTTP_IF_NONE_MATCH=self.etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['count'], 3)
+        self.assertQueryBudget(
+            'get_player_guesses_view', DEFAULT_BUDGETS['players:ajax_get_player_guesses'], run, prepare=prepare
+        )
+    
+    def test_game_state(self):
+        def run(game, participants):
+            data = self.client.get('/players/ajax/game-state/').json()
+            self.assertEqual(data['game']['current_round'], game.current_round)
+            self.assertEqual(len(data['players']), len(participants) - 1)
+            self.assertNotIn(participants[0].player_id, {row['id'] for row in data['players']})
+            self.assertEqual(len(data['guesses']), 2)
+        self.assertQueryBudget(
+            'player_game_state_view', DEFAULT_BUDGETS['players:ajax_game_state'], run, user=self.first_player
+        )
+    
+    def test_game_state_changes_only(self):
+        def prepare(game, participants):
+            self.client.force_login(self.first_player(game, participants))
+            self.version = self.client.get('/players/ajax/game-state/').json()['roster_version']
+            participants[1].kill_player('Test')
+        
+        def run(game, participants):
+            data = self.client.get(f'/players/ajax/game-state/?since={self.version}').json()
+            self.assertFalse(data['roster_full'])
+            self.assertEqual(data['players'], [])
+            self.assertEqual(data['removed'], [participants[1].player_id])
+        self.assertQueryBudget(
+            'player_game_state_view (cambios)', DEFAULT_BUDGETS['players:ajax_game_state'], run, prepare=prepare
+        )
+    
+    def test_game_state_lists_only_alive_players(self):
+        def prepare(game, participants):
+            participants[1].kill_player('Test')
+        
+        def run(game, participants):
+            data = self.client.get('/players/ajax/game-state/').json()
+            self.assertTrue(data['roster_full'])
+            self.assertEqual(len(data['players']), len(participants) - 2)
+            self.assertNotIn(participants[1].player_id, {row['id'] for row in data['players']})
+            self.assertEqual(data['removed'], [])
+        self.assertQueryBudget(
+            'player_game_state_view', DEFAULT_BUDGETS['players:ajax_game_state'], run,
+            user=self.first_player, prepare=prepare,
+        )
+    
+    def test_tell_player_symbol(self):
+        def run(game, participants):
+            response = self.client.post('/players/ajax/tell-player-symbol/', {
+                'target_player_id': participants[1].player_id, 'symbol': SUITS[0]
+            })
+            self.assertTrue(response.json()['success'])
+        self.assertQueryBudget(
+            'tell_player_symbol_view', DEFAULT_BUDGETS['players:ajax_tell_player_symbol'], run, user=self.first_player
+        )
+    
+    def test_choose_symbol(self):
+        def run(game, participants):
+            response = self.client.post('/players/ajax/choose-symbol/', {'symbol': SUITS[1]})
+            self.assertTrue(response.json()['success'])
+        self.assertQueryBudget(
+            'choose_symbol_view', DEFAULT_BUDGETS['players:ajax_choose_symbol'], run, user=self.first_player
+        )
+    
+    def test_leaderboard(self):
+        def run(game, participants):
+            response = self.client.get('/players/api/leaderboard/')
+            self.assertEqual(len(response.json()['leaderboard']), min(len(participants), 20))
+        self.assertQueryBudget('leaderboard_view', 4, run, user=self.first_player)
+    
+    def test_leaderboard_around_player(self):
+        def run(game, participants):
+            player_id = participants[len(participants) // 2].player_id
+            data = self.client.get(f'/players/api/leaderboard/?around={player_id}').json()
+            self.assertIn(player_id, [row['id'] for row in data['leaderboard']])
+        self.assertQueryBudget(
+            'leaderboard_view (around)', DEFAULT_BUDGETS['players:api_leaderboard'], run, user=self.first_player
+        )
+    
+    def test_game_results(self):
+        def run(game, participants):
+            response = self.client.get(f'/players/game/{game.pk}/results/')
+            self.assertEqual(response.context['player']['player_id'], participants[0].player_id)
+        self.assertQueryBudget(
+            'player_game_results_view', 4, run, user=self.first_player, prepare=lambda game, _: game.finish_game()
+        )
+
+
+class LeaderboardTests(TestCase):
+    """Ranking por cursor del juego actual"""
+    
+    def setUp(self):
+        rng = random.Random(7)
+        self.game = Game.objects.create(name='Ranking', status='active')
+        self.participants = create_players(self.game, 25)
+        for participant in self.participants:
+            participant.karma_score = rng.randint(1, 5)
+            participant.current_game_score = rng.randint(0, 3)
+        GameParticipant.objects.bulk_update(self.participants, ['karma_score', 'current_game_score'])
+        self.expected = [
+            participant.player_id for participant in sorted(
+                self.participants, key=lambda p: (-p.karma_score, -p.current_game_score, p.player_id)
+            )
+        ]
+        self.client.force_login(self.participants[0].player.user)
+    
+    def get(self, **params):
+        return self.client.get('/players/api/leaderboard/', params)
+    
+    def test_pages_follow_cursor(self):
+        seen, ranks, cursor = [], [], None
+        while True:
+            data = self.get(limit=10, **({'after': cursor} if cursor else {})).json()
+            seen += [row['id'] for row in data['leaderboard']]
+            ranks += [row['rank'] for row in data['leaderboard']]
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(ranks, list(range(1, 26)))
+        self.assertEqual(data['total'], 25)
+    
+    def test_previous_page(self):
+        second = self.get(limit=10, after=self.get(limit=10).json()['next']).json()
+        first = self.get(limit=10, before=second['previous']).json()
+        self.assertEqual([row['id'] for row in first['leaderboard']], self.expected[:10])
+        self.assertIsNone(first['previous'])
+    
+    def test_around_player(self):
+        player_id = self.expected[12]
+        data = self.get(limit=5, around=player_id).json()
+        self.assertEqual([row['id'] for row in data['leaderboard']], self.expected[10:15])
+        self.assertEqual(data['player_rank'], 13)
+        self.assertIsNotNone(data['previous'])
+        self.assertIsNotNone(data['next'])
+    
+    def test_rank_follows_score_changes(self):
+        last = GameParticipant.objects.get(game=self.game, player_id=self.expected[-1])
+        last.karma_score = 6
+        last.add_score(10)
+        data = self.get(limit=1, around=last.player_id).json()
+        self.assertEqual(data['player_rank'], 1)
+    
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get(after='1.2').status_code, 400)
+        self.assertEqual(self.get(limit='x').status_code, 400)
+        self.assertEqual(self.get(around=0).status_code, 404)
+
+
+class PlayerStatsTests(TestCase):
+    """Estadísticas de carrera sumadas al finalizar cada juego"""
+    
+    def setUp(self):
+        self.game = Game.objects.create(name='Carrera', status='active')
+        self.participants = create_players(self.game, 4)
+        self.dead, self.winner, self.other, self.expelled = self.participants
+    
+    def stats(self, participant):
+        return PlayerStats.objects.get(player_id=participant.player_id)
+    
+    def play_game(self):
+        # Ronda 1: uno muere por símbolo y el ganador dice una verdad
+        GameParticipant.objects.filter(pk=self.dead.pk).update(chosen_symbol='')
+        PlayerGuess.objects.create(
+            game=self.game, player=self.other.player, teller=self.winner.player,
+            told_symbol=self.other.suit_symbol, round_number=1,
+        )
+        self.assertTrue(self.game.advance_round())
+        GameParticipant.objects.get(pk=self.expelled.pk).kill_player('Expulsado')
+        GameParticipant.objects.filter(pk=self.winner.pk).update(current_game_score=5)
+        self.assertTrue(self.game.finish_game())
+    
+    def test_finish_game_folds_stats(self):
+        self.play_game()
+        
+        winner = self.stats(self.winner)
+        self.assertEqual((winner.games_played, winner.wins, winner.truths_told, winner.lies_told), (1, 1, 1, 0))
+        self.assertEqual((winner.total_score, winner.rounds_survived, winner.deaths), (5, 1, 0))
+        self.assertEqual(winner.lie_ratio, 0)
+        self.assertEqual((self.stats(self.other).wins, self.stats(self.other).lie_ratio), (0, None))
+        self.assertEqual(self.stats(self.dead).symbol_deaths, 1)
+        self.assertEqual(self.stats(self.expelled).other_deaths, 1)
+    
+    def test_games_accumulate(self):
+        self.play_game()
+        self.game.reset_participants()
+        
+        second = Game.objects.create(name='Revancha', status='active')
+        second.enroll_players([self.winner.player])
+        self.assertTrue(second.finish_game())
+        
+        winner = self.stats(self.winner)
+        self.assertEqual((winner.games_played, winner.wins, winner.truths_told), (2, 2, 1))
+        self.assertEqual(winner.average_survival_rounds, 0.5)
+    
+    def test_master_kill_counts_rounds_until_death(self):
+        def survive_round():
+            GameParticipant.objects.filter(game=self.game).update(chosen_symbol=F('suit_symbol'))
+            self.assertTrue(self.game.advance_round())
+        
+        # El master elimina a un jugador en la ronda 2 y el juego sigue hasta la 4
+        survive_round()
+        GameParticipant.objects.get(pk=self.expelled.pk).kill_player('Expulsado')
+        survive_round()
+        survive_round()
+        self.assertTrue(self.game.finish_game())
+        
+        self.assertEqual(self.stats(self.expelled).rounds_survived, 2)
+        self.assertEqual(self.stats(self.winner).rounds_survived, 3)
+    
+    def test_fixed_queries(self):
+        # Participantes, filas que falten y un UPDATE
+        with self.assertNumQueries(3):
+            self.assertEqual(PlayerStats.record_game(self.game, self.winner.player_id), 4)
+    
+    def test_stats_endpoint(self):
+        self.play_game()
+        self.client.force_login(self.winner.player.user)
+        data = self.client.get(f'/players/api/players/{self.winner.player_id}/stats/').json()
+        self.assertEqual((data['games_played'], data['wins'], data['deaths']), (1, 1, 0))
@@ -22,9 +22,10 @@ urlpatterns = [
     path('ajax/tell-player-symbol/', views.tell_player_symbol_view, name='ajax_tell_player_symbol'),
     path('ajax/get-player-guesses/', views.get_player_guesses_view, name='ajax_get_player_guesses'),
     path('ajax/check-new-game/', views.check_new_game_view, name='ajax_check_new_game'),
+    path('ajax/game-state/', views.player_game_state_view, name='ajax_game_state'),
     
     # Rutas de la API REST
     path('api/', include(router.urls)),
     path('api/online/', views.OnlinePlayersView.as_view(), name='api_online_players'),
-    path('api/leaderboard/', views.LeaderboardView.as_view(), name='api_leaderboard'),
+    path('api/leaderboard/', views.leaderboard_view, name='api_leaderboard'),
 ]
@@ -3,6 +3,7 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
@@ -12,9 +13,15 @@ from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Player, PlayerGuess
-from .serializers import PlayerSerializer, OnlinePlayerSerializer, LeaderboardSerializer
-from master.models import Game
+from .models import Player, GameParticipant, PlayerGuess, PlayerStats
+from .serializers import PlayerSerializer, OnlinePlayerSerializer, LeaderboardSerializer, PlayerStatsSerializer
+from master import leaderboard, roster, snapshots
+from master.decorators import api_login_required, async_condition
+from master.etags import games_etag, player_guesses_etag, player_state_etag
+from master.gamelog import get_logger
+from master.models import Game, GameResult
+
+logger = get_logger('communications')
 
 
 class PlayerViewSet(viewsets.ModelViewSet):
@@ -44,17 +51,31 @@ class PlayerViewSet(viewsets.ModelViewSet):
         player.set_offline()
         return Response({'message': 'Jugador marcado como desconectado'})
     
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Estadísticas de todas las partidas terminadas del jugador"""
+        player = self.get_object()
+        stats = PlayerStats.objects.filter(player=player).first() or PlayerStats(player=player)
+        return Response(PlayerStatsSerializer(stats).data)
+    
     @action(detail=True, methods=['post'])
     def update_karma(self, request, pk=None):
-        """Actualiza el karma del jugador"""
+        """Actualiza el karma del jugador en el juego actual"""
         player = self.get_object()
         action_type = request.data.get('action')  # 'increase' o 'decrease'
         amount = int(request.data.get('amount', 1))
         
+        participant = player.participation_in(Game.get_current_game())
+        if participant is None:
+            return Response(
+                {'error': 'El jugador no participa en el juego actual'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         if action_type == 'increase':
-            player.increase_karma(amount)
+            participant.increase_karma(amount)
         elif action_type == 'decrease':
-            player.decrease_karma(amount)
+            participant.decrease_karma(amount)
         else:
             return Response(
                 {'error': 'Acción inválida. Use "increase" o "decrease"'}, 
@@ -63,8 +84,8 @@ class PlayerViewSet(viewsets.ModelViewSet):
         
         return Response({
             'message': f'Karma {action_type}d en {amount}',
-            'new_karma': player.karma_score,
-            'karma_level': player.karma_level
+            'new_karma': participant.karma_score,
+            'karma_level': participant.karma_level
         })
 
 
@@ -73,8 +94,13 @@ class OnlinePlayersView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        """Devuelve la lista de jugadores conectados"""
-        online_players = Player.objects.filter(is_online=True).order_by('display_name')
+        """Devuelve la lista de jugadores conectados del juego actual"""
+        current_game = Game.get_current_game()
+        online_players = GameParticipant.objects.none()
+        if current_game:
+            online_players = current_game.participants.filter(
+                player__is_online=True
+            ).select_related('player__user').order_by('player__display_name')
         serializer = OnlinePlayerSerializer(online_players, many=True)
         
         return Response({
@@ -83,25 +109,43 @@ class OnlinePlayersView(APIView):
         })
 
 
-class LeaderboardView(APIView):
-    """Vista para el ranking de jugadores"""
-    permission_classes = [permissions.IsAuthenticated]
-    
-    def get(self, request):
-        """Devuelve el ranking de jugadores"""
-        
-        top_players = Player.objects.order_by(
-            '-karma_score', 
-            '-current_game_score', 
-            '-secrets_discovered_this_game',
-            'display_name'
-        )[:20]  # Top 20
-        
-        serializer = LeaderboardSerializer(top_players, many=True)
-        
-        return Response({
-            'leaderboard': serializer.data
-        })
+@api_login_required
+@require_http_methods(["GET"])
+async def leaderboard_view(request):
+    """
+    Devuelve el ranking de jugadores del juego actual (o del último jugado).
+    
+    Por páginas de ?limit= jugadores (20 por defecto): los primeros, los que
+    siguen a ?after=<cursor> o preceden a ?before=<cursor>, o los que rodean
+    a ?around=<id de jugador>, con su puesto en player_rank. Cada respuesta
+    trae los cursores next y previous (ver master.leaderboard).
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', leaderboard.DEFAULT_LIMIT)), 1), leaderboard.MAX_LIMIT)
+        after = leaderboard.decode_cursor(request.GET['after']) if 'after' in request.GET else None
+        before = leaderboard.decode_cursor(request.GET['before']) if 'before' in request.GET else None
+        around = int(request.GET['around']) if 'around' in request.GET else None
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros de paginación inválidos'}, status=400)
+    
+    game = await Game.aget_current_game() or await Game.objects.afirst()
+    if game is None:
+        return JsonResponse({'leaderboard': [], 'total': 0, 'next': None, 'previous': None})
+    
+    page = await leaderboard.apage(game, limit, after=after, before=before, around=around)
+    if page is None:
+        return JsonResponse({'error': 'El jugador no participa en el juego'}, status=404)
+    rows, next_cursor, previous_cursor = page
+    
+    data = {
+        'leaderboard': LeaderboardSerializer(rows, many=True).data,
+        'total': game.participant_count,
+        'next': next_cursor,
+        'previous': previous_cursor,
+    }
+    if around is not None:
+        data['player_rank'] = next(row.rank for row in rows if row.player_id == around)
+    return JsonResponse(data)
 
 
 # ============= VISTAS WEB PARA JUGADORES =============
@@ -137,7 +181,11 @@ def player_login_view(request):
             
             
             player.set_online()
-            player.join_game()  # Inscribirse automáticamente en el juego
+            
+            # Inscribirse automáticamente en el juego actual (si hay uno)
+            current_game = Game.get_current_game()
+            if current_game:
+                player.join_game(current_game)
             
             messages.success(request, f'¡Bienvenido, {player.display_name}!')
             return redirect('players:dashboard')
@@ -175,7 +223,11 @@ def player_register_view(request):
         # Login automático
         login(request, user)
         player.set_online()
-        player.join_game()  # Inscribirse automáticamente en el juego
+        
+        # Inscribirse automáticamente en el juego actual (si hay uno)
+        current_game = Game.get_current_game()
+        if current_game:
+            player.join_game(current_game)
         
         messages.success(request, f'¡Cuenta creada exitosamente! Bienvenido, {player.display_name}!')
         return redirect('players:dashboard')
@@ -202,29 +254,34 @@ def player_dashboard_view(request):
     
     # Verificar si hay un juego finalizado Y el jugador participó en él
     finished_game = Game.objects.filter(status='finished').order_by('-created_at').first()
-    if finished_game and player.is_in_game:
+    if finished_game and player.participation_in(finished_game):
         
         # Verificar que este juego finalizado sea más reciente que cualquier juego activo
         if not current_game or finished_game.created_at > current_game.created_at:
             return redirect('players:game_results', game_id=finished_game.id)
     
+    participant = player.participation_in(current_game)
+    
     # Verificar si el jugador está muerto
-    if player.is_dead:
+    if participant and participant.is_dead:
         
         context = {
-            'player': player,
+            'player': participant,
             'is_dead': True,
-            'death_reason': player.death_reason,
+            'death_reason': participant.death_reason,
         }
         return render(request, 'players/death_screen.html', context)
     
     # Obtener todos los jugadores INSCRITOS EN EL JUEGO
-    online_players = Player.objects.filter(is_in_game=True).order_by('display_name')
+    online_players = GameParticipant.objects.none()
+    if current_game:
+        online_players = current_game.participants.select_related('player').order_by('player__display_name')
     
     # Obtener comunicaciones guardadas para evitar el parpadeo visual
     player_communications = {}
     if current_game and current_game.status == 'active':
         saved_guesses = PlayerGuess.objects.filter(
+            game=current_game,
             player=player,
             round_number=current_game.current_round
         ).select_related('teller')
@@ -234,6 +291,7 @@ def player_dashboard_view(request):
     
     context = {
         'player': player,
+        'participant': participant,
         'current_game': current_game,
         'online_players': online_players,
         'is_dead': False,
@@ -266,87 +324,46 @@ def player_game_results_view(request, game_id):
         messages.error(request, 'No tienes un perfil de jugador.')
         return redirect('players:dashboard')
     
-    game = get_object_or_404(Game, id=game_id)
+    result = GameResult.objects.select_related('game').filter(game_id=game_id).first()
     
-    if game.status != 'finished':
+    if result is None:
+        get_object_or_404(Game, id=game_id)
         messages.error(request, 'Solo se pueden ver resultados de juegos finalizados.')
         return redirect('players:dashboard')
     
     # Verificar que el jugador participó en este juego
-    if not player.is_in_game:
+    stats = result.stats_for(player.id)
+    if stats is None:
         messages.error(request, 'No participaste en este juego.')
         return redirect('players:dashboard')
     
-    # Determinar ganador usando la misma lógica que finish_game
-    alive_players = Player.objects.filter(is_in_game=True, is_dead=False)
-    alive_count = alive_players.count()
-    
-    winner = None
-    winner_reason = ""
-    is_winner = False
-    is_tie = False
-    
-    if alive_count == 0:
-        winner_reason = "Todos los jugadores han muerto. Nadie gana."
-    elif alive_count == 1:
-        winner = alive_players.first()
-        winner_reason = f"{winner.display_name} es el ganador (único superviviente)"
-        is_winner = (winner.id == player.id)
-    elif alive_count == 2:
-        players_list = list(alive_players.order_by('-lies_told', '-truths_told'))
-        player1, player2 = players_list[0], players_list[1]
-        
-        player1_interactions = player1.lies_told + player1.truths_told
-        player2_interactions = player2.lies_told + player2.truths_told
-        
-        if player1_interactions > player2_interactions:
-            winner = player1
-            winner_reason = f"{winner.display_name} gana por más interacciones ({player1_interactions} vs {player2_interactions})"
-        elif player2_interactions > player1_interactions:
-            winner = player2
-            winner_reason = f"{winner.display_name} gana por más interacciones ({player2_interactions} vs {player1_interactions})"
-        else:
-            if player1.lies_told > player2.lies_told:
-                winner = player1
-                winner_reason = f"{winner.display_name} gana por más mentiras en empate de interacciones ({player1.lies_told} vs {player2.lies_told})"
-            elif player2.lies_told > player1.lies_told:
-                winner = player2
-                winner_reason = f"{winner.display_name} gana por más mentiras en empate de interacciones ({player2.lies_told} vs {player1.lies_told})"
-            else:
-                winner_reason = f"Empate entre {player1.display_name} y {player2.display_name} (mismas interacciones y mentiras)"
-                is_tie = True
-        
-        if winner:
-            is_winner = (winner.id == player.id)
-    else:
-        winner_reason = f"Juego finalizado con {alive_count} supervivientes"
-    
     context = {
-        'game': game,
-        'player': player,
-        'winner': winner,
-        'winner_reason': winner_reason,
-        'is_winner': is_winner,
-        'is_tie': is_tie,
-        'alive_count': alive_count,
+        'game': result.game,
+        'player': stats,
+        'winner': result.winner_stats,
+        'winner_reason': result.winner_reason,
+        'is_winner': result.winner_id == player.id,
+        'is_tie': result.is_tie,
+        'alive_count': result.alive_count,
     }
     
     return render(request, 'players/game_results.html', context)
 
 @login_required
 @require_http_methods(["GET"])
-def check_new_game_view(request):
+@cache_control(private=True, no_cache=True)
+@async_condition(etag_func=games_etag)
+async def check_new_game_view(request):
     """Verifica si hay un nuevo juego disponible (AJAX)"""
-    try:
-        player = request.user.player_profile
-    except Player.DoesNotExist:
+    user = await request.auser()
+    if not await Player.objects.filter(user=user).aexists():
         return JsonResponse({'new_game_available': True})  # Redirigir al dashboard
     
     # Verificar si hay un juego activo o en espera
-    current_game = Game.get_current_game()
+    current_game = await Game.aget_current_game()
     
     # Verificar si hay juegos finalizados
-    finished_games_exist = Game.objects.filter(status='finished').exists()
+    finished_games_exist = await Game.objects.filter(status='finished').aexists()
     
     # Si hay un juego nuevo y no hay juegos finalizados, hay un nuevo juego
     new_game_available = bool(current_game and not finished_games_exist)
@@ -371,8 +388,12 @@ def choose_symbol_view(request):
             if chosen_symbol not in ['♠', '♥', '♦', '♣']:
                 return JsonResponse({'success': False, 'message': 'Símbolo inválido'})
             
-            player.chosen_symbol = chosen_symbol
-            player.save()
+            participant = player.participation_in(Game.get_current_game())
+            if participant is None:
+                return JsonResponse({'success': False, 'message': 'No participas en el juego actual'})
+            
+            participant.chosen_symbol = chosen_symbol
+            participant.save()
             
             # NO verificar muerte aquí - solo al cambiar de ronda
             return JsonResponse({
@@ -417,6 +438,7 @@ def tell_player_symbol_view(request):
             # player = quien recibió la información (yo)
             # teller = quien dijo la información (el otro jugador)
             guess, created = PlayerGuess.objects.get_or_create(
+                game=current_game,
                 player=receiver,  # YO recibo la información
                 teller=teller_player,  # EL OTRO me dijo algo
                 round_number=current_game.current_round,
@@ -428,26 +450,22 @@ def tell_player_symbol_view(request):
                 guess.save()
             
             action = 'registrado' if created else 'actualizado'
-            print(f"[COMMUNICATION] {receiver.display_name} {action} que {teller_player.display_name} le dijo que tiene {told_symbol} (Ronda {current_game.current_round})")
-            print(f"[COMMUNICATION] DEBUG: PlayerGuess guardado con ID {guess.id}, ronda {guess.round_number}")
-            
-            # Verificar que se guardó correctamente
-            verification = PlayerGuess.objects.filter(
-                player=receiver, 
-                teller=teller_player, 
-                round_number=current_game.current_round
-            ).first()
-            if verification:
-                print(f"[COMMUNICATION] VERIFICADO: Comunicación guardada correctamente en la base de datos")
-            else:
-                print(f"[COMMUNICATION] ERROR: No se pudo verificar la comunicación en la base de datos")
+            current_game.record_event(
+                'guess', recipient=receiver,
+                teller_id=teller_player.id, told_symbol=told_symbol, round=current_game.current_round
+            )
+            logger.info(
+                "%s %s que %s le dijo que tiene %s",
+                receiver.display_name, action, teller_player.display_name, told_symbol,
+                extra={'game': current_game.pk, 'round': current_game.current_round, 'guess': guess.pk}
+            )
             
             return JsonResponse({
                 'success': True, 
                 'message': f'Has registrado que {teller_player.display_name} te dijo que tienes {told_symbol}',
                 'action': action
             })
-            
+        
         except Player.DoesNotExist:
             return JsonResponse({'success': False, 'message': 'Jugador no encontrado'})
         except Exception as e:
@@ -457,37 +475,33 @@ def tell_player_symbol_view(request):
 
 @login_required
 @require_http_methods(["GET"])
-def get_player_guesses_view(request):
+@cache_control(private=True, no_cache=True)
+@async_condition(etag_func=player_guesses_etag)
+async def get_player_guesses_view(request):
     """Obtener las comunicaciones que otros jugadores le han dicho al jugador actual"""
     try:
-        player = request.user.player_profile
+        player = await Player.objects.aget(user=await request.auser())
         
         # Obtener el juego actual
-        current_game = Game.objects.filter(status='active').first()
+        current_game = await Game.objects.filter(status='active').afirst()
         if not current_game:
             return JsonResponse({'success': True, 'guesses': [], 'count': 0})
         
         # Obtener todas las comunicaciones donde este jugador es el receptor
         # en la ronda actual
         guesses = PlayerGuess.objects.filter(
+            game=current_game,
             player=player,  # Quien recibe la comunicación
             round_number=current_game.current_round
         ).select_related('teller')
         
         guesses_data = []
-        for guess in guesses:
-            # Usar un campo de fecha que exista en el modelo, o manejarlo sin fecha
-            timestamp = 'N/A'
-            if hasattr(guess, 'created_at'):
-                timestamp = guess.created_at.strftime('%H:%M:%S')
-            elif hasattr(guess, 'timestamp'):
-                timestamp = guess.timestamp.strftime('%H:%M:%S')
-            
+        async for guess in guesses:
             guesses_data.append({
                 'teller_id': guess.teller.id,
                 'teller_name': guess.teller.display_name,
                 'told_symbol': guess.told_symbol,
-                'timestamp': timestamp
+                'timestamp': guess.timestamp.strftime('%H:%M:%S')
             })
         
         return JsonResponse({
@@ -495,8 +509,93 @@ def get_player_guesses_view(request):
             'guesses': guesses_data,
             'count': len(guesses_data)
         })
-        
+    
     except Player.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Jugador no encontrado'})
     except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)})
\ No newline at end of file
+        return JsonResponse({'success': False, 'message': str(e)})
+
+def build_roster_snapshot(game):
+    """Jugadores del juego con los campos que muestra el dashboard del jugador"""
+    return [
+        {
+            'id': player_id, 'display_name': display_name, 'suit_emoji': suit_symbol or '❓',
+            'karma_score': karma_score, 'is_dead': is_dead, 'version': version,
+        }
+        for player_id, display_name, suit_symbol, karma_score, is_dead, version in game.participants.order_by(
+            'player__display_name'
+        ).values_list('player_id', 'player__display_name', 'suit_symbol', 'karma_score', 'is_dead', 'state_version')
+    ]
+
+@login_required
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@async_condition(etag_func=player_state_etag)
+async def player_game_state_view(request):
+    """
+    Estado compacto del juego para el dashboard del jugador (AJAX).
+    
+    Solo ronda, temporizador, el resto de jugadores y las comunicaciones que
+    ha recibido el jugador en la ronda actual, con un número fijo de
+    consultas. El temporizador da el fin absoluto de la ronda: el cliente
+    calcula la cuenta atrás y el tiempo restante solo se envía en pausa.
+    La lista solo trae jugadores vivos. Con ?since=<roster_version> trae solo
+    los que han cambiado (ver master.roster) y los que han muerto desde esa
+    versión llegan en 'removed'.
+    """
+    player = await Player.objects.filter(user=await request.auser()).afirst()
+    if player is None:
+        return JsonResponse({'success': False, 'message': 'Jugador no encontrado'})
+    
+    current_game = await Game.aget_current_game()
+    if not current_game:
+        # Sala de espera: jugadores conectados, todavía sin palo
+        players = [
+            {'id': player_id, 'display_name': display_name, 'suit_emoji': '❓', 'karma_score': 3, 'is_dead': False}
+            async for player_id, display_name in Player.objects.filter(
+                is_online=True
+            ).exclude(pk=player.pk).order_by('display_name').values_list('id', 'display_name')
+        ]
+        return JsonResponse({
+            'success': True, 'game': None, 'players': players, 'guesses': {},
+            'roster_version': None, 'roster_full': True, 'removed': [],
+        })
+    
+    # La lista es la misma para todos: se guarda una instantánea por versión del juego
+    players_roster = await snapshots.aget_or_build(
+        'player-roster', current_game.pk, current_game.state_version, lambda: build_roster_snapshot(current_game)
+    )
+    # El palo propio no se envía: el jugador tiene que deducirlo
+    rows, roster_full = roster.changed_rows(
+        current_game, [row for row in players_roster if row['id'] != player.pk], roster.parse_since(request)
+    )
+    players = [row for row in rows if not row['is_dead']]
+    # Una lista completa ya no los trae; un cambio parcial avisa de las muertes
+    removed = [] if roster_full else [row['id'] for row in rows if row['is_dead']]
+    
+    guesses = {}
+    if current_game.status == 'active':
+        guesses = {
+            teller_id: told_symbol
+            async for teller_id, told_symbol in PlayerGuess.objects.filter(
+                game=current_game, player=player, round_number=current_game.current_round
+            ).values_list('teller_id', 'told_symbol')
+        }
+    
+    return JsonResponse({
+        'success': True,
+        'game': {
+            'id': current_game.pk,
+            'status': current_game.status,
+            'current_round': current_game.current_round,
+            'round_duration_seconds': current_game.round_duration_seconds,
+            'round_deadline': current_game.round_deadline,
+            'is_paused': current_game.is_paused,
+            'time_remaining_in_round': current_game.time_remaining_in_round if current_game.is_paused else None,
+        },
+        'players': players,
+        'roster_version': current_game.state_version,
+        'roster_full': roster_full,
+        'removed': removed,
+        'guesses': guesses,
+    })